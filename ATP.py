@@ -0,0 +1,147 @@
+import io
+from types import MappingProxyType
+from typing import List, Mapping, Tuple
+
+import Compiler
+import Errors
+import Limits
+import Optimizer
+import Output
+from Loader import readLines
+
+
+class CompileError(Exception):
+    """
+    Raised when the source of a program can not be parsed, errors holds every problem that was found.
+    """
+
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+class Result:
+    """
+    The outcome of a single run of a Program.
+    - variables: the variables the program SET, in the order they were first SET
+    - output: everything PRINT and DUMP wrote, None when the output went to an output sink passed to Program.run
+    - errors and warnings: the errors and warnings of the run, the last error says why the run stopped when it
+      reached a limit
+    - line: the line of the source the program counter ended on
+    - finished: whether the program ran to its end, rather than halting on an error or stopping at a limit
+    - halted: whether a strict run halted on its first error
+    """
+
+    def __init__(self, variables: dict, output: str, errors: List[str], warnings: List[str], line: int,
+                 finished: bool, halted: bool):
+        self.variables = variables
+        self.output = output
+        self.errors = errors
+        self.warnings = warnings
+        self.line = line
+        self.finished = finished
+        self.halted = halted
+
+    def __repr__(self) -> str:
+        return "Result(variables={0}, errors={1}, line={2}, finished={3}, halted={4})".format(
+            self.variables, self.errors, self.line, self.finished, self.halted)
+
+
+class Program:
+    """
+    A parsed and compiled program that can be run any number of times, see compile. A run keeps all of its state in
+    a machine state of its own and the handlers of the program only read the program, so a Program can be shared
+    between calls and threads without copying it. Its attributes can not be changed.
+    """
+
+    def __init__(self, compiled: Compiler.CompiledProgram, optimized: bool):
+        object.__setattr__(self, "compiled", compiled)
+        object.__setattr__(self, "optimized", optimized)
+        object.__setattr__(self, "slots", MappingProxyType(dict(map(lambda pair: (pair[1], pair[0]),
+                                                                    enumerate(compiled.names)))))
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError("A Program can not be changed")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("A Program can not be changed")
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        """
+        :return: the names of the variables of the program, in the order they first appear in the source
+        """
+        return tuple(self.compiled.names)
+
+    @property
+    def labels(self) -> Mapping[str, int]:
+        """
+        :return: the labels of the program with the line they are on
+        """
+        return MappingProxyType(self.compiled.labels)
+
+    def run(self, initial_vars: Mapping[str, object] = None, limits: Limits.Limits = None,
+            output: Output.OutputSink = None, strict: bool = False, max_errors: int = None) -> Result:
+        """
+        Runs the program with the compiled engine. Nothing is written to stdout and no thread is started, the run
+        happens on the calling thread.
+        :param initial_vars: variables of the program and the numbers they hold before the first instruction, they
+        come first in the variables of the result (not for an optimized program, as the optimizer assumes every
+        variable starts unset)
+        :param limits: the limits of the run, see Limits.Limits, the run is not limited if None
+        :param output: where the output of PRINT and DUMP goes, the output is collected in the result if None
+        :param strict: whether to halt the program on its first error, see Errors.ErrorLog
+        :param max_errors: the number of errors to keep, every error is kept if None
+        :return: the result of the run
+        """
+        initial_vars = initial_vars if initial_vars is not None else {}
+        if self.optimized and len(initial_vars) > 0:
+            raise ValueError("An optimized program can not be given initial variables")
+        unknown = list(filter(lambda name: name not in self.slots.keys(), initial_vars.keys()))
+        if len(unknown) > 0:
+            raise ValueError("{0} is not a variable of the program".format(", ".join(unknown)))
+        if not all(map(lambda value: type(value) in (int, float), initial_vars.values())):
+            raise ValueError("The initial variables have to be numbers")
+        sink = output if output is not None else Output.CollectorSink(4096)
+        state = Compiler.MachineState(self.compiled, sink)
+        for name, value in initial_vars.items():
+            state.slots[self.slots[name]] = value
+            state.order.append(self.slots[name])
+        if strict or max_errors is not None:
+            state.errors = Errors.ErrorLog(strict, max_errors)
+        try:
+            if limits is not None:
+                state = Limits.executeCompiledLimited(self.compiled, state, limits)
+            else:
+                state = Compiler.executeCompiled(self.compiled, state)
+        finally:
+            sink.flush()
+        ps = state.toProgramState()
+        return Result(ps.variables, sink.getvalue() if output is None else None, list(ps.errors), ps.warnings,
+                      ps.current_pos, state.current_pos == len(self.compiled.code) - 1, Errors.isHalted(ps.errors))
+
+
+# compile :: str -> bool -> Program
+def compile(source: str, optimize: bool = False) -> Program:
+    """
+    Parses and compiles the source of a program, see Loader.readLines and Compiler.compileProgram.
+    :param source: the source of the program
+    :param optimize: whether to optimize the program, see Optimizer.optimize
+    :return: the program
+    """
+    ps, errors = readLines(io.StringIO(source))
+    if len(errors) > 0:
+        raise CompileError(errors)
+    return Program(Compiler.compileProgram(Optimizer.optimize(ps) if optimize else ps), optimize)
+
+
+# compileFile :: str -> bool -> Program
+def compileFile(path: str, optimize: bool = False) -> Program:
+    """
+    Parses and compiles a program from a file, see compile.
+    :param path: path to the ATP++ file
+    :param optimize: whether to optimize the program, see Optimizer.optimize
+    :return: the program
+    """
+    with open(path, "r") as file:
+        return compile(file.read(), optimize)
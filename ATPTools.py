@@ -1,13 +1,36 @@
 from copy import deepcopy
+from functools import wraps
+
+# When this flag is False the copyParameters decorator hands its arguments to the wrapped function as-is, which makes
+# every decorated function work on (and change) the caller's objects in place.
+pass_by_value = True
+
+
+# setPassByValue :: bool -> None
+def setPassByValue(enabled: bool) -> None:
+    """
+    Switches between the pure-functional execution mode (every decorated function receives deep copies of its
+    parameters) and the in-place execution mode (parameters are passed by reference and changed in place).
+    The results of running a program are the same in both modes, the pure mode is the default because it is easier to
+    reason about while teaching and debugging, the in-place mode removes all copies from the hot path.
+    :param enabled: True for the pure-functional mode, False for the in-place mode
+    :return: None
+    """
+    global pass_by_value
+    pass_by_value = enabled
 
 
 # copyParameters :: Callable -> Callable
 def copyParameters(func: callable) -> callable:
     """
     Decorator that makes a deepcopy the parameters of a function before passing them to prevent pass-by-reference calls.
+    No copies are made while the in-place execution mode is enabled, see setPassByValue.
     """
     # passByValueFunction :: Any -> Callable[[_], Any] -> Any?
+    @wraps(func)
     def passByValueFunction(*args):
+        if not pass_by_value:
+            return func(*args)
         copied = [deepcopy(arg) for arg in args]
         return func(*copied)
 
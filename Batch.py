@@ -0,0 +1,276 @@
+import argparse
+import glob
+import json
+import math
+import multiprocessing
+import os
+import signal
+import sys
+from copy import copy
+from time import perf_counter
+from typing import Dict, Iterable, List, TextIO
+
+import ATPTools
+import Compiler
+import Errors
+import Optimizer
+import Output
+import Parser
+from Loader import haltReport, loadProgram, readProgram
+
+
+class ProgramError(Exception):
+    """
+    Raised when a program of a batch can not be parsed, holds every error found in the program.
+    """
+
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+class ProgramTimeout(Exception):
+    """
+    Raised inside a worker when a program runs longer than the timeout of the batch.
+    """
+
+
+# Settings of the batch, set in every worker process by initWorker.
+WORKER_SETTINGS = {}
+
+
+# readManifest :: str -> [str]
+def readManifest(path: str) -> List[str]:
+    """
+    Reads a manifest, a text file with the path of one program on every line. Empty lines and lines starting with #
+    are skipped, relative paths are relative to the directory of the manifest.
+    :param path: path to the manifest
+    :return: the paths of the programs
+    """
+    with open(path, "r") as file:
+        lines = filter(lambda line: line != "" and not line.startswith("#"), map(str.strip, file))
+        return list(map(lambda line: os.path.join(os.path.dirname(path), line), lines))
+
+
+# collectPrograms :: [str] -> [str]
+def collectPrograms(sources: Iterable[str]) -> List[str]:
+    """
+    Finds the programs of a batch. A source is either a directory, which is searched recursively for .atp++ files, a
+    glob pattern, a single .atp++ file or a manifest (see readManifest). Programs are run in the order they are found,
+    a program that is found more than once is only run once.
+    :param sources: the directories, patterns, programs and manifests
+    :return: the paths of the programs
+    """
+    programs = []
+    for source in sources:
+        if os.path.isdir(source):
+            programs += sorted(glob.glob(os.path.join(source, "**", "*.atp++"), recursive=True))
+        elif glob.has_magic(source):
+            programs += sorted(glob.glob(source, recursive=True))
+        elif source.endswith(".atp++"):
+            programs.append(source)
+        else:
+            programs += readManifest(source)
+    return list(dict.fromkeys(programs))
+
+
+# parseOrRaise :: str -> Parser.ProgramState
+def parseOrRaise(infile: str) -> Parser.ProgramState:
+    """
+    Parses a program like Loader.parseProgram, but raises a ProgramError instead of exiting when it can not be parsed.
+    :param infile: path to the ATP++ file
+    :return: ProgramState
+    """
+    ps, errors = readProgram(infile)
+    if len(errors) > 0:
+        raise ProgramError(errors)
+    return ps
+
+
+# raiseTimeout :: int -> frame -> None
+def raiseTimeout(signal_number: int, frame) -> None:
+    raise ProgramTimeout()
+
+
+# initWorker :: dict -> None
+def initWorker(settings: dict) -> None:
+    """
+    Prepares a worker process of the pool. Workers run the programs in place, as nothing else uses the program state,
+    and install the handler that stops a program when the timeout expires.
+    :param settings: the settings of the batch
+    :return: None
+    """
+    WORKER_SETTINGS.update(settings)
+    ATPTools.setPassByValue(False)
+    if hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, raiseTimeout)
+    # Interrupting the batch is handled by the parent process, which terminates the pool.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+# setTimer :: float -> None
+def setTimer(seconds: float) -> None:
+    """
+    Starts (or with 0 stops) the timer that raises ProgramTimeout. Platforms without SIGALRM have no timeout.
+    :param seconds: the time before the timer expires
+    :return: None
+    """
+    if hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+
+
+# executeState :: Parser.ProgramState -> Output.OutputSink -> str -> bool -> bool -> Either int None
+#                 -> Parser.ProgramState
+def executeState(ps: Parser.ProgramState, output: Output.OutputSink, engine: str, optimize: bool = False,
+                 strict: bool = False, max_errors: int = None) -> Parser.ProgramState:
+    """
+    Executes a parsed program. The program runs in place, so when it is stopped by an exception ps still holds the
+    state the program reached.
+    :param ps: the parsed program
+    :param output: where the output of the program goes
+    :param engine: either "compiled" or "reference"
+    :param optimize: whether to optimize the program for the compiled engine, see Optimizer.optimize
+    :param strict: whether to halt the program on its first error, see Errors.ErrorLog
+    :param max_errors: the number of errors to keep, every error is kept if None
+    :return: the program state after executing the program
+    """
+    if engine == "reference":
+        ps.output = output
+        ps.errors = Errors.ErrorLog(strict, max_errors, ps.errors)
+        return Parser.executeProgram(ps)
+    program = Compiler.compileProgram(Optimizer.optimize(ps) if optimize else ps)
+    state = Compiler.MachineState(program, output)
+    state.errors = Errors.ErrorLog(strict, max_errors, state.errors)
+    try:
+        Compiler.executeCompiled(program, state)
+    finally:
+        ps.__dict__.update(state.toProgramState().__dict__)
+    return ps
+
+
+# runProgram :: str -> dict
+def runProgram(infile: str) -> dict:
+    """
+    Parses and runs one program of the batch in a worker process and captures everything about the run: the status,
+    the output, the variables, the warnings and errors and how long parsing and executing took.
+    The status is "ok", "parse_error" when the program could not be read or parsed, "halted" when a strict program
+    halted on its first error, "timeout" when the program was stopped by the timeout or "crash" when the interpreter
+    failed. The variables and output are those the program
+    reached before it was stopped.
+    :param infile: path to the ATP++ file
+    :return: dict with the result of the run
+    """
+    settings = WORKER_SETTINGS
+    result = {"file": infile, "status": "ok", "output": [], "variables": {}, "warnings": [], "errors": [],
+              "parse_s": 0.0, "execute_s": 0.0}
+    start = perf_counter()
+    try:
+        ps = loadProgram(infile, settings["use_cache"], settings["cache_directory"], parseOrRaise)
+    except ProgramError as error:
+        result.update(status="parse_error", errors=error.errors, parse_s=perf_counter() - start)
+        return result
+    except OSError as error:
+        result.update(status="parse_error", errors=[str(error)], parse_s=perf_counter() - start)
+        return result
+    result["parse_s"] = perf_counter() - start
+
+    output = Output.CollectorSink(4096)
+    start = perf_counter()
+    try:
+        setTimer(settings["timeout"])
+        # The state is run in place, the halt is reported against the program as it was loaded.
+        source = copy(ps)
+        ps = executeState(ps, output, settings["engine"], settings["optimize"], settings["strict"],
+                          settings["max_errors"])
+        if Errors.isHalted(ps.errors):
+            result["status"] = "halted"
+            list.append(ps.errors, haltReport(ps, source))
+    except ProgramTimeout:
+        result["status"] = "timeout"
+        # A strict log would halt on the error and a log that is full would leave it out.
+        list.append(ps.errors, "Program stopped after the timeout of {0} s".format(settings["timeout"]))
+    except Exception as error:
+        result["status"] = "crash"
+        list.append(ps.errors, "The interpreter failed: {0!r}".format(error))
+    finally:
+        setTimer(0)
+    result.update(output=output.lines(),
+                  variables=dict(map(lambda variable: (variable[0], jsonValue(variable[1])), ps.variables.items())),
+                  warnings=list(ps.warnings), errors=list(ps.errors), execute_s=perf_counter() - start)
+    return result
+
+
+# jsonValue :: object -> object
+def jsonValue(value: object) -> object:
+    """
+    :param value: the value of a variable
+    :return: the value as it can be written in JSON, a float that is infinite or not a number becomes the string
+    "inf", "-inf" or "nan", which JSON has no number for
+    """
+    return repr(value) if type(value) == float and not math.isfinite(value) else value
+
+
+# runBatch :: [str] -> dict -> int -> TextIO -> Dict[str, int]
+def runBatch(programs: List[str], settings: dict, jobs: int, results: TextIO) -> Dict[str, int]:
+    """
+    Runs the programs of a batch on a pool of worker processes and writes the result of every program as one line of
+    JSON as soon as it is known, in the order of the programs.
+    :param programs: the paths of the programs
+    :param settings: dict with engine, optimize, strict, max_errors, timeout (seconds, 0 for none), use_cache and
+    cache_directory
+    :param jobs: the number of worker processes
+    :param results: where to write the results
+    :return: the number of programs with every status
+    """
+    statuses = {}
+    with multiprocessing.Pool(jobs, initializer=initWorker, initargs=(settings,)) as pool:
+        for result in pool.imap(runProgram, programs):
+            results.write(json.dumps(result, allow_nan=False) + "\n")
+            results.flush()
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    return statuses
+
+
+if __name__ == '__main__':
+    argParser = argparse.ArgumentParser(description="Runs a batch of ATP++ programs in parallel")
+    argParser.add_argument('sources', nargs='+',
+                           help="Directories (searched recursively), glob patterns, .atp++ files or manifests with "
+                                "one path per line")
+    argParser.add_argument('-r', '--results', type=str, help="JSON-lines file to write the results to (default: stdout)")
+    argParser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                           help="Number of worker processes (default: number of CPU cores)")
+    argParser.add_argument('--timeout', type=float, default=10.0,
+                           help="Seconds a program may run before it is stopped, 0 for no timeout (default: 10)")
+    argParser.add_argument('--engine', choices=["compiled", "reference"], default="compiled",
+                           help="Engine to run the programs with")
+    argParser.add_argument('-O', '--optimize', action='store_true',
+                           help="Optimize the programs before running them (compiled engine only)")
+    argParser.add_argument('--strict', action='store_true',
+                           help="Halt every program on its first error, so a broken program fails right away")
+    argParser.add_argument('--max-errors', type=int, help="Keep only this many errors of every program")
+    argParser.add_argument('--no-cache', action='store_true', help="Do not use or store parsed programs in the cache")
+    argParser.add_argument('--cache-dir', type=str,
+                           help="Directory to store parsed programs in (default: __atpcache__ next to every program)")
+    arguments = argParser.parse_args()
+    if arguments.optimize and arguments.engine != "compiled":
+        argParser.error("--optimize requires the compiled engine")
+    batch_programs = collectPrograms(arguments.sources)
+    batch_settings = {
+        "engine": arguments.engine,
+        "optimize": arguments.optimize,
+        "strict": arguments.strict,
+        "max_errors": arguments.max_errors,
+        "timeout": max(0.0, arguments.timeout),
+        "use_cache": not arguments.no_cache,
+        "cache_directory": arguments.cache_dir
+    }
+    results_file = open(arguments.results, "w") if arguments.results is not None else sys.stdout
+    try:
+        batch_statuses = runBatch(batch_programs, batch_settings, max(1, arguments.jobs), results_file)
+    finally:
+        if results_file is not sys.stdout:
+            results_file.close()
+    sys.stderr.write("{0} programs: {1}\n".format(len(batch_programs), ", ".join(map(
+        lambda item: "{0} {1}".format(item[1], item[0]), sorted(batch_statuses.items())))))
+    if any(map(lambda status: status != "ok", batch_statuses.keys())):
+        exit(1)
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import pickle
+from typing import Union
+
+import Lexer
+import Loader
+import Parser
+
+# Bump this whenever the layout of the cached programs changes.
+CACHE_FORMAT = 1
+
+# Name of the directory that holds the cached programs when they are stored next to their source file.
+CACHE_DIRECTORY = "__atpcache__"
+
+
+# fileHash :: str -> str
+def fileHash(path: str) -> str:
+    """
+    Computes the SHA-256 hash of the contents of a file, reading it in blocks so large files are never fully loaded.
+    :param path: path to the file
+    :return: hex digest of the contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# interpreterVersion :: None -> str
+def interpreterVersion() -> str:
+    """
+    Identifies the version of the interpreter that lexed a cached program. A cached program is only valid for the exact
+    lexer, loader and parser that produced it, so the version changes with the cache format and with any change to the
+    source of Lexer.py, Loader.py or Parser.py.
+    :return: the version string
+    """
+    digest = hashlib.sha256(str(CACHE_FORMAT).encode())
+    digest.update(fileHash(Lexer.__file__).encode())
+    digest.update(fileHash(Loader.__file__).encode())
+    digest.update(fileHash(Parser.__file__).encode())
+    return digest.hexdigest()
+
+
+# cachePath :: str -> Either str None -> str
+def cachePath(infile: str, cache_directory: Union[str, None] = None) -> str:
+    """
+    Finds the path of the cache file of a program. Without a cache directory the cache is stored in __atpcache__ next to
+    the program, the file name contains a hash of the full path of the program so programs with the same name in
+    different directories can share a cache directory.
+    :param infile: path to the ATP++ file
+    :param cache_directory: directory to store the cache in
+    :return: path to the cache file
+    """
+    full_path = os.path.abspath(infile)
+    directory = cache_directory if cache_directory is not None else \
+        os.path.join(os.path.dirname(full_path), CACHE_DIRECTORY)
+    name = "{0}.{1}.atpc".format(os.path.basename(full_path), hashlib.sha256(full_path.encode()).hexdigest()[:12])
+    return os.path.join(directory, name)
+
+
+# readCache :: str -> str -> str -> Either Parser.ProgramState None
+def readCache(path: str, source_hash: str, version: str) -> Union[Parser.ProgramState, None]:
+    """
+    Loads a cached program. The cache is only used when it was made from source with the same hash by the same version
+    of the interpreter, a missing, outdated or unreadable cache is ignored.
+    :param path: path to the cache file
+    :param source_hash: hash of the current source of the program
+    :param version: the current interpreter version
+    :return: ProgramState with the instructions and labels of the program or None when the cache can not be used
+    """
+    try:
+        with open(path, "rb") as file:
+            cached = pickle.load(file)
+    except Exception:
+        # Unpickling a damaged file can fail in many different ways, all of them just mean there is no usable cache.
+        return None
+    if type(cached) != dict or cached.get("source_hash") != source_hash or cached.get("version") != version:
+        return None
+    ps = Parser.ProgramState()
+    ps.instructions = cached["instructions"]
+    ps.labels = cached["labels"]
+    return ps
+
+
+# writeCache :: str -> str -> str -> Parser.ProgramState -> bool
+def writeCache(path: str, source_hash: str, version: str, ps: Parser.ProgramState) -> bool:
+    """
+    Stores a parsed program in the cache. The cache file is replaced atomically so a run that is interrupted, or another
+    run reading the cache at the same time, never sees half a cache file. Failing to write the cache is not an error.
+    :param path: path to the cache file
+    :param source_hash: hash of the source the program was parsed from
+    :param version: the current interpreter version
+    :param ps: ProgramState with the instructions and labels of the program
+    :return: whether the cache was written
+    """
+    temporary_path = "{0}.{1}.tmp".format(path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temporary_path, "wb") as file:
+            pickle.dump({
+                "version": version,
+                "source_hash": source_hash,
+                "instructions": ps.instructions,
+                "labels": ps.labels
+            }, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+        return True
+    except OSError:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        return False
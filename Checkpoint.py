@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import Compiler
+import Output
+
+# Bump this whenever the layout of the checkpoints changes.
+CHECKPOINT_FORMAT = 1
+
+
+class CheckpointError(Exception):
+    """
+    Raised when a checkpoint can not be used to resume a program, because it is damaged or belongs to another program.
+    """
+
+
+# programHash :: CompiledProgram -> str
+def programHash(program: Compiler.CompiledProgram) -> str:
+    """
+    Identifies a compiled program. A checkpoint holds positions in the compiled program and the slots of its
+    variables, so it can only be resumed by a program with exactly the same instructions (and optimizations).
+    :param program: the compiled program
+    :return: hex digest of the instructions and labels of the program
+    """
+    digest = hashlib.sha256(repr(program.instructions).encode())
+    digest.update(repr(sorted(program.labels.items())).encode())
+    return digest.hexdigest()
+
+
+# snapshotState :: CompiledProgram -> str -> MachineState -> int -> dict
+def snapshotState(program: Compiler.CompiledProgram, program_hash: str, state: Compiler.MachineState,
+                  executed: int) -> dict:
+    """
+    Takes a checkpoint of a running program. The output of the program is flushed first, so the output position in
+    the checkpoint is exactly where the program was. Only the state is copied, the program itself is identified by its
+    hash (see programHash).
+    :param program: the compiled program
+    :param program_hash: the hash of the program, see programHash
+    :param state: the machine state of the program, between two instructions
+    :param executed: the number of instructions executed so far
+    :return: the checkpoint, made of plain values only
+    """
+    state.output.flush()
+    return {
+        "format": CHECKPOINT_FORMAT,
+        "program": program_hash,
+        "position": state.current_pos,
+        "variables": list(map(lambda slot: [program.names[slot], state.slots[slot]], state.order)),
+        "warnings": list(state.warnings),
+        "errors": list(state.errors),
+        "output_writes": state.output.written,
+        "output_position": state.output.position(),
+        "executed": executed
+    }
+
+
+# writeCheckpoint :: str -> dict -> None
+def writeCheckpoint(path: str, checkpoint: dict) -> None:
+    """
+    Writes a checkpoint to a file as compact JSON. The file is replaced atomically so an interrupted run always leaves
+    the previous checkpoint or the new one behind.
+    :param path: path to the checkpoint file
+    :param checkpoint: the checkpoint, see snapshotState
+    :return: None
+    """
+    temporary_path = "{0}.{1}.tmp".format(path, os.getpid())
+    with open(temporary_path, "w") as file:
+        json.dump(checkpoint, file, separators=(",", ":"))
+    os.replace(temporary_path, path)
+
+
+# readCheckpoint :: str -> CompiledProgram -> dict
+def readCheckpoint(path: str, program: Compiler.CompiledProgram) -> dict:
+    """
+    Reads a checkpoint and makes sure it was taken from the given program.
+    :param path: path to the checkpoint file
+    :param program: the compiled program that is resumed
+    :return: the checkpoint, see snapshotState
+    """
+    try:
+        with open(path, "r") as file:
+            checkpoint = json.load(file)
+    except ValueError:
+        raise CheckpointError("The checkpoint {0} is damaged".format(path))
+    if type(checkpoint) != dict or checkpoint.get("format") != CHECKPOINT_FORMAT:
+        raise CheckpointError("The checkpoint {0} was written by another version of the interpreter".format(path))
+    if checkpoint.get("program") != programHash(program):
+        raise CheckpointError("The checkpoint {0} belongs to another program, or to the program compiled with other "
+                              "options".format(path))
+    return checkpoint
+
+
+# restoreState :: CompiledProgram -> dict -> OutputSink -> MachineState
+def restoreState(program: Compiler.CompiledProgram, checkpoint: dict, output: Output.OutputSink) -> \
+        Compiler.MachineState:
+    """
+    Makes the machine state a checkpoint was taken from, so the program continues after the last instruction it
+    executed before the checkpoint.
+    :param program: the compiled program, see readCheckpoint
+    :param checkpoint: the checkpoint
+    :param output: where the output of the rest of the program goes
+    :return: the machine state
+    """
+    slots = dict(map(lambda pair: (pair[1], pair[0]), enumerate(program.names)))
+    state = Compiler.MachineState(program, output)
+    for name, value in checkpoint["variables"]:
+        state.slots[slots[name]] = value
+        state.order.append(slots[name])
+    state.current_pos = checkpoint["position"]
+    state.warnings = list(checkpoint["warnings"])
+    state.errors = list(checkpoint["errors"])
+    output.written = checkpoint["output_writes"]
+    return state
+
+
+class Checkpointer:
+    """
+    Takes a checkpoint every every_instructions instructions or every every_seconds seconds, whichever comes first.
+    It is called between two chunks of instructions by Limits.executeCompiledLimited. The state is copied right away
+    but written to the file on a background thread, so the program does not wait for the disk. When the previous
+    checkpoint is still being written the next one is skipped.
+    """
+
+    def __init__(self, path: str, program: Compiler.CompiledProgram, every_instructions: int = None,
+                 every_seconds: float = None, executed: int = 0):
+        self.path = path
+        self.program = program
+        self.program_hash = programHash(program)
+        self.every_instructions = every_instructions
+        self.every_seconds = every_seconds
+        # Instructions executed before the run started, when it was resumed from a checkpoint.
+        self.executed = executed
+        self.last_executed = 0
+        self.last_time = perf_counter()
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.pending = None
+
+    def __call__(self, state: Compiler.MachineState, executed: int) -> None:
+        """
+        Takes a checkpoint when one is due.
+        :param state: the machine state of the program
+        :param executed: the number of instructions executed in this run so far
+        :return: None
+        """
+        due = (self.every_instructions is not None and executed - self.last_executed >= self.every_instructions) or \
+            (self.every_seconds is not None and perf_counter() - self.last_time >= self.every_seconds)
+        if not due or (self.pending is not None and not self.pending.done()):
+            return
+        self.last_executed = executed
+        self.last_time = perf_counter()
+        self.pending = self.writer.submit(
+            writeCheckpoint, self.path, snapshotState(self.program, self.program_hash, state, self.executed + executed))
+
+    def close(self, finished: bool) -> None:
+        """
+        Waits for the last checkpoint to be written, raising the error that kept it from being written if there was
+        one. The checkpoint of a program that finished is removed, as there is nothing left to resume.
+        :param finished: whether the program ran to completion
+        :return: None
+        """
+        self.writer.shutdown(wait=True)
+        if self.pending is not None:
+            self.pending.result()
+        if finished and os.path.exists(self.path):
+            os.remove(self.path)
+
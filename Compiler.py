@@ -0,0 +1,823 @@
+import operator
+from operator import length_hint
+from typing import Callable, Iterator, List, Tuple, Union
+
+import Errors
+import Lexer
+import Output
+import Parser
+import Verifier
+
+# A compiled instruction, it executes the instruction on the given machine state (changing it in place).
+Handler = Callable[["MachineState"], None]
+
+# An operand after resolving, either (True, slot of the variable) or (False, immediate value).
+Operand = Tuple[bool, Union[int, float, str]]
+
+# Value of a variable slot that has not been SET yet, this stands for a variable that does not exist.
+UNSET = object()
+
+# The comparison of every jump instruction by its keyword.
+COMPARISONS = {
+    "JE": operator.eq,
+    "JNE": operator.ne,
+    "JL": operator.lt,
+    "JG": operator.gt,
+    "JLE": operator.le,
+    "JGE": operator.ge,
+}
+
+# Largest magnitude up to which every integer is exactly representable as a float.
+EXACT_INTEGERS = 2 ** 53
+
+
+class CompiledProgram:
+    """
+    A program whose instructions have been turned into handlers that only have to be called to execute them.
+    Everything that is known about an instruction when the program is loaded (which instruction it is, which of its
+    operands are variables and which are immediate values and where its jump leads) is decided once by the compiler
+    instead of every time the instruction is executed.
+    Every variable name in the program is given a fixed slot, names holds the name of every slot.
+    lines holds the line in the source of every instruction, which differs from its position when the optimizer
+    removed instructions.
+    """
+
+    def __init__(self, code: List[Handler], labels: dict, instructions: List[Tuple[Lexer.Instruction, dict]],
+                 names: List[str], lines: List[int] = None):
+        self.code = code
+        self.labels = labels
+        self.instructions = instructions
+        self.names = names
+        self.lines = lines if lines is not None else list(range(len(code)))
+
+
+class MachineState:
+    """
+    Program state of a compiled program. The variables are stored in a list indexed by the slots the compiler gave
+    them, order holds the slots in the order the variables were first SET so the variables can be shown in the same
+    order as a ProgramState would.
+    """
+
+    def __init__(self, program: CompiledProgram, output: Output.OutputSink = None):
+        self.program = program
+        self.output = output if output is not None else Output.ConsoleSink()
+        self.slots = [UNSET] * len(program.names)
+        self.order = []
+        self.current_pos = -1
+        self.warnings = []
+        self.errors = []
+
+    def toProgramState(self) -> Parser.ProgramState:
+        """
+        Converts the machine state to a ProgramState, mapping the slots back to the names of the variables and the
+        program counter back to the line in the source.
+        :return: ProgramState
+        """
+        ps = Parser.ProgramState()
+        ps.variables = dict(map(lambda slot: (self.program.names[slot], self.slots[slot]), self.order))
+        lines = self.program.lines
+        ps.current_pos = lines[self.current_pos] if 0 <= self.current_pos < len(lines) else self.current_pos
+        ps.warnings = list(self.warnings)
+        ps.errors = self.errors.copy()
+        ps.instructions = self.program.instructions
+        ps.labels = self.program.labels
+        ps.output = self.output
+        return ps
+
+    def __str__(self) -> str:
+        return str(self.toProgramState())
+
+
+# isOperand :: Instruction -> str -> bool
+def isOperand(instruction: Lexer.Instruction, key: str) -> bool:
+    """
+    Checks whether a parameter of an instruction is a variable or immediate value, rather than a label.
+    :param instruction: the instruction the parameter belongs to
+    :param key: name of the parameter
+    :return: True if the parameter is an operand
+    """
+    return key in ("left", "right") or (key == "target" and not issubclass(instruction, Lexer.Jump))
+
+
+# isVariable :: Either str float int -> bool
+def isVariable(value: Union[str, float, int]) -> bool:
+    """
+    Checks whether an operand is the name of a variable, rather than an immediate value or string.
+    :param value: the operand
+    :return: True if the operand names a variable
+    """
+    return type(value) == str and not (len(value) > 1 and value[0] == '"' and value[-1] == '"')
+
+
+# flattenTokens :: [Tuple[Instruction, dict]] -> Iterator[Tuple[Instruction, dict]]
+def flattenTokens(tokens: List[Tuple[Lexer.Instruction, dict]]) -> Iterator[Tuple[Lexer.Instruction, dict]]:
+    """
+    Goes over the instructions of a program and the instructions that are part of its superinstructions.
+    :param tokens: the instructions of the program
+    :return: iterator over every instruction
+    """
+    for token in tokens:
+        yield token
+        yield from flattenTokens(token[1].get("parts", []))
+
+
+# assignSlots :: [Tuple[Instruction, dict]] -> dict
+def assignSlots(tokens: List[Tuple[Lexer.Instruction, dict]]) -> dict:
+    """
+    Gives every variable name used in the program a slot, in the order the names first appear in the program.
+    :param tokens: the instructions of the program
+    :return: dict with the variable names as keys and their slots as values
+    """
+    names = dict.fromkeys(
+        value
+        for instruction, parameters in flattenTokens(tokens)
+        for key, value in parameters.items()
+        if isOperand(instruction, key) and isVariable(value)
+    )
+    return dict(map(lambda pair: (pair[1], pair[0]), enumerate(names)))
+
+
+# resolveOperands :: Instruction -> dict -> dict -> dict
+def resolveOperands(instruction: Lexer.Instruction, parameters: dict, slots: dict) -> dict:
+    """
+    Rewrites the operands of an instruction to slots or tagged immediate values, labels are kept as they are.
+    :param instruction: the instruction the parameters belong to
+    :param parameters: parameters of the instruction
+    :param slots: the slots of the variables
+    :return: the parameters with the operands resolved
+    """
+    return dict(map(
+        lambda kv: (kv[0], ((True, slots[kv[1]]) if isVariable(kv[1]) else (False, kv[1])))
+        if isOperand(instruction, kv[0]) else kv,
+        parameters.items()
+    ))
+
+
+# compileNop :: dict -> int -> dict -> [str] -> Handler
+def compileNop(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles instructions that do nothing when executed (NOP and DECL).
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    return lambda state: None
+
+
+# compileSet :: dict -> int -> dict -> [str] -> Handler
+def compileSet(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the SET instruction, see Parser.setVariable.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    target = operands["target"][1]
+    right_is_variable, right = operands["right"] if "right" in operands.keys() else (False, 0)
+
+    # setVariable :: MachineState -> None
+    def setVariable(state: MachineState) -> None:
+        slots = state.slots
+        value = slots[right] if right_is_variable else right
+        if value is UNSET:
+            state.errors.append("Unknown variable {0} on line {1}".format(names[right], position))
+            value = None
+        if slots[target] is UNSET:
+            state.order.append(target)
+        slots[target] = value
+
+    return setVariable
+
+
+# compileStep :: int -> dict -> int -> dict -> [str] -> Handler
+def compileStep(step: int, operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the INC and DEC instructions, see Parser.incrementVariable and Parser.decrementVariable.
+    :param step: the amount that is added to the target
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    target = operands["target"][1]
+    instruction = "INC" if step > 0 else "DEC"
+
+    # stepVariable :: MachineState -> None
+    def stepVariable(state: MachineState) -> None:
+        slots = state.slots
+        value = slots[target]
+        if value is UNSET:
+            state.errors.append(
+                "Unknown variable {0} on line {1} for instruction {2}".format(names[target], position, instruction))
+            return
+        if value is None:
+            return
+        slots[target] = value + step
+
+    return stepVariable
+
+
+# compileArithmetic :: str -> Callable -> bool -> dict -> int -> dict -> [str] -> Handler
+def compileArithmetic(instruction: str, function: Callable, divides: bool, operands: dict, position: int,
+                      labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the arithmetic instructions, see Parser.checkFuncArguments and the functions that use it.
+    :param instruction: which instruction is compiled for error messaging
+    :param function: the operation that computes the result from the left and right operand
+    :param divides: whether the operation fails when the right operand is zero
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    target = operands["target"][1]
+    right_is_variable, right = operands["right"]
+    # The simple variant uses the target as the left operand.
+    left_is_variable, left = operands["left"] if "left" in operands.keys() else operands["target"]
+
+    # arithmetic :: MachineState -> None
+    def arithmetic(state: MachineState) -> None:
+        slots = state.slots
+        if slots[target] is UNSET:
+            state.errors.append(
+                "Unknown variable {0} on line {1} for instruction {2}".format(names[target], position, instruction))
+            return
+        right_value = slots[right] if right_is_variable else right
+        if right_value is UNSET:
+            state.errors.append("Unknown variable {0} on line {1}".format(names[right], position))
+            right_value = None
+        left_value = slots[left] if left_is_variable else left
+        if left_value is UNSET:
+            state.errors.append("Unknown variable {0} on line {1}".format(names[left], position))
+            left_value = None
+        if left_value is None or right_value is None:
+            return
+        if divides and right_value == 0:
+            state.errors.append("Division by zero on line {0}".format(position))
+            return
+        slots[target] = function(left_value, right_value)
+
+    return arithmetic
+
+
+# compileJump :: str -> Callable -> dict -> int -> dict -> [str] -> Handler
+def compileJump(instruction: str, comparison: Callable, operands: dict, position: int, labels: dict,
+                names: List[str]) -> Handler:
+    """
+    Compiles the jump instructions, see Parser.checkJumpArguments and the functions that use it.
+    :param instruction: which instruction is compiled for error messaging
+    :param comparison: the comparison between the left and right operand that decides whether the jump is taken
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    target = operands["target"]
+    # Jumps of a loaded program already lead to a position, see Parser.resolveJumps
+    destination = target if type(target) == int else labels.get(target)
+    if destination is None:
+        # unknownLabel :: MachineState -> None
+        def unknownLabel(state: MachineState) -> None:
+            state.errors.append("Unknown label {0} on line {1}".format(target, position))
+
+        return unknownLabel
+    right_is_variable, right = operands["right"]
+    # The simple variant compares the right operand with 0.
+    left_is_variable, left = operands["left"] if "left" in operands.keys() else (False, 0)
+
+    # jump :: MachineState -> None
+    def jump(state: MachineState) -> None:
+        slots = state.slots
+        right_value = slots[right] if right_is_variable else right
+        if right_value is UNSET:
+            state.errors.append("Unknown variable {0} on line {1}".format(names[right], position))
+            right_value = None
+        left_value = slots[left] if left_is_variable else left
+        if left_value is UNSET:
+            state.errors.append("Unknown variable {0} on line {1}".format(names[left], position))
+            left_value = None
+        if left_value is None or right_value is None:
+            return
+        if comparison(left_value, right_value):
+            state.current_pos = destination
+
+    return jump
+
+
+# compilePrint :: dict -> int -> dict -> [str] -> Handler
+def compilePrint(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the PRINT instruction, see Parser.checkPrintParameters and Parser.ATPPrint.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    right_is_variable, right = operands["right"]
+    if not right_is_variable:
+        line = "> {}\n".format(right)
+        return lambda state: state.output.write(line)
+
+    # printVariable :: MachineState -> None
+    def printVariable(state: MachineState) -> None:
+        value = state.slots[right]
+        if value is UNSET:
+            state.errors.append("Unknown variable {0} on line {1}".format(names[right], position))
+            value = None
+        if value is None:
+            state.errors.append("Incorrect parameter for PRINT on line {0}".format(position))
+            return
+        state.output.write("> {}\n".format(value))
+
+    return printVariable
+
+
+# compileDump :: dict -> int -> dict -> [str] -> Handler
+def compileDump(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the DUMP instruction, see Parser.ATPDump.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    # dump :: MachineState -> None
+    def dump(state: MachineState) -> None:
+        state.output.write(
+            "-------------DUMPING PROGRAM STATE-------------\n{0}\n-----------END DUMPING PROGRAM STATE-----------\n"
+            .format(state))
+
+    return dump
+
+
+# compileGoto :: dict -> int -> dict -> [str] -> Handler
+def compileGoto(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the GOTO superinstruction, a jump that is always taken.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    destination = operands["target"]
+
+    # goto :: MachineState -> None
+    def goto(state: MachineState) -> None:
+        state.current_pos = destination
+
+    return goto
+
+
+# compileCompareBranch :: dict -> int -> dict -> [str] -> Handler
+def compileCompareBranch(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the BRANCH superinstruction, a jump that compares a variable with a constant.
+    It behaves like compileJump, an unknown variable is an error and a variable without a value never jumps.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    destination = operands["target"]
+    comparison = COMPARISONS[operands["comparison"]]
+    left = operands["left"][1]
+    right = operands["right"][1]
+
+    # compareBranch :: MachineState -> None
+    def compareBranch(state: MachineState) -> None:
+        value = state.slots[left]
+        if value is UNSET:
+            state.errors.append("Unknown variable {0} on line {1}".format(names[left], position))
+            return
+        if value is not None and comparison(value, right):
+            state.current_pos = destination
+
+    return compareBranch
+
+
+# compileStepBranch :: dict -> int -> dict -> [str] -> Handler
+def compileStepBranch(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the STEPBRANCH superinstruction, an INC or DEC followed by a jump that compares the changed variable with
+    a constant. The jump itself stays in the program after it, so the handler continues after the jump (at following)
+    when it is not taken and at the jump when the variable has no value.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    target = operands["target"][1]
+    step = operands["step"]
+    destination = operands["jump"]
+    comparison = COMPARISONS[operands["comparison"]]
+    right = operands["right"][1]
+    following = operands["following"]
+    # Steps a variable without a value like an INC or DEC would, the jump after it then reports the variable itself.
+    fallback = compileStep(step, {"target": operands["target"]}, position, labels, names)
+
+    # stepBranch :: MachineState -> None
+    def stepBranch(state: MachineState) -> None:
+        slots = state.slots
+        value = slots[target]
+        if value is UNSET or value is None:
+            fallback(state)
+            return
+        value = value + step
+        slots[target] = value
+        state.current_pos = destination if comparison(value, right) else following
+
+    return stepBranch
+
+
+# loopIterations :: str -> int -> int -> int -> int -> Either int None
+def loopIterations(comparison: str, value: int, step: int, bound: int, first: int) -> Union[int, None]:
+    """
+    Finds after how many steps a comparison with a bound first holds for a variable that changes by the same step
+    every time.
+    :param comparison: keyword of the jump that makes the comparison
+    :param value: starting value of the variable
+    :param step: the change of the variable per step
+    :param bound: the value the variable is compared with
+    :param first: the first number of steps after which the comparison is made
+    :return: the smallest number of steps from first on after which comparison(value + steps * step, bound) holds or
+    None if the comparison never holds
+    """
+    holds = lambda steps: COMPARISONS[comparison](value + steps * step, bound)
+    if holds(first):
+        return first
+    if step == 0:
+        return None
+    if comparison == "JE":
+        if (bound - value) % step != 0:
+            return None
+        steps = (bound - value) // step
+    elif comparison == "JNE":
+        # The variable equals the bound after the first steps, so it differs one step later.
+        steps = first + 1
+    elif comparison in ("JL", "JLE"):
+        if step > 0:
+            return None
+        steps = (value - bound) // -step + 1 if comparison == "JL" else -((bound - value) // -step)
+    else:
+        if step < 0:
+            return None
+        steps = (bound - value) // step + 1 if comparison == "JG" else -((value - bound) // step)
+    return steps if steps >= first and holds(steps) else None
+
+
+# compileLoop :: dict -> int -> dict -> [str] -> Handler
+def compileLoop(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the LOOP superinstruction, a loop whose body only adds constants to variables and that ends when a
+    variable passes a constant. The number of iterations is worked out from the values of the variables and all of
+    them are updated at once. The loop is only run like that when every variable holds an integer and every value it
+    goes through is exactly representable, otherwise (and when the loop would never end) only the first instruction
+    of the loop is executed by its own handler and the loop is run step by step.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    slots = dict(map(lambda pair: (pair[1], pair[0]), enumerate(names)))
+    instruction, parameters = operands["parts"][0]
+    fallback = COMPILERS[instruction](resolveOperands(instruction, parameters, slots), position, labels, names)
+    test = operands["left"][1]
+    comparison = operands["comparison"]
+    bound = int(operands["right"][1])
+    first = operands["first"]
+    destination = operands["jump"]
+    updates = list(map(lambda update: (slots[update[0]], update[1], update[2]), operands["updates"]))
+    test_step = sum(map(lambda update: update[1], filter(lambda update: update[0] == test, updates)))
+    checked = list(dict.fromkeys([test] + list(map(lambda update: update[0], updates))))
+    margin = EXACT_INTEGERS - operands["spread"]
+
+    # loop :: MachineState -> None
+    def loop(state: MachineState) -> None:
+        values = state.slots
+        for slot in checked:
+            value = values[slot]
+            if type(value) not in (int, float) or not float(value).is_integer():
+                fallback(state)
+                return
+        iterations = loopIterations(comparison, int(values[test]), test_step, bound, first)
+        if iterations is None or any(map(
+                lambda update: abs(values[update[0]]) + iterations * abs(update[1]) >= margin, updates)):
+            fallback(state)
+            return
+        if iterations > 0:
+            for slot, step, converts in updates:
+                values[slot] = float(values[slot] + iterations * step) if converts else values[slot] + iterations * step
+        state.current_pos = destination
+
+    return loop
+
+
+# compileSequence :: dict -> int -> dict -> [str] -> Handler
+def compileSequence(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles the SEQUENCE superinstruction, a run of instructions without labels in between that are executed by one
+    handler. Only the last instruction of the run can jump, the program counter is moved to it before it is executed.
+    The instructions after the first keep their own handlers, so the program can still be continued halfway a run.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    slots = dict(map(lambda pair: (pair[1], pair[0]), enumerate(names)))
+    parts = operands["parts"]
+    handlers = list(map(
+        lambda part: compileToken(part[1], part[0], part[2], labels, names, slots),
+        zip(operands["lines"], parts, operands["verified"])
+    ))
+    kept = list(filter(lambda pair: pair[1][0] != Lexer.Nop, enumerate(parts[:-1])))
+    body = list(map(lambda pair: handlers[pair[0]], kept))
+    # How far every handler of the body is from the start of the run, for a run that halts halfway, see
+    # Errors.ErrorLog.
+    offsets = list(map(lambda pair: pair[0], kept))
+    last = handlers[-1]
+    end = operands["end"]
+
+    # sequence :: MachineState -> None
+    def sequence(state: MachineState) -> None:
+        remaining = iter(body)
+        try:
+            for handler in remaining:
+                handler(state)
+        except Errors.ProgramHalted:
+            state.current_pos += offsets[len(body) - length_hint(remaining) - 1]
+            raise
+        state.current_pos = end
+        last(state)
+
+    return sequence
+
+
+# compileFastSet :: dict -> int -> dict -> [str] -> Handler
+def compileFastSet(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles a SET of which the verifier proved the right operand holds a number, see compileSet.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    target = operands["target"][1]
+    right_is_variable, right = operands["right"] if "right" in operands.keys() else (False, 0)
+
+    # fastSet :: MachineState -> None
+    def fastSet(state: MachineState) -> None:
+        slots = state.slots
+        if slots[target] is UNSET:
+            state.order.append(target)
+        slots[target] = slots[right] if right_is_variable else right
+
+    return fastSet
+
+
+# compileFastStep :: int -> dict -> int -> dict -> [str] -> Handler
+def compileFastStep(step: int, operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles an INC or DEC of which the verifier proved the target holds a number, see compileStep.
+    :param step: the amount that is added to the target
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    target = operands["target"][1]
+
+    # fastStep :: MachineState -> None
+    def fastStep(state: MachineState) -> None:
+        state.slots[target] += step
+
+    return fastStep
+
+
+# compileFastArithmetic :: Callable -> bool -> dict -> int -> dict -> [str] -> Handler
+def compileFastArithmetic(function: Callable, divides: bool, operands: dict, position: int, labels: dict,
+                          names: List[str]) -> Handler:
+    """
+    Compiles an arithmetic instruction of which the verifier proved every operand holds a number, see
+    compileArithmetic. Only a division by a variable still checks for zero.
+    :param function: the operation that computes the result from the left and right operand
+    :param divides: whether the operation fails when the right operand is zero
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    target = operands["target"][1]
+    right_is_variable, right = operands["right"]
+    left_is_variable, left = operands["left"] if "left" in operands.keys() else operands["target"]
+    if divides and (right_is_variable or right == 0):
+        # fastDivision :: MachineState -> None
+        def fastDivision(state: MachineState) -> None:
+            slots = state.slots
+            right_value = slots[right] if right_is_variable else right
+            if right_value == 0:
+                state.errors.append("Division by zero on line {0}".format(position))
+                return
+            slots[target] = function(slots[left] if left_is_variable else left, right_value)
+
+        return fastDivision
+
+    # fastArithmetic :: MachineState -> None
+    def fastArithmetic(state: MachineState) -> None:
+        slots = state.slots
+        slots[target] = function(slots[left] if left_is_variable else left,
+                                 slots[right] if right_is_variable else right)
+
+    return fastArithmetic
+
+
+# compileFastJump :: Callable -> dict -> int -> dict -> [str] -> Handler
+def compileFastJump(comparison: Callable, operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles a jump of which the verifier proved every operand holds a number and the label exists, see compileJump.
+    :param comparison: the comparison between the left and right operand that decides whether the jump is taken
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    destination = operands["target"]
+    right_is_variable, right = operands["right"]
+    left_is_variable, left = operands["left"] if "left" in operands.keys() else (False, 0)
+
+    # fastJump :: MachineState -> None
+    def fastJump(state: MachineState) -> None:
+        slots = state.slots
+        if comparison(slots[left] if left_is_variable else left, slots[right] if right_is_variable else right):
+            state.current_pos = destination
+
+    return fastJump
+
+
+# compileFastPrint :: dict -> int -> dict -> [str] -> Handler
+def compileFastPrint(operands: dict, position: int, labels: dict, names: List[str]) -> Handler:
+    """
+    Compiles a PRINT of which the verifier proved the variable holds a number, see compilePrint.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: handler for the instruction
+    """
+    right_is_variable, right = operands["right"]
+    if not right_is_variable:
+        return compilePrint(operands, position, labels, names)
+    return lambda state: state.output.write("> {}\n".format(state.slots[right]))
+
+
+# The function that compiles each instruction, with the instruction specific arguments already bound.
+COMPILERS = {
+    Lexer.SetSimple: compileSet,
+    Lexer.Set: compileSet,
+    Lexer.Declare: compileNop,
+    Lexer.Nop: compileNop,
+    Lexer.Increment: lambda *args: compileStep(1, *args),
+    Lexer.Decrement: lambda *args: compileStep(-1, *args),
+    Lexer.AddSimple: lambda *args: compileArithmetic("ADD", operator.add, False, *args),
+    Lexer.Add: lambda *args: compileArithmetic("ADD", operator.add, False, *args),
+    Lexer.SubtractSimple: lambda *args: compileArithmetic("SUB", operator.sub, False, *args),
+    Lexer.Subtract: lambda *args: compileArithmetic("SUB", operator.sub, False, *args),
+    Lexer.MultiplySimple: lambda *args: compileArithmetic("MUL", operator.mul, False, *args),
+    Lexer.Multiply: lambda *args: compileArithmetic("MUL", operator.mul, False, *args),
+    Lexer.DivideSimple: lambda *args: compileArithmetic("DIV", operator.truediv, True, *args),
+    Lexer.Divide: lambda *args: compileArithmetic("DIV", operator.truediv, True, *args),
+    # The interpreter has always reported argument errors of MOD as errors of DIV.
+    Lexer.ModuloSimple: lambda *args: compileArithmetic("DIV", operator.mod, True, *args),
+    Lexer.Modulo: lambda *args: compileArithmetic("DIV", operator.mod, True, *args),
+    Lexer.JumpEqualSimple: lambda *args: compileJump("JE", operator.eq, *args),
+    Lexer.JumpEqual: lambda *args: compileJump("JE", operator.eq, *args),
+    Lexer.JumpNotEqualSimple: lambda *args: compileJump("JNE", operator.ne, *args),
+    Lexer.JumpNotEqual: lambda *args: compileJump("JNE", operator.ne, *args),
+    Lexer.JumpLessThanSimple: lambda *args: compileJump("JL", operator.lt, *args),
+    Lexer.JumpLessThan: lambda *args: compileJump("JL", operator.lt, *args),
+    Lexer.JumpGreaterThanSimple: lambda *args: compileJump("JG", operator.gt, *args),
+    Lexer.JumpGreaterThan: lambda *args: compileJump("JG", operator.gt, *args),
+    Lexer.JumpLessOrEqualSimple: lambda *args: compileJump("JLE", operator.le, *args),
+    Lexer.JumpLessOrEqual: lambda *args: compileJump("JLE", operator.le, *args),
+    Lexer.JumpGreaterOrEqualSimple: lambda *args: compileJump("JGE", operator.ge, *args),
+    Lexer.JumpGreaterOrEqual: lambda *args: compileJump("JGE", operator.ge, *args),
+    Lexer.Print: compilePrint,
+    Lexer.Dump: compileDump,
+    Lexer.Goto: compileGoto,
+    Lexer.CompareBranch: compileCompareBranch,
+    Lexer.StepBranch: compileStepBranch,
+    Lexer.Sequence: compileSequence,
+    Lexer.Loop: compileLoop,
+}
+
+
+# The function that compiles each instruction the verifier proved safe, instructions that are not in here are compiled
+# by COMPILERS whether they are safe or not.
+FAST_COMPILERS = {
+    Lexer.SetSimple: compileFastSet,
+    Lexer.Set: compileFastSet,
+    Lexer.Increment: lambda *args: compileFastStep(1, *args),
+    Lexer.Decrement: lambda *args: compileFastStep(-1, *args),
+    Lexer.AddSimple: lambda *args: compileFastArithmetic(operator.add, False, *args),
+    Lexer.Add: lambda *args: compileFastArithmetic(operator.add, False, *args),
+    Lexer.SubtractSimple: lambda *args: compileFastArithmetic(operator.sub, False, *args),
+    Lexer.Subtract: lambda *args: compileFastArithmetic(operator.sub, False, *args),
+    Lexer.MultiplySimple: lambda *args: compileFastArithmetic(operator.mul, False, *args),
+    Lexer.Multiply: lambda *args: compileFastArithmetic(operator.mul, False, *args),
+    Lexer.DivideSimple: lambda *args: compileFastArithmetic(operator.truediv, True, *args),
+    Lexer.Divide: lambda *args: compileFastArithmetic(operator.truediv, True, *args),
+    Lexer.ModuloSimple: lambda *args: compileFastArithmetic(operator.mod, True, *args),
+    Lexer.Modulo: lambda *args: compileFastArithmetic(operator.mod, True, *args),
+    Lexer.JumpEqualSimple: lambda *args: compileFastJump(operator.eq, *args),
+    Lexer.JumpEqual: lambda *args: compileFastJump(operator.eq, *args),
+    Lexer.JumpNotEqualSimple: lambda *args: compileFastJump(operator.ne, *args),
+    Lexer.JumpNotEqual: lambda *args: compileFastJump(operator.ne, *args),
+    Lexer.JumpLessThanSimple: lambda *args: compileFastJump(operator.lt, *args),
+    Lexer.JumpLessThan: lambda *args: compileFastJump(operator.lt, *args),
+    Lexer.JumpGreaterThanSimple: lambda *args: compileFastJump(operator.gt, *args),
+    Lexer.JumpGreaterThan: lambda *args: compileFastJump(operator.gt, *args),
+    Lexer.JumpLessOrEqualSimple: lambda *args: compileFastJump(operator.le, *args),
+    Lexer.JumpLessOrEqual: lambda *args: compileFastJump(operator.le, *args),
+    Lexer.JumpGreaterOrEqualSimple: lambda *args: compileFastJump(operator.ge, *args),
+    Lexer.JumpGreaterOrEqual: lambda *args: compileFastJump(operator.ge, *args),
+    Lexer.Print: compileFastPrint,
+}
+
+
+# compileToken :: Tuple[Instruction, dict] -> int -> bool -> dict -> [str] -> dict -> Handler
+def compileToken(token: Tuple[Lexer.Instruction, dict], position: int, verified: bool, labels: dict,
+                 names: List[str], slots: dict) -> Handler:
+    """
+    Compiles a single instruction, without the checks of the interpreter when the verifier proved it safe.
+    :param token: the instruction with its parameters
+    :param position: position of the instruction in the program
+    :param verified: whether the instruction was proven safe, see Verifier.verifyProgram
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :param slots: the slots of the variables
+    :return: handler for the instruction
+    """
+    instruction, parameters = token
+    compilers = FAST_COMPILERS if verified and instruction in FAST_COMPILERS.keys() else COMPILERS
+    return compilers[instruction](resolveOperands(instruction, parameters, slots), position, labels, names)
+
+
+# compileProgram :: ProgramState -> CompiledProgram
+def compileProgram(ps: Parser.ProgramState) -> CompiledProgram:
+    """
+    Compiles the instructions of a parsed program to handlers, every variable is given a slot first so the handlers
+    can read and write a list instead of looking up the variables by name.
+    Every handler is given the line of its instruction in the source as position, for its error messages.
+    The program is verified first (see Verifier.verifyProgram) unless it already was, the instructions that are proven
+    safe run without the checks of the interpreter.
+    :param ps: program state with the instructions and labels of the program
+    :return: the compiled program
+    """
+    slots = assignSlots(ps.instructions)
+    names = list(slots.keys())
+    lines = ps.lines if ps.lines is not None else list(range(len(ps.instructions)))
+    verified = ps.verified if ps.verified is not None else Verifier.verifyProgram(ps.instructions).safe
+    code = list(map(
+        lambda token: compileToken(token[1], token[0], token[2], ps.labels, names, slots),
+        zip(lines, ps.instructions, verified)
+    ))
+    return CompiledProgram(code, ps.labels, ps.instructions, names, lines)
+
+
+# executeCompiled :: CompiledProgram -> MachineState -> MachineState
+def executeCompiled(program: CompiledProgram, state: MachineState) -> MachineState:
+    """
+    Runs a compiled program from the given machine state until the program counter reaches the last instruction.
+    The machine state is changed in place, the handler of every instruction is called without any other dispatching.
+    When the errors are a strict Errors.ErrorLog the run halts on the first error, with the program counter on the
+    instruction that reported it.
+    :param program: the compiled program
+    :param state: machine state to start from
+    :return: the machine state after executing the program to completion, or up to its first error in a strict run
+    """
+    code = program.code
+    last = len(code) - 1
+    try:
+        while state.current_pos != last:
+            state.current_pos += 1
+            code[state.current_pos](state)
+    except Errors.ProgramHalted:
+        pass
+    return state
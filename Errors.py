@@ -0,0 +1,72 @@
+from typing import Iterable
+
+
+class ProgramHalted(Exception):
+    """
+    Raised by a strict ErrorLog when the first error is reported. The handler that reports the error stops right there,
+    before it changes anything, and the engines catch it to return the state the program reached.
+    """
+
+    def __init__(self, error: str, errors: "ErrorLog"):
+        super().__init__(error)
+        self.error = error
+        self.errors = errors
+
+    def __reduce__(self) -> tuple:
+        # An exception is pickled with only the arguments of Exception.__init__, which is not enough to create it
+        # again when a worker process sends it back.
+        return ProgramHalted, (self.error, self.errors)
+
+
+class ErrorLog(list):
+    """
+    The errors of a run, used instead of a plain list to choose what happens when a handler reports an error.
+    - strict: the run halts on the first error, see ProgramHalted
+    - max_errors: only the first max_errors errors are kept, followed by a note that the rest were left out (lenient
+      runs only, None keeps every error)
+    The handlers report errors with append like they would to a plain list, so the engines are not slowed down by
+    either policy.
+    """
+
+    def __init__(self, strict: bool = False, max_errors: int = None, errors: Iterable[str] = ()):
+        super().__init__(errors)
+        self.strict = strict
+        self.max_errors = max_errors
+        self.halted = False
+
+    def append(self, error: str) -> None:
+        """
+        Reports an error.
+        :param error: the error message
+        :return: None
+        """
+        if self.max_errors is not None and len(self) >= self.max_errors:
+            if len(self) == self.max_errors:
+                super().append("Only the first {0} errors are kept, the rest are left out".format(self.max_errors))
+            return
+        super().append(error)
+        if self.strict:
+            self.halted = True
+            raise ProgramHalted(error, self)
+
+    def copy(self) -> "ErrorLog":
+        """
+        :return: a copy of the errors that keeps the policy and whether the run halted
+        """
+        errors = ErrorLog(self.strict, self.max_errors, self)
+        errors.halted = self.halted
+        return errors
+
+    def __deepcopy__(self, memo: dict) -> "ErrorLog":
+        # The errors are strings, so a shallow copy is as deep as it gets. copy.deepcopy would rebuild the list with
+        # append, which halts a strict log that already holds an error.
+        return self.copy()
+
+
+# isHalted :: [str] -> bool
+def isHalted(errors: list) -> bool:
+    """
+    :param errors: the errors of a program state or machine state
+    :return: whether the run halted on its first error
+    """
+    return isinstance(errors, ErrorLog) and errors.halted
@@ -0,0 +1,515 @@
+import json
+from typing import Callable, List, Tuple, Union
+
+import Compiler
+import Errors
+import Lexer
+import Output
+import Parser
+
+try:
+    import numpy
+except ImportError:
+    # NumPy is only needed to run lanes, everything else works without it.
+    numpy = None
+
+# What a lane holds in a variable slot: nothing (the variable is not SET), a number that is kept in the arrays, or any
+# other value (None after an error, or an integer too large to be exact as a float) that is kept in LaneMachine.boxed.
+UNSET_LANE = 0
+NUMBER_LANE = 1
+BOXED_LANE = 2
+
+# A vectorized instruction, it executes the instruction for the given lanes (changing the machine in place) and
+# returns the lanes it could not execute, which are executed one by one by the handler of the compiled program.
+LaneHandler = Callable[["LaneMachine", "numpy.ndarray"], "numpy.ndarray"]
+
+
+class LaneError(Exception):
+    """
+    Raised when the initial states of the lanes can not be used to run a program.
+    """
+
+
+class LaneMachine:
+    """
+    Machine state of many runs of one compiled program at once, one lane per run. Every variable slot is a row of
+    values with a column per lane: the values as floats, whether they are integers, what the lane holds in the slot
+    (see NUMBER_LANE) and when the lane first SET it, which gives the order of the variables of a lane.
+    positions holds the program counter of every lane, so lanes that jump elsewhere simply continue at another
+    position. Every lane has its own warnings and errors, and the PRINTs are collected in writes until the run is
+    finished.
+    Integers are exact in a float up to Compiler.EXACT_INTEGERS, so the arrays give the same results as the compiled
+    program as long as every integer stays below that, larger integers are boxed.
+    """
+
+    def __init__(self, program: Compiler.CompiledProgram, lanes: int, errors: Callable[[], List[str]]):
+        shape = (len(program.names), lanes)
+        self.program = program
+        self.values = numpy.zeros(shape)
+        self.integral = numpy.zeros(shape, dtype=bool)
+        self.kinds = numpy.zeros(shape, dtype=numpy.int8)
+        self.stamps = numpy.zeros(shape, dtype=numpy.int64)
+        self.boxed = {}
+        self.positions = numpy.full(lanes, -1, dtype=numpy.int64)
+        self.executed = numpy.zeros(lanes, dtype=numpy.int64)
+        self.halted = numpy.zeros(lanes, dtype=bool)
+        self.warnings = list(map(lambda lane: [], range(lanes)))
+        self.errors = list(map(lambda lane: errors(), range(lanes)))
+        self.writes = []
+        # Counts the steps of the run, a variable SET in a later step comes later in the order of its lane.
+        self.clock = 0
+
+    def operand(self, operand: Compiler.Operand, lanes: "numpy.ndarray") -> Tuple[Union["numpy.ndarray", float, int],
+                                                                                 Union["numpy.ndarray", bool],
+                                                                                 Union["numpy.ndarray", bool]]:
+        """
+        :param operand: the operand, see Compiler.resolveOperands
+        :param lanes: the lanes to read the operand of
+        :return: the values of the operand, whether they are numbers and whether they are integers, a single value
+        for an immediate value
+        """
+        is_variable, value = operand
+        if not is_variable:
+            return value, True, type(value) == int
+        return self.values[value, lanes], self.kinds[value, lanes] == NUMBER_LANE, self.integral[value, lanes]
+
+    def store(self, target: int, lanes: "numpy.ndarray", values: "numpy.ndarray", integral: "numpy.ndarray") -> None:
+        """
+        Sets a variable to a number in the given lanes.
+        :param target: slot of the variable
+        :param lanes: the lanes to set the variable in
+        :param values: the numbers
+        :param integral: whether the numbers are integers
+        :return: None
+        """
+        kinds = self.kinds[target, lanes]
+        list(map(lambda lane: self.boxed.pop((target, lane)), lanes[kinds == BOXED_LANE].tolist()))
+        self.stamps[target, lanes[kinds == UNSET_LANE]] = self.clock
+        self.kinds[target, lanes] = NUMBER_LANE
+        self.values[target, lanes] = values
+        self.integral[target, lanes] = integral
+
+    def laneValue(self, slot: int, lane: int) -> object:
+        """
+        :param slot: slot of the variable
+        :param lane: the lane
+        :return: the value of the variable in the lane like a MachineState holds it, Compiler.UNSET if it is not SET
+        """
+        kind = self.kinds[slot, lane]
+        if kind == UNSET_LANE:
+            return Compiler.UNSET
+        if kind == BOXED_LANE:
+            return self.boxed[(slot, lane)]
+        value = self.values[slot, lane].item()
+        return int(value) if self.integral[slot, lane] else value
+
+    def setLaneValue(self, slot: int, lane: int, value: object) -> None:
+        """
+        Sets a variable in a single lane to any value.
+        :param slot: slot of the variable
+        :param lane: the lane
+        :param value: the value of the variable like a MachineState holds it
+        :return: None
+        """
+        if self.kinds[slot, lane] == BOXED_LANE:
+            del self.boxed[(slot, lane)]
+        if self.kinds[slot, lane] == UNSET_LANE:
+            self.stamps[slot, lane] = self.clock
+        if value is Compiler.UNSET:
+            self.kinds[slot, lane] = UNSET_LANE
+        elif isExact(value):
+            self.kinds[slot, lane] = NUMBER_LANE
+            self.values[slot, lane] = value
+            self.integral[slot, lane] = type(value) == int
+        else:
+            self.kinds[slot, lane] = BOXED_LANE
+            self.boxed[(slot, lane)] = value
+
+    def laneState(self, lane: int, output: Output.OutputSink) -> Compiler.MachineState:
+        """
+        :param lane: the lane
+        :param output: where the output of the machine state goes
+        :return: a machine state of the compiled program with the variables, program counter, warnings and errors of
+        the lane, the warnings and errors are shared with the lane
+        """
+        state = Compiler.MachineState(self.program, output)
+        state.slots = list(map(lambda slot: self.laneValue(slot, lane), range(len(self.program.names))))
+        defined = numpy.flatnonzero(self.kinds[:, lane] != UNSET_LANE)
+        state.order = defined[numpy.argsort(self.stamps[defined, lane], kind="stable")].tolist()
+        state.current_pos = int(self.positions[lane])
+        state.warnings = self.warnings[lane]
+        state.errors = self.errors[lane]
+        return state
+
+    def stepLane(self, lane: int, position: int) -> None:
+        """
+        Executes a single instruction in a single lane with the handler of the compiled program, for the instructions
+        and values the lane handlers leave out (like errors, DUMP and superinstructions).
+        :param lane: the lane, with its program counter on the instruction
+        :param position: position of the instruction in the compiled program
+        :return: None
+        """
+        output = Output.CollectorSink()
+        state = self.laneState(lane, output)
+        slots = list(state.slots)
+        try:
+            self.program.code[position](state)
+        except Errors.ProgramHalted:
+            self.halted[lane] = True
+        self.positions[lane] = state.current_pos
+        list(map(lambda slot: self.setLaneValue(slot, lane, state.slots[slot]),
+                 filter(lambda slot: state.slots[slot] is not slots[slot], range(len(slots)))))
+        text = output.getvalue()
+        if len(text) > 0:
+            self.writes.append((numpy.array([lane]), text, None))
+
+    def outputs(self) -> List[Output.CollectorSink]:
+        """
+        :return: the output of every lane
+        """
+        outputs = list(map(lambda lane: Output.CollectorSink(), range(self.positions.size)))
+        for lanes, values, integral in self.writes:
+            if integral is None:
+                list(map(lambda lane: outputs[lane].write(values), lanes.tolist()))
+                continue
+            for lane, value, is_integer in zip(lanes.tolist(), values.tolist(), integral.tolist()):
+                outputs[lane].write("> {}\n".format(int(value) if is_integer else value))
+        return outputs
+
+
+# isExact :: Any -> bool
+def isExact(value: object) -> bool:
+    """
+    :param value: a value of a variable or an immediate value
+    :return: whether the value is a number that a lane can hold as a float without changing it
+    """
+    return type(value) == float or (type(value) == int and abs(value) < Compiler.EXACT_INTEGERS)
+
+
+# isLaneOperand :: Operand -> bool
+def isLaneOperand(operand: Compiler.Operand) -> bool:
+    """
+    :param operand: the operand, see Compiler.resolveOperands
+    :return: whether the lane handlers can read the operand, a variable or an immediate number
+    """
+    return operand[0] or isExact(operand[1])
+
+
+# compileLaneNop :: dict -> int -> dict -> [str] -> LaneHandler
+def compileLaneNop(operands: dict, position: int, labels: dict, names: List[str]) -> LaneHandler:
+    """
+    Compiles instructions that do nothing when executed for lanes, see Compiler.compileNop.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: lane handler for the instruction
+    """
+    return lambda machine, lanes: lanes[:0]
+
+
+# compileLaneSet :: dict -> int -> dict -> [str] -> Either LaneHandler None
+def compileLaneSet(operands: dict, position: int, labels: dict, names: List[str]) -> Union[LaneHandler, None]:
+    """
+    Compiles the SET instruction for lanes, see Compiler.compileSet. Lanes where the right operand is not a number are
+    left to the compiled program.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: lane handler for the instruction, None when no lane can execute it
+    """
+    target = operands["target"][1]
+    right = operands["right"] if "right" in operands.keys() else (False, 0)
+    if not isLaneOperand(right):
+        return None
+
+    # setLanes :: LaneMachine -> ndarray -> ndarray
+    def setLanes(machine: LaneMachine, lanes: "numpy.ndarray") -> "numpy.ndarray":
+        value, number, integral = machine.operand(right, lanes)
+        done = numpy.broadcast_to(number, lanes.shape)
+        machine.store(target, lanes[done], numpy.broadcast_to(value, lanes.shape)[done],
+                      numpy.broadcast_to(integral, lanes.shape)[done])
+        return lanes[~done]
+
+    return setLanes
+
+
+# compileLaneStep :: int -> dict -> int -> dict -> [str] -> LaneHandler
+def compileLaneStep(step: int, operands: dict, position: int, labels: dict, names: List[str]) -> LaneHandler:
+    """
+    Compiles the INC and DEC instructions for lanes, see Compiler.compileStep. Lanes where the target is not a number
+    or becomes too large to be exact are left to the compiled program.
+    :param step: the amount that is added to the target
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: lane handler for the instruction
+    """
+    target = operands["target"][1]
+
+    # stepLanes :: LaneMachine -> ndarray -> ndarray
+    def stepLanes(machine: LaneMachine, lanes: "numpy.ndarray") -> "numpy.ndarray":
+        value, number, integral = machine.operand((True, target), lanes)
+        result = value + step
+        done = number & ~(integral & (numpy.abs(result) >= Compiler.EXACT_INTEGERS))
+        machine.store(target, lanes[done], result[done], integral[done])
+        return lanes[~done]
+
+    return stepLanes
+
+
+# compileLaneArithmetic :: Callable -> bool -> bool -> dict -> int -> dict -> [str] -> Either LaneHandler None
+def compileLaneArithmetic(function: Callable, keeps_integers: bool, divides: bool, operands: dict, position: int,
+                          labels: dict, names: List[str]) -> Union[LaneHandler, None]:
+    """
+    Compiles the arithmetic instructions for lanes, see Compiler.compileArithmetic. NumPy follows Python for floats,
+    even for the sign of a modulo. Lanes where the target is not SET,
+    an operand is not a number, the right operand is zero for a division or an integer result is too large to be
+    exact are left to the compiled program.
+    :param function: the operation that computes the result from the left and right operand
+    :param keeps_integers: whether the result of two integers is an integer
+    :param divides: whether the operation fails when the right operand is zero
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: lane handler for the instruction, None when no lane can execute it
+    """
+    target = operands["target"][1]
+    right = operands["right"]
+    # The simple variant uses the target as the left operand.
+    left = operands["left"] if "left" in operands.keys() else operands["target"]
+    if not (isLaneOperand(right) and isLaneOperand(left)):
+        return None
+
+    # arithmeticLanes :: LaneMachine -> ndarray -> ndarray
+    def arithmeticLanes(machine: LaneMachine, lanes: "numpy.ndarray") -> "numpy.ndarray":
+        right_value, right_number, right_integral = machine.operand(right, lanes)
+        left_value, left_number, left_integral = machine.operand(left, lanes)
+        done = (machine.kinds[target, lanes] != UNSET_LANE) & right_number & left_number
+        if divides:
+            done &= right_value != 0
+        with numpy.errstate(all="ignore"):
+            result = numpy.broadcast_to(function(left_value, right_value), lanes.shape)
+        integral = numpy.broadcast_to(left_integral & right_integral & keeps_integers, lanes.shape)
+        done &= ~(integral & (numpy.abs(result) >= Compiler.EXACT_INTEGERS))
+        # An integer has no negative zero, like 0 * -1 is 0 for the compiled program.
+        result = numpy.where(integral, result + 0.0, result)
+        machine.store(target, lanes[done], result[done], integral[done])
+        return lanes[~done]
+
+    return arithmeticLanes
+
+
+# compileLaneJump :: Callable -> dict -> int -> dict -> [str] -> Either LaneHandler None
+def compileLaneJump(comparison: Callable, operands: dict, position: int, labels: dict,
+                    names: List[str]) -> Union[LaneHandler, None]:
+    """
+    Compiles the jump instructions for lanes, see Compiler.compileJump. Only the program counters of the lanes that
+    take the jump are moved, lanes where an operand is not a number are left to the compiled program.
+    :param comparison: the comparison between the left and right operand that decides whether the jump is taken
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: lane handler for the instruction, None when no lane can execute it
+    """
+    target = operands["target"]
+    destination = target if type(target) == int else labels.get(target)
+    right = operands["right"]
+    # The simple variant compares the right operand with 0.
+    left = operands["left"] if "left" in operands.keys() else (False, 0)
+    if destination is None or not (isLaneOperand(right) and isLaneOperand(left)):
+        return None
+
+    # jumpLanes :: LaneMachine -> ndarray -> ndarray
+    def jumpLanes(machine: LaneMachine, lanes: "numpy.ndarray") -> "numpy.ndarray":
+        right_value, right_number, _ = machine.operand(right, lanes)
+        left_value, left_number, _ = machine.operand(left, lanes)
+        done = numpy.broadcast_to(right_number & left_number, lanes.shape)
+        machine.positions[lanes[done & comparison(left_value, right_value)]] = destination
+        return lanes[~done]
+
+    return jumpLanes
+
+
+# compileLanePrint :: dict -> int -> dict -> [str] -> LaneHandler
+def compileLanePrint(operands: dict, position: int, labels: dict, names: List[str]) -> LaneHandler:
+    """
+    Compiles the PRINT instruction for lanes, see Compiler.compilePrint. The values are only turned into text once the
+    run is finished, lanes where the variable is not a number are left to the compiled program.
+    :param operands: resolved parameters of the instruction
+    :param position: position of the instruction in the program
+    :param labels: the labels of the program
+    :param names: the names of the variable slots
+    :return: lane handler for the instruction
+    """
+    right_is_variable, right = operands["right"]
+    if not right_is_variable:
+        line = "> {}\n".format(right)
+
+        # printLine :: LaneMachine -> ndarray -> ndarray
+        def printLine(machine: LaneMachine, lanes: "numpy.ndarray") -> "numpy.ndarray":
+            machine.writes.append((lanes, line, None))
+            return lanes[:0]
+
+        return printLine
+
+    # printLanes :: LaneMachine -> ndarray -> ndarray
+    def printLanes(machine: LaneMachine, lanes: "numpy.ndarray") -> "numpy.ndarray":
+        value, number, integral = machine.operand((True, right), lanes)
+        machine.writes.append((lanes[number], value[number], integral[number]))
+        return lanes[~number]
+
+    return printLanes
+
+
+# The function that compiles each instruction for lanes, instructions that are not in here (DUMP and the
+# superinstructions) are executed lane by lane by the compiled program. NumPy is looked up when a program is compiled,
+# as it may not be installed.
+LANE_COMPILERS = {
+    Lexer.SetSimple: compileLaneSet,
+    Lexer.Set: compileLaneSet,
+    Lexer.Declare: compileLaneNop,
+    Lexer.Nop: compileLaneNop,
+    Lexer.Increment: lambda *args: compileLaneStep(1, *args),
+    Lexer.Decrement: lambda *args: compileLaneStep(-1, *args),
+    Lexer.AddSimple: lambda *args: compileLaneArithmetic(numpy.add, True, False, *args),
+    Lexer.Add: lambda *args: compileLaneArithmetic(numpy.add, True, False, *args),
+    Lexer.SubtractSimple: lambda *args: compileLaneArithmetic(numpy.subtract, True, False, *args),
+    Lexer.Subtract: lambda *args: compileLaneArithmetic(numpy.subtract, True, False, *args),
+    Lexer.MultiplySimple: lambda *args: compileLaneArithmetic(numpy.multiply, True, False, *args),
+    Lexer.Multiply: lambda *args: compileLaneArithmetic(numpy.multiply, True, False, *args),
+    Lexer.DivideSimple: lambda *args: compileLaneArithmetic(numpy.true_divide, False, True, *args),
+    Lexer.Divide: lambda *args: compileLaneArithmetic(numpy.true_divide, False, True, *args),
+    Lexer.ModuloSimple: lambda *args: compileLaneArithmetic(numpy.remainder, True, True, *args),
+    Lexer.Modulo: lambda *args: compileLaneArithmetic(numpy.remainder, True, True, *args),
+    Lexer.JumpEqualSimple: lambda *args: compileLaneJump(Compiler.COMPARISONS["JE"], *args),
+    Lexer.JumpEqual: lambda *args: compileLaneJump(Compiler.COMPARISONS["JE"], *args),
+    Lexer.JumpNotEqualSimple: lambda *args: compileLaneJump(Compiler.COMPARISONS["JNE"], *args),
+    Lexer.JumpNotEqual: lambda *args: compileLaneJump(Compiler.COMPARISONS["JNE"], *args),
+    Lexer.JumpLessThanSimple: lambda *args: compileLaneJump(Compiler.COMPARISONS["JL"], *args),
+    Lexer.JumpLessThan: lambda *args: compileLaneJump(Compiler.COMPARISONS["JL"], *args),
+    Lexer.JumpGreaterThanSimple: lambda *args: compileLaneJump(Compiler.COMPARISONS["JG"], *args),
+    Lexer.JumpGreaterThan: lambda *args: compileLaneJump(Compiler.COMPARISONS["JG"], *args),
+    Lexer.JumpLessOrEqualSimple: lambda *args: compileLaneJump(Compiler.COMPARISONS["JLE"], *args),
+    Lexer.JumpLessOrEqual: lambda *args: compileLaneJump(Compiler.COMPARISONS["JLE"], *args),
+    Lexer.JumpGreaterOrEqualSimple: lambda *args: compileLaneJump(Compiler.COMPARISONS["JGE"], *args),
+    Lexer.JumpGreaterOrEqual: lambda *args: compileLaneJump(Compiler.COMPARISONS["JGE"], *args),
+    Lexer.Print: compileLanePrint,
+}
+
+
+# compileLanes :: CompiledProgram -> [Either LaneHandler None]
+def compileLanes(program: Compiler.CompiledProgram) -> List[Union[LaneHandler, None]]:
+    """
+    Compiles the instructions of a compiled program to lane handlers, with the same slots as the compiled program.
+    :param program: the compiled program
+    :return: the lane handler of every instruction, None for the instructions only the compiled program can execute
+    """
+    slots = dict(map(lambda pair: (pair[1], pair[0]), enumerate(program.names)))
+    return list(map(
+        lambda token: LANE_COMPILERS[token[1][0]](
+            Compiler.resolveOperands(token[1][0], token[1][1], slots), token[0], program.labels, program.names)
+        if token[1][0] in LANE_COMPILERS.keys() else None,
+        zip(program.lines, program.instructions)
+    ))
+
+
+# executeLanes :: CompiledProgram -> [Either LaneHandler None] -> LaneMachine -> Either int None -> LaneMachine
+def executeLanes(program: Compiler.CompiledProgram, handlers: List[Union[LaneHandler, None]], machine: LaneMachine,
+                 max_instructions: int = None) -> LaneMachine:
+    """
+    Runs a compiled program in every lane until the program counter of every lane reaches the last instruction.
+    Every step executes the instruction after the lowest program counter, for all lanes at that position at once. The
+    lanes that are behind are always executed first, so lanes that went different ways through the program meet up
+    again at the instructions they share. The lanes the lane handler leaves out are executed one by one with
+    LaneMachine.stepLane.
+    :param program: the compiled program
+    :param handlers: the lane handlers of the program, see compileLanes
+    :param machine: machine state of the lanes to start from
+    :param max_instructions: the number of instructions every lane may execute, see Limits.Limits
+    :return: the machine state of the lanes after executing the program to completion, up to its first error in a
+    strict run or until the limit was reached
+    """
+    last = len(program.code) - 1
+    # Position of the lanes that are done, past every position of the program.
+    done = numpy.iinfo(numpy.int64).max
+    schedule = numpy.where(machine.positions == last, done, machine.positions)
+    while schedule.size > 0:
+        position = int(schedule.min())
+        if position == done:
+            break
+        lanes = numpy.flatnonzero(schedule == position)
+        limited = lanes[machine.executed[lanes] >= max_instructions] if max_instructions is not None else lanes[:0]
+        if limited.size > 0:
+            line = program.lines[position] if position >= 0 else position
+            list(map(lambda lane: list.append(
+                machine.errors[lane], "Program stopped after executing {0} instructions, the instruction limit, on "
+                                      "line {1}".format(max_instructions, line)), limited.tolist()))
+            schedule[limited] = done
+            continue
+        position += 1
+        machine.executed[lanes] += 1
+        machine.positions[lanes] = position
+        handler = handlers[position]
+        list(map(lambda lane: machine.stepLane(lane, position),
+                 (lanes if handler is None else handler(machine, lanes)).tolist()))
+        machine.clock += 1
+        positions = machine.positions[lanes]
+        schedule[lanes] = numpy.where((positions == last) | machine.halted[lanes], done, positions)
+    return machine
+
+
+# runLanes :: ProgramState -> [dict] -> Either int None -> bool -> Either int None -> [ProgramState]
+def runLanes(ps: Parser.ProgramState, states: List[dict], max_instructions: int = None, strict: bool = False,
+             max_errors: int = None) -> List[Parser.ProgramState]:
+    """
+    Runs a program once for every initial state, all at once with NumPy, see executeLanes.
+    :param ps: program state with the instructions and labels of the program
+    :param states: the initial state of every lane, the names of variables of the program with a number
+    :param max_instructions: the number of instructions every lane may execute, not limited if None
+    :param strict: whether a lane halts on its first error, see Errors.ErrorLog
+    :param max_errors: the number of errors every lane keeps, every error is kept if None
+    :return: the program state of every lane after its run, the output of a lane is a Output.CollectorSink
+    """
+    if numpy is None:
+        raise LaneError("Running lanes requires NumPy")
+    program = Compiler.compileProgram(ps)
+    slots = dict(map(lambda pair: (pair[1], pair[0]), enumerate(program.names)))
+    machine = LaneMachine(program, len(states), lambda: Errors.ErrorLog(strict, max_errors)
+                          if strict or max_errors is not None else [])
+    for lane, variables in enumerate(states):
+        for order, (name, value) in enumerate(variables.items()):
+            if name not in slots.keys():
+                raise LaneError("Lane {0} sets {1}, which is not a variable of the program".format(lane, name))
+            if type(value) not in (int, float):
+                raise LaneError("Lane {0} sets {1} to {2}, which is not a number".format(lane, name, value))
+            # Set before the first step, in the order of the initial state.
+            machine.clock = order - len(variables)
+            machine.setLaneValue(slots[name], lane, value)
+    machine.clock = 0
+    executeLanes(program, compileLanes(program), machine, max_instructions)
+    outputs = machine.outputs()
+    return list(map(lambda lane: machine.laneState(lane, outputs[lane]).toProgramState(), range(len(states))))
+
+
+# readLanes :: str -> [dict]
+def readLanes(path: str) -> List[dict]:
+    """
+    Reads the initial states of the lanes from a JSON file, either a list of objects or one object per line.
+    :param path: path to the file
+    :return: the initial state of every lane
+    """
+    with open(path, "r") as file:
+        text = file.read()
+    try:
+        states = json.loads(text) if text.lstrip().startswith("[") else \
+            list(map(json.loads, filter(lambda line: len(line.strip()) > 0, text.splitlines())))
+    except ValueError as error:
+        raise LaneError("The lanes in {0} are not valid JSON: {1}".format(path, error))
+    if not all(map(lambda state: type(state) == dict, states)):
+        raise LaneError("Every lane in {0} has to be an object of variables and their values".format(path))
+    return states
@@ -1,6 +1,6 @@
 from enum import Enum
 from functools import reduce
-from typing import List, Union, Tuple
+from typing import Iterable, Iterator, List, Union, Tuple
 import re
 import ATPTools
 
@@ -402,6 +402,123 @@ class Print(Instruction):
         return "PRINT {value}"
 
 
+# Superinstructions are made by Optimizer.py from sequences of instructions, they are not part of INSTRUCTION_MAP so
+# they can not be written in a program. Their regex only describes how they are shown.
+class Goto(Jump):
+    regex = "^GOTO[ \t]+(?P<target>" + str(RegexMap.LABEL.value) + ")[ \t]*$"
+
+    def __init__(self):
+        super().__init__()
+        self.parameters = ["target"]
+
+    def __str__(self) -> str:
+        return "GOTO {target}"
+
+
+class CompareBranch(Jump):
+    regex = "^BRANCH[ \t]+(?P<comparison>[A-Z]+)[ \t]+(?P<target>" + str(RegexMap.LABEL.value) + ")[ \t]+(?P<left>" + \
+            str(RegexMap.VAR.value) + ")[ \t]+(?P<right>" + str(RegexMap.VAL.value) + ")[ \t]*$"
+
+    def __init__(self):
+        super().__init__()
+        self.parameters = ["comparison", "target", "left", "right"]
+
+    def __str__(self) -> str:
+        return "BRANCH {comparison} {target} {left} {right}"
+
+
+class StepBranch(Instruction):
+    regex = "^STEPBRANCH[ \t]+(?P<target>" + str(RegexMap.VAR.value) + ")[ \t]+(?P<step>" + str(
+        RegexMap.VAL.value) + ")[ \t]+(?P<comparison>[A-Z]+)[ \t]+(?P<jump>" + str(
+        RegexMap.LABEL.value) + ")[ \t]+(?P<right>" + str(RegexMap.VAL.value) + ")[ \t]*$"
+
+    def __init__(self):
+        super().__init__()
+        self.parameters = ["target", "step", "comparison", "jump", "right"]
+
+    def __str__(self) -> str:
+        return "STEPBRANCH {target} {step} {comparison} {jump} {right}"
+
+
+class Loop(Instruction):
+    regex = "^LOOP[ \t]+(?P<left>" + str(RegexMap.VAR.value) + ")[ \t]+(?P<comparison>[A-Z]+)[ \t]+(?P<right>" + str(
+        RegexMap.VAL.value) + ")[ \t]+(?P<jump>" + str(RegexMap.LABEL.value) + ")[ \t]*$"
+
+    def __init__(self):
+        super().__init__()
+        self.parameters = ["left", "comparison", "right", "jump"]
+
+    def __str__(self) -> str:
+        return "LOOP {left} {comparison} {right} {jump}"
+
+
+class Sequence(Instruction):
+    regex = "^SEQUENCE[ \t]+(?P<length>\d+)[ \t]*$"
+
+    def __init__(self):
+        super().__init__()
+        self.parameters = ["length"]
+
+    def __str__(self) -> str:
+        return "SEQUENCE {length}"
+
+
+# The instructions known to the lexer. Instructions that share a keyword are tried in the order of this list.
+INSTRUCTION_MAP = [
+    SetSimple, Set,
+    Declare, Increment, Decrement,
+    AddSimple, Add,
+    SubtractSimple, Subtract,
+    MultiplySimple, Multiply,
+    DivideSimple, Divide,
+    ModuloSimple, Modulo,
+    JumpEqualSimple, JumpEqual,
+    JumpNotEqualSimple, JumpNotEqual,
+    JumpLessThanSimple, JumpLessThan,
+    JumpGreaterThanSimple, JumpGreaterThan,
+    JumpGreaterOrEqualSimple, JumpGreaterOrEqual,
+    JumpLessOrEqualSimple, JumpLessOrEqual,
+    Nop, Print, Dump
+]
+
+# Matches the keyword a line starts with, a line without a keyword (blank or comment only) gives an empty keyword.
+KEYWORD_PATTERN = re.compile("[A-Z]*")
+
+# The regex of every instruction, compiled once when the lexer is loaded.
+PATTERNS = dict(map(lambda instruction: (instruction, re.compile(instruction.regex)), INSTRUCTION_MAP))
+
+
+# instructionKeywords :: Instruction -> [str]
+def instructionKeywords(instruction_type: Instruction) -> List[str]:
+    """
+    Finds the keywords a line has to start with to be able to match the regex of the given instruction.
+    Instructions that also match an empty line (like NOP) can match lines without a keyword as well.
+    :param instruction_type: the class to find the keywords for
+    :return: the keywords of the instruction
+    """
+    keyword = re.match(r"\^\(?([A-Z]+)", instruction_type.regex).group(1)
+    pattern = PATTERNS.get(instruction_type, re.compile(instruction_type.regex))
+    return [keyword, ""] if pattern.fullmatch("") is not None else [keyword]
+
+
+# buildKeywordIndex :: [Instruction] -> dict
+def buildKeywordIndex(instruction_map: List[Instruction]) -> dict:
+    """
+    Groups the instructions by their keywords, so a line only has to be matched against the one or two instructions
+    that share its keyword instead of against every instruction.
+    :param instruction_map: the instructions in the order they should be tried
+    :return: dict with the keywords as keys and the list of candidate instructions as values
+    """
+    return reduce(
+        lambda index, pair: dict(index, **{pair[0]: index.get(pair[0], []) + [pair[1]]}),
+        [(keyword, instruction) for instruction in instruction_map for keyword in instructionKeywords(instruction)],
+        {}
+    )
+
+
+KEYWORD_INDEX = buildKeywordIndex(INSTRUCTION_MAP)
+
+
 # strToList :: str -> [str]
 @ATPTools.copyParameters
 def strToList(input_string: str) -> List[str]:
@@ -410,9 +527,7 @@ def strToList(input_string: str) -> List[str]:
     :param input_string: the input
     :return: a list of characters
     """
-    if input_string.find(' ') == -1:
-        return [input_string]
-    return [input_string[:input_string.index(" ")]] + strToList(input_string[input_string.index(" ") + 1:])
+    return input_string.split(' ')
 
 
 # stringToLines :: str -> [str]
@@ -423,9 +538,24 @@ def strToLines(input_string: str) -> List[str]:
     :param input_string: The input
     :return: list of lines
     """
-    if input_string.find('\n') == -1:
-        return [input_string]
-    return [input_string[:input_string.index('\n')]] + strToLines(input_string[input_string.index('\n') + 1:])
+    return input_string.split('\n')
+
+
+# streamLines :: Iterable[str] -> Iterator[str]
+def streamLines(file: Iterable[str]) -> Iterator[str]:
+    """
+    Yields the lines of a file one at a time without their line endings, so the file never has to be read into memory
+    as a whole. Gives the same lines as strToLines does for the entire contents of the file, including the empty line
+    after a trailing newline.
+    This generator is not wrapped in copyParameters as open files can not be copied.
+    :param file: an open file or any other iterable of lines that still end in a newline
+    :return: iterator over the lines
+    """
+    line = "\n"  # An empty file still contains a single empty line
+    for line in file:
+        yield line[:-1] if line.endswith("\n") else line
+    if line.endswith("\n"):
+        yield ""
 
 
 # mapDataTypes :: dict -> dict
@@ -452,8 +582,7 @@ def regexTest(instruction_type: Instruction, string: str) -> Union[dict, None]:
     :param string: the line to match
     :return: Either the parameters of the line or None if the regex did not match
     """
-    pattern = re.compile(instruction_type.regex)
-    match = re.fullmatch(pattern, string)
+    match = PATTERNS[instruction_type].fullmatch(string)
     return mapDataTypes(match.groupdict()) if match is not None else None
 
 
@@ -486,31 +615,29 @@ def matchToken(input_string: str) -> Union[Tuple[Instruction, dict], None]:
     :param input_string: The line of a program
     :return: A tuple containing the instruction type and it's parameters or None is no match is found
     """
-    instruction_map = [
-        SetSimple, Set,
-        Declare, Increment, Decrement,
-        AddSimple, Add,
-        SubtractSimple, Subtract,
-        MultiplySimple, Multiply,
-        DivideSimple, Divide,
-        ModuloSimple, Modulo,
-        JumpEqualSimple, JumpEqual,
-        JumpNotEqualSimple, JumpNotEqual,
-        JumpLessThanSimple, JumpLessThan,
-        JumpGreaterThanSimple, JumpGreaterThan,
-        JumpGreaterOrEqualSimple, JumpGreaterOrEqual,
-        JumpLessOrEqualSimple, JumpLessOrEqual,
-        Nop, Print, Dump
-    ]
-    return reduce(
-        lambda x, y: x if x[1] is not None else y,
-        map(
-            lambda x: (x, regexTest(x, input_string)),
-            instruction_map
-        )
+    # Only the instructions that share the keyword of the line can match it, if none of them do we return the last
+    # instruction without parameters, just like trying every instruction in order would.
+    candidates = KEYWORD_INDEX.get(KEYWORD_PATTERN.match(input_string).group(), [])
+    return next(
+        filter(
+            lambda x: x[1] is not None,
+            map(lambda x: (x, regexTest(x, input_string)), candidates)
+        ),
+        (INSTRUCTION_MAP[-1], None)
     )
 
 
+# lexStream :: Iterable[str] -> Iterator[Tuple[Instruction, dict]]
+def lexStream(input_program: Iterable[str]) -> Iterator[Tuple[Instruction, dict]]:
+    """
+    Lazily converts the lines of a program to instructions with their associated parameters, a line is only read when
+    its instruction is requested.
+    :param input_program: the program as an iterable of lines (strings)
+    :return: iterator over tuples containing the instructions and their parameters
+    """
+    return map(matchToken, input_program)
+
+
 # lexInput :: [str] -> [Tuple[Instruction, dict]]
 @ATPTools.copyParameters
 def lexInput(input_program: List[str]) -> List[Tuple[Instruction, dict]]:
@@ -519,6 +646,4 @@ def lexInput(input_program: List[str]) -> List[Tuple[Instruction, dict]]:
     :param input_program: the program as a list of lines (strings)
     :return: a list of tuples containing the instructions and their parameters
     """
-    if len(input_program) == 0:
-        return []
-    return [matchToken(input_program[0])] + lexInput(input_program[1:])
+    return list(lexStream(input_program))
@@ -0,0 +1,168 @@
+import sys
+from time import perf_counter
+from typing import Callable, List, Union
+
+import Compiler
+import Errors
+import Parser
+
+
+class Limits:
+    """
+    Limits on a single run of a program, a limit that is None is not checked. The limits are checked every
+    check_interval instructions rather than after every instruction, so a run can go over a limit by at most that many
+    instructions. When a limit is reached the run stops and the reason is added to the errors of the program.
+    - max_instructions: the number of instructions that may be executed, a superinstruction counts as one
+    - timeout: the number of seconds the run may take
+    - max_variables: the number of variables the program may SET
+    - max_state_bytes: the size of the values of the variables and of the errors and warnings together
+    """
+
+    def __init__(self, max_instructions: int = None, timeout: float = None, max_variables: int = None,
+                 max_state_bytes: int = None, check_interval: int = 1024):
+        self.max_instructions = max_instructions
+        self.timeout = timeout
+        self.max_variables = max_variables
+        self.max_state_bytes = max_state_bytes
+        self.check_interval = max(1, check_interval)
+
+
+class Meter:
+    """
+    Keeps track of how much of its limits a run has used. The size of the errors and warnings is added up as they are
+    reported, so every check only looks at the messages that are new.
+    """
+
+    def __init__(self, limits: Limits):
+        self.limits = limits
+        self.executed = 0
+        self.deadline = perf_counter() + limits.timeout if limits.timeout is not None else None
+        self.message_bytes = 0
+        self.seen_errors = 0
+        self.seen_warnings = 0
+
+
+# nextChunk :: Meter -> int
+def nextChunk(meter: Meter) -> int:
+    """
+    :param meter: the meter of the run
+    :return: the number of instructions that can be executed before the limits are checked again
+    """
+    if meter.limits.max_instructions is None:
+        return meter.limits.check_interval
+    return min(meter.limits.check_interval, meter.limits.max_instructions - meter.executed)
+
+
+# messageBytes :: Meter -> [str] -> [str] -> int
+def messageBytes(meter: Meter, errors: List[str], warnings: List[str]) -> int:
+    """
+    Adds the errors and warnings reported since the last check to the size of the messages of the run.
+    :param meter: the meter of the run
+    :param errors: the errors of the program
+    :param warnings: the warnings of the program
+    :return: the size of all errors and warnings in bytes
+    """
+    meter.message_bytes += sum(map(sys.getsizeof, errors[meter.seen_errors:])) + \
+        sum(map(sys.getsizeof, warnings[meter.seen_warnings:]))
+    meter.seen_errors = len(errors)
+    meter.seen_warnings = len(warnings)
+    return meter.message_bytes
+
+
+# exceededLimit :: Meter -> (None -> [Any]) -> [str] -> [str] -> int -> Either str None
+def exceededLimit(meter: Meter, values: Callable[[], list], errors: List[str], warnings: List[str],
+                  line: int) -> Union[str, None]:
+    """
+    Checks the limits of a run.
+    :param meter: the meter of the run
+    :param values: gives the values of the variables that are SET, only called when a limit needs them
+    :param errors: the errors of the program
+    :param warnings: the warnings of the program
+    :param line: the line the program is at
+    :return: the reason the run has to stop, or None if it is within its limits
+    """
+    limits = meter.limits
+    if limits.max_instructions is not None and meter.executed >= limits.max_instructions:
+        return "Program stopped after executing {0} instructions, the instruction limit, on line {1}".format(
+            meter.executed, line)
+    if meter.deadline is not None and perf_counter() >= meter.deadline:
+        return "Program stopped after the time limit of {0} s on line {1}".format(limits.timeout, line)
+    if limits.max_variables is not None and len(values()) > limits.max_variables:
+        return "Program stopped with {0} variables, more than the limit of {1}, on line {2}".format(
+            len(values()), limits.max_variables, line)
+    if limits.max_state_bytes is not None:
+        size = sum(map(sys.getsizeof, values())) + messageBytes(meter, errors, warnings)
+        if size > limits.max_state_bytes:
+            return "Program stopped with {0} bytes of state, more than the limit of {1}, on line {2}".format(
+                size, limits.max_state_bytes, line)
+    return None
+
+
+# executeCompiledLimited :: CompiledProgram -> MachineState -> Limits -> Either (MachineState -> int -> None) None
+#                            -> MachineState
+def executeCompiledLimited(program: Compiler.CompiledProgram, state: Compiler.MachineState, limits: Limits,
+                           between: Callable[[Compiler.MachineState, int], None] = None) -> Compiler.MachineState:
+    """
+    Runs a compiled program like Compiler.executeCompiled does, but stops it when it reaches one of its limits. The
+    handlers are called in chunks of instructions, with the limits checked in between.
+    :param program: the compiled program
+    :param state: machine state to start from
+    :param limits: the limits of the run
+    :param between: called between two chunks with the machine state and the number of executed instructions, like
+    Checkpoint.Checkpointer
+    :return: the machine state after executing the program to completion or until a limit was reached
+    """
+    code = program.code
+    last = len(code) - 1
+    meter = Meter(limits)
+    values = lambda: list(map(lambda slot: state.slots[slot], state.order))
+    try:
+        while state.current_pos != last:
+            line = program.lines[state.current_pos] if state.current_pos >= 0 else state.current_pos
+            reason = exceededLimit(meter, values, state.errors, state.warnings, line)
+            if reason is not None:
+                # Added past Errors.ErrorLog, the reason a run stopped is never left out.
+                list.append(state.errors, reason)
+                return state
+            if between is not None:
+                between(state, meter.executed)
+            for steps in range(1, nextChunk(meter) + 1):
+                state.current_pos += 1
+                code[state.current_pos](state)
+                if state.current_pos == last:
+                    break
+            meter.executed += steps
+    except Errors.ProgramHalted:
+        pass
+    return state
+
+
+# executeProgramLimited :: ProgramState -> Limits -> ProgramState
+def executeProgramLimited(ps: Parser.ProgramState, limits: Limits) -> Parser.ProgramState:
+    """
+    Runs a program with the reference interpreter like Parser.executeProgram does, but stops it when it reaches one
+    of its limits.
+    :param ps: current program state
+    :param limits: the limits of the run
+    :return: program state after executing the program to completion or until a limit was reached
+    """
+    last = len(ps.instructions) - 1
+    meter = Meter(limits)
+    position = ps.current_pos
+    try:
+        while ps.current_pos != last:
+            reason = exceededLimit(meter, lambda: list(ps.variables.values()), ps.errors, ps.warnings, ps.current_pos)
+            if reason is not None:
+                list.append(ps.errors, reason)
+                return ps
+            for steps in range(1, nextChunk(meter) + 1):
+                position = ps.current_pos + 1
+                ps = Parser.runProgram(ps)
+                if ps.current_pos == last:
+                    break
+            meter.executed += steps
+    except Errors.ProgramHalted as halt:
+        # See Parser.executeProgram.
+        ps.current_pos = position
+        ps.errors = halt.errors
+    return ps
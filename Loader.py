@@ -0,0 +1,96 @@
+from typing import Callable, Iterable, List, Tuple
+
+import ATPTools
+import Cache
+import Lexer
+import Parser
+import Profiler
+
+
+# readProgram :: str -> Tuple[Parser.ProgramState, [str]]
+def readProgram(infile: str) -> Tuple[Parser.ProgramState, List[str]]:
+    """
+    Reads and parses a program from a given input file, collecting every problem instead of stopping at the first one.
+    :param infile: str the path to a ATP++ file
+    :return: ProgramState and the list of errors, the program can only be run when there are no errors
+    """
+    with open(infile, "r") as file:
+        return readLines(file)
+
+
+# readLines :: Iterable[str] -> Tuple[Parser.ProgramState, [str]]
+def readLines(file: Iterable[str]) -> Tuple[Parser.ProgramState, List[str]]:
+    """
+    Parses a program from its lines, see readProgram.
+    :param file: an open file or any other iterable of lines that still end in a newline
+    :return: ProgramState and the list of errors, the program can only be run when there are no errors
+    """
+    # The file is lexed line by line while it is read, only the text of unknown lines is kept for the error report.
+    tokens = []
+    unknown_tokens = []
+    for line_number, line in enumerate(Lexer.streamLines(file)):
+        token = Lexer.matchToken(line)
+        tokens.append(token)
+        if token[1] is None:
+            unknown_tokens.append((line_number, line))
+    if len(unknown_tokens) > 0:
+        return Parser.ProgramState(), list(map(
+            lambda x: "Unknown token `{0}` on line {1}".format(x[1], x[0]), unknown_tokens))
+    ps = Parser.ProgramState()
+    ps.labels = Parser.parseLabels(tokens)
+    ps.instructions, label_errors = Parser.resolveJumps(tokens, ps.labels)
+    return ps, label_errors
+
+
+# parseProgram :: str -> Parser.ProgramState
+@ATPTools.copyParameters
+def parseProgram(infile: str = "example_programs/loop.atp++") -> Parser.ProgramState:
+    """
+    Parses a program from a given input file, printing the errors and exiting when the program can not be parsed.
+    :param infile: str the path to a ATP++ file
+    :return: ProgramState
+    """
+    ps, errors = readProgram(infile)
+    if len(errors) > 0:
+        list(map(print, errors))
+        exit(-1)
+    return ps
+
+
+# loadProgram :: str -> bool -> Either str None -> (str -> Parser.ProgramState) -> Parser.ProgramState
+def loadProgram(infile: str, use_cache: bool = True, cache_directory: str = None,
+                parse: Callable[[str], Parser.ProgramState] = parseProgram) -> Parser.ProgramState:
+    """
+    Loads a program, using the parsed program from the cache when the program was parsed before.
+    The cache is keyed by the hash of the source and the version of the interpreter, so it is parsed again whenever the
+    program, the lexer, the loader or the parser changed. Without a cache directory the cache is stored next to the
+    program.
+    :param infile: str the path to a ATP++ file
+    :param use_cache: bool whether to read and write the cache
+    :param cache_directory: str directory to store the cache in
+    :param parse: function that parses the program when it is not cached, parseProgram by default
+    :return: ProgramState
+    """
+    if not use_cache:
+        return parse(infile)
+    path = Cache.cachePath(infile, cache_directory)
+    source_hash = Cache.fileHash(infile)
+    version = Cache.interpreterVersion()
+    ps = Cache.readCache(path, source_hash, version)
+    if ps is None:
+        ps = parse(infile)
+        Cache.writeCache(path, source_hash, version, ps)
+    return ps
+
+
+# haltReport :: Parser.ProgramState -> Parser.ProgramState -> str
+def haltReport(ps: Parser.ProgramState, source: Parser.ProgramState) -> str:
+    """
+    Describes where a strict run halted, see Errors.ErrorLog.
+    :param ps: ProgramState of the run after it halted
+    :param source: ProgramState of the program as it was loaded, before it was optimized
+    :return: the line and the instruction the run halted on, and the error that halted it
+    """
+    instruction = Profiler.describeToken(source.instructions[ps.current_pos], source.labels) \
+        if 0 <= ps.current_pos < len(source.instructions) else ""
+    return "Program halted on line {0} at `{1}`: {2}".format(ps.current_pos, instruction, ps.errors[-1])
@@ -0,0 +1,676 @@
+import operator
+from bisect import bisect_right
+from typing import List, Set, Tuple, Union
+
+import Compiler
+import Lexer
+import Parser
+import Verifier
+
+# The comparison that gives the same result when the operands of a jump are swapped.
+MIRRORED = {"JE": "JE", "JNE": "JNE", "JL": "JG", "JG": "JL", "JLE": "JGE", "JGE": "JLE"}
+
+# The comparison that holds exactly when the given comparison does not.
+NEGATED = {"JE": "JNE", "JNE": "JE", "JL": "JGE", "JGE": "JL", "JG": "JLE", "JLE": "JG"}
+
+# Instructions that can not be part of a sequence: a DECL is where jumps land and a DUMP shows the program counter.
+UNFUSABLE = (Lexer.Declare, Lexer.Dump, Lexer.Sequence)
+
+# The operation of every arithmetic instruction, see Compiler.COMPILERS.
+ARITHMETIC = {
+    Lexer.AddSimple: operator.add,
+    Lexer.Add: operator.add,
+    Lexer.SubtractSimple: operator.sub,
+    Lexer.Subtract: operator.sub,
+    Lexer.MultiplySimple: operator.mul,
+    Lexer.Multiply: operator.mul,
+    Lexer.DivideSimple: operator.truediv,
+    Lexer.Divide: operator.truediv,
+    Lexer.ModuloSimple: operator.mod,
+    Lexer.Modulo: operator.mod,
+}
+
+# The arithmetic instructions that fail when their right operand is zero.
+DIVISIONS = (Lexer.DivideSimple, Lexer.Divide, Lexer.ModuloSimple, Lexer.Modulo)
+
+# Value of a variable in the dataflow analysis when it can differ between runs of an instruction.
+VARYING = object()
+
+
+# writtenVariable :: Tuple[Instruction, dict] -> Either str None
+def writtenVariable(token: Tuple[Lexer.Instruction, dict]) -> Union[str, None]:
+    """
+    Finds the variable an instruction changes.
+    :param token: the instruction with its parameters
+    :return: the name of the variable or None if the instruction does not change a variable
+    """
+    instruction, parameters = token
+    if issubclass(instruction, Lexer.Jump) or "target" not in parameters.keys():
+        return None
+    return parameters["target"]
+
+
+# constantRegisters :: [Tuple[Instruction, dict]] -> dict
+def constantRegisters(tokens: List[Tuple[Lexer.Instruction, dict]]) -> dict:
+    """
+    Finds the variables that hold the same number for the rest of the program once they are set, like the zero
+    registers of counter machines. Such a variable is set to a number exactly once, before the first jump of the
+    program, and never changed anywhere else. Every instruction after that SET is certain to see the number.
+    :param tokens: the instructions of the program
+    :return: dict with the names of the variables as keys and (their value, position of their SET) as values
+    """
+    first_jump = next(filter(lambda pair: issubclass(pair[1][0], Lexer.Jump), enumerate(tokens)), (len(tokens),))[0]
+    writes = {}
+    for position, token in enumerate(tokens):
+        name = writtenVariable(token)
+        if name is not None:
+            writes.setdefault(name, []).append(position)
+    return dict(map(
+        lambda item: (item[0], (tokens[item[1][0]][1]["right"], item[1][0])),
+        filter(lambda item: len(item[1]) == 1 and item[1][0] < first_jump and tokens[item[1][0]][0] == Lexer.Set
+               and not Compiler.isVariable(tokens[item[1][0]][1]["right"]), writes.items())
+    ))
+
+
+# knownValue :: Either str float -> int -> dict -> Tuple[bool, Either str float]
+def knownValue(value: Union[str, float], position: int, constants: dict) -> Tuple[bool, Union[str, float]]:
+    """
+    Finds out whether an operand has a value that is known when the program is loaded.
+    :param value: the operand
+    :param position: position of the instruction the operand belongs to
+    :param constants: the constant registers of the program, see constantRegisters
+    :return: whether the value is known and the value (or the operand itself when it is not known)
+    """
+    if not Compiler.isVariable(value):
+        return True, value
+    if value in constants.keys() and constants[value][1] < position:
+        return True, constants[value][0]
+    return False, value
+
+
+# landing :: [Tuple[Instruction, dict]] -> int -> int
+def landing(tokens: List[Tuple[Lexer.Instruction, dict]], destination: int) -> int:
+    """
+    Finds where a jump really leads. A jump that lands in front of NOPs, labels or a GOTO can skip over them, this is
+    followed until an instruction that does something is reached.
+    :param tokens: the instructions of the program
+    :param destination: the position the jump sets the program counter to
+    :return: the position the jump can set the program counter to instead
+    """
+    visited = set()
+    last = len(tokens) - 1
+    while destination not in visited:
+        visited.add(destination)
+        following = destination + 1
+        while following <= last and tokens[following][0] in (Lexer.Nop, Lexer.Declare):
+            following += 1
+        if following > last:
+            # Running past the end of the program stops it just like landing on the last instruction does.
+            return last
+        destination = following - 1
+        if tokens[following][0] != Lexer.Goto:
+            return destination
+        destination = tokens[following][1]["target"]
+    return destination
+
+
+# rewriteJump :: Tuple[Instruction, dict] -> int -> dict -> Tuple[Instruction, dict]
+def rewriteJump(token: Tuple[Lexer.Instruction, dict], position: int, constants: dict) -> Tuple[
+        Lexer.Instruction, dict]:
+    """
+    Rewrites a jump of which one or both operands are known. A jump that is always taken becomes a GOTO, a jump that
+    is never taken a NOP and a jump that compares a variable with a constant a BRANCH.
+    :param token: the jump with its parameters
+    :param position: position of the jump in the program
+    :param constants: the constant registers of the program, see constantRegisters
+    :return: the rewritten instruction, or the jump itself when nothing is known about it
+    """
+    instruction, parameters = token
+    comparison = Lexer.instructionKeywords(instruction)[0]
+    # The simple variant compares the right operand with 0.
+    left_known, left = knownValue(parameters.get("left", 0), position, constants)
+    right_known, right = knownValue(parameters["right"], position, constants)
+    if left_known and right_known:
+        if Compiler.COMPARISONS[comparison](left, right):
+            return Lexer.Goto, {"target": parameters["target"]}
+        return Lexer.Nop, {}
+    if left_known:
+        return Lexer.CompareBranch, {
+            "comparison": MIRRORED[comparison], "target": parameters["target"], "left": right, "right": left}
+    if right_known:
+        return Lexer.CompareBranch, {
+            "comparison": comparison, "target": parameters["target"], "left": left, "right": right}
+    return token
+
+
+# linearUpdate :: Tuple[Instruction, dict] -> int -> dict -> Either Tuple[str, int, bool] None
+def linearUpdate(token: Tuple[Lexer.Instruction, dict], position: int, constants: dict) -> Union[
+        Tuple[str, int, bool], None]:
+    """
+    Finds out whether an instruction adds a known integer (other than 0) to a variable: INC, DEC and ADD or SUB of a
+    constant to the variable itself.
+    :param token: the instruction with its parameters
+    :param position: position of the instruction in the program
+    :param constants: the constant registers of the program, see constantRegisters
+    :return: the name of the variable, the integer that is added to it and whether the result is always a float (the
+    constants of ADD and SUB are floats, INC and DEC keep an integer an integer), or None for any other instruction
+    """
+    instruction, parameters = token
+    if instruction in (Lexer.Increment, Lexer.Decrement):
+        return parameters["target"], 1 if instruction == Lexer.Increment else -1, False
+    if instruction not in (Lexer.AddSimple, Lexer.SubtractSimple, Lexer.Add, Lexer.Subtract) or \
+            parameters.get("left", parameters["target"]) != parameters["target"]:
+        return None
+    known, value = knownValue(parameters["right"], position, constants)
+    if not known or type(value) not in (int, float) or not float(value).is_integer() or value == 0:
+        return None
+    return parameters["target"], int(value) if instruction in (Lexer.AddSimple, Lexer.Add) else -int(value), \
+        type(value) == float
+
+
+# loopBody :: [Tuple[Instruction, dict]] -> int -> int -> dict -> Either [Tuple[str, int, bool]] None
+def loopBody(tokens: List[Tuple[Lexer.Instruction, dict]], start: int, end: int, constants: dict) -> Union[
+        List[Tuple[str, int, bool]], None]:
+    """
+    Finds out whether the instructions in a part of the program do nothing but add known integers to variables.
+    :param tokens: the instructions of the program
+    :param start: position of the first instruction of the part
+    :param end: position after the last instruction of the part
+    :param constants: the constant registers of the program, see constantRegisters
+    :return: every update in the order they are made (see linearUpdate) or None when the part does anything else
+    """
+    updates = []
+    for position in range(start, end):
+        if tokens[position][0] in (Lexer.Nop, Lexer.Declare):
+            continue
+        update = linearUpdate(tokens[position], position, constants)
+        if update is None:
+            return None
+        updates.append(update)
+    return updates
+
+
+# skipNops :: [Tuple[Instruction, dict]] -> int -> int
+def skipNops(tokens: List[Tuple[Lexer.Instruction, dict]], position: int) -> int:
+    """
+    :param tokens: the instructions of the program
+    :param position: position to start at
+    :return: position of the first instruction from position on that is not a NOP or DECL
+    """
+    while position < len(tokens) and tokens[position][0] in (Lexer.Nop, Lexer.Declare):
+        position += 1
+    return position
+
+
+# findLoop :: [Tuple[Instruction, dict]] -> int -> dict -> Either Tuple[int, Tuple[Instruction, dict]] None
+def findLoop(tokens: List[Tuple[Lexer.Instruction, dict]], end: int, constants: dict) -> Union[
+        Tuple[int, Tuple[Lexer.Instruction, dict]], None]:
+    """
+    Finds out whether the jump at a position closes a loop that can be run in closed form. Two kinds of loops are
+    found, both have a body that only adds known integers to variables (see loopBody):
+    - a loop that starts with a BRANCH out of the loop and ends with a GOTO back to its start
+    - a loop that ends with a BRANCH back to its start
+    :param tokens: the instructions of the program, with the jumps rewritten by rewriteJump
+    :param end: position of the jump
+    :param constants: the constant registers of the program, see constantRegisters
+    :return: the position of the first instruction of the loop and the LOOP that replaces it, or None
+    """
+    instruction, parameters = tokens[end]
+    if instruction not in (Lexer.Goto, Lexer.CompareBranch) or parameters["target"] >= end:
+        return None
+    first = skipNops(tokens, parameters["target"] + 1)
+    if instruction == Lexer.Goto:
+        if first >= end or tokens[first][0] != Lexer.CompareBranch:
+            return None
+        test = tokens[first][1]
+        if parameters["target"] <= test["target"] < end:
+            return None
+        updates = loopBody(tokens, first + 1, end, constants)
+        comparison, destination, start = test["comparison"], test["target"], 0
+    else:
+        test = parameters
+        updates = loopBody(tokens, first, end, constants)
+        # The loop stops when the BRANCH back is not taken, after the first iteration.
+        comparison, destination, start = NEGATED[test["comparison"]], end, 1
+    if updates is None or (start == 1 and len(updates) == 0) or type(test["right"]) not in (int, float) or \
+            not float(test["right"]).is_integer():
+        return None
+    steps = {}
+    for name, step, converts in updates:
+        total, converted = steps.get(name, (0, False))
+        steps[name] = (total + step, converted or converts)
+    return first, (Lexer.Loop, {
+        "left": test["left"],
+        "comparison": comparison,
+        "right": test["right"],
+        "jump": destination,
+        "first": start,
+        "updates": list(map(lambda item: (item[0],) + item[1], steps.items())),
+        "spread": sum(map(lambda update: abs(update[1]), updates)),
+        "parts": [tokens[first]]
+    })
+
+
+# accelerateLoops :: [Tuple[Instruction, dict]] -> dict -> [Tuple[Instruction, dict]]
+def accelerateLoops(tokens: List[Tuple[Lexer.Instruction, dict]], constants: dict) -> List[
+        Tuple[Lexer.Instruction, dict]]:
+    """
+    Replaces the first instruction of every loop that can be run in closed form (see findLoop) by a LOOP, which runs
+    all iterations of the loop at once. The other instructions of the loop are kept in their place.
+    :param tokens: the instructions of the program, with the jumps rewritten by rewriteJump
+    :param constants: the constant registers of the program, see constantRegisters
+    :return: the instructions with the loops replaced
+    """
+    accelerated = list(tokens)
+    for loop in filter(lambda loop: loop is not None, map(lambda end: findLoop(tokens, end, constants),
+                                                           range(len(tokens)))):
+        position, token = loop
+        if accelerated[position] is tokens[position]:
+            accelerated[position] = token
+    return accelerated
+
+
+# fuseStep :: Tuple[Instruction, dict] -> Tuple[Instruction, dict] -> int -> Either Tuple[Instruction, dict] None
+def fuseStep(step: Tuple[Lexer.Instruction, dict], branch: Tuple[Lexer.Instruction, dict], position: int) -> Union[
+        Tuple[Lexer.Instruction, dict], None]:
+    """
+    Fuses an INC or DEC with the BRANCH right after it when the branch tests the variable that was changed.
+    :param step: the INC or DEC
+    :param branch: the instruction after it
+    :param position: position of the INC or DEC
+    :return: the STEPBRANCH or None when the instructions can not be fused
+    """
+    if step[0] not in (Lexer.Increment, Lexer.Decrement) or branch[0] != Lexer.CompareBranch or \
+            branch[1]["left"] != step[1]["target"]:
+        return None
+    return Lexer.StepBranch, {
+        "target": step[1]["target"],
+        "step": 1 if step[0] == Lexer.Increment else -1,
+        "comparison": branch[1]["comparison"],
+        "jump": branch[1]["target"],
+        "following": position + 1,
+        "right": branch[1]["right"]
+    }
+
+
+# entryPoints :: [Tuple[Instruction, dict]] -> Set[int]
+def entryPoints(tokens: List[Tuple[Lexer.Instruction, dict]]) -> Set[int]:
+    """
+    Finds the positions where the program can continue other than after the instruction before it, these are the
+    positions right after every position a jump can set the program counter to.
+    :param tokens: the instructions of the program
+    :return: the entry points
+    """
+    destinations = set()
+    for instruction, parameters in tokens:
+        if issubclass(instruction, Lexer.Jump) and type(parameters["target"]) == int:
+            destinations.add(parameters["target"])
+        if instruction in (Lexer.StepBranch, Lexer.Loop):
+            destinations.add(parameters["jump"])
+        if instruction == Lexer.StepBranch:
+            destinations.add(parameters["following"])
+    return set(map(lambda destination: destination + 1, destinations))
+
+
+# fuseSequences :: [Tuple[Instruction, dict]] -> [int] -> [Tuple[Instruction, dict]]
+def fuseSequences(tokens: List[Tuple[Lexer.Instruction, dict]], lines: List[int], verified: List[bool]) -> List[
+        Tuple[Lexer.Instruction, dict]]:
+    """
+    Replaces the first instruction of every run of two or more instructions by a SEQUENCE of the run. A run ends after
+    the first instruction that can jump and before every label or other entry point (see entryPoints), so the program
+    can only continue at the start of a run. The other instructions of the run are kept in their place, so every
+    instruction keeps its position.
+    :param tokens: the instructions of the program
+    :param lines: the line in the source of every instruction
+    :param verified: whether every instruction was proven safe, see Verifier.verifyProgram
+    :return: the instructions with the runs fused
+    """
+    entries = entryPoints(tokens)
+    fused = list(tokens)
+    position = 0
+    while position < len(tokens):
+        end = position
+        while end < len(tokens) and tokens[end][0] not in UNFUSABLE and not canJump(tokens[end]) and \
+                (end == position or end not in entries):
+            end += 1
+        if end < len(tokens) and tokens[end][0] not in UNFUSABLE and (end == position or end not in entries):
+            # The run includes the jump it ends with.
+            end += 1
+        if end - position > 1:
+            fused[position] = (Lexer.Sequence, {
+                "length": end - position,
+                "end": end - 1,
+                "lines": lines[position:end],
+                "verified": verified[position:end],
+                "parts": tokens[position:end]
+            })
+        position = max(end, position + 1)
+    return fused
+
+
+# canJump :: Tuple[Instruction, dict] -> bool
+def canJump(token: Tuple[Lexer.Instruction, dict]) -> bool:
+    """
+    :param token: the instruction with its parameters
+    :return: whether executing the instruction can change the program counter
+    """
+    return issubclass(token[0], Lexer.Jump) or token[0] in (Lexer.StepBranch, Lexer.Loop)
+
+
+# peephole :: [Tuple[Instruction, dict]] -> Either [int] None -> [Tuple[Instruction, dict]]
+def peephole(tokens: List[Tuple[Lexer.Instruction, dict]], lines: List[int] = None,
+             verified: List[bool] = None) -> List[
+        Tuple[Lexer.Instruction, dict]]:
+    """
+    Rewrites the common patterns of ATP++ programs to superinstructions that need fewer dispatches to execute:
+    jumps with known operands become GOTOs, NOPs or BRANCHes, loops that only count become LOOPs that run in closed
+    form, an INC or DEC followed by a BRANCH on the same variable becomes a STEPBRANCH, jumps are threaded past NOPs,
+    labels and GOTOs and finally every run of instructions becomes a SEQUENCE. Every instruction keeps its position,
+    so labels, line numbers in errors and DUMP stay the same.
+    The jumps have to be resolved to positions already, see Parser.resolveJumps.
+    :param tokens: the instructions of the program
+    :param lines: the line in the source of every instruction, the position of the instruction if None
+    :param verified: whether every instruction was proven safe (see Verifier.verifyProgram), none are if None
+    :return: the optimized instructions
+    """
+    constants = constantRegisters(tokens)
+    rewritten = list(map(
+        lambda pair: rewriteJump(pair[1], pair[0], constants) if issubclass(pair[1][0], Lexer.Jump) and
+        pair[1][0] != Lexer.Goto and type(pair[1][1]["target"]) == int else pair[1],
+        enumerate(tokens)
+    ))
+    rewritten = accelerateLoops(rewritten, constants)
+    rewritten = list(map(
+        lambda pair: fuseStep(pair[1][0], pair[1][1], pair[0]) or pair[1][0],
+        enumerate(zip(rewritten, rewritten[1:] + [(Lexer.Nop, {})]))
+    ))
+    threaded = list(map(
+        lambda token: (token[0], dict(token[1], target=landing(rewritten, token[1]["target"])))
+        if issubclass(token[0], Lexer.Jump) and type(token[1]["target"]) == int else
+        (token[0], dict(token[1], jump=landing(rewritten, token[1]["jump"])))
+        if token[0] in (Lexer.StepBranch, Lexer.Loop) else token,
+        rewritten
+    ))
+    return fuseSequences(threaded, lines if lines is not None else list(range(len(tokens))),
+                         verified if verified is not None else [False] * len(tokens))
+
+
+# sameValue :: Any -> Any -> bool
+def sameValue(left: object, right: object) -> bool:
+    """
+    Compares two values exactly: 0 and 0.0 (and 0.0 and -0.0) are different values as they are shown differently.
+    :param left: the first value
+    :param right: the second value
+    :return: whether the values are the same
+    """
+    return left is right or (type(left) == type(right) and repr(left) == repr(right))
+
+
+# joinStates :: dict -> dict -> dict
+def joinStates(left: dict, right: dict) -> dict:
+    """
+    Combines what is known about the variables on two paths to the same instruction. A variable that is missing from
+    a state is certain not to be SET yet, VARYING means nothing is known about the variable.
+    :param left: the variables on one path
+    :param right: the variables on the other path
+    :return: the variables that are the same on both paths, every other variable is VARYING
+    """
+    return dict(map(
+        lambda name: (name, left[name] if name in left.keys() and name in right.keys() and
+                      sameValue(left[name], right[name]) else VARYING),
+        list(left.keys()) + list(filter(lambda name: name not in left.keys(), right.keys()))
+    ))
+
+
+# isNumber :: Any -> bool
+def isNumber(value: object) -> bool:
+    """
+    :param value: the value of a variable as far as it is known
+    :return: whether the value is a known number
+    """
+    return type(value) in (int, float)
+
+
+# operandState :: Either str float -> dict -> Any
+def operandState(value: Union[str, float], state: dict) -> object:
+    """
+    :param value: an operand
+    :param state: what is known about the variables
+    :return: the value of the operand as far as it is known, Compiler.UNSET if it is a variable that is not SET
+    """
+    return state.get(value, Compiler.UNSET) if Compiler.isVariable(value) else value
+
+
+# arithmeticResult :: Tuple[Instruction, dict] -> dict -> Any
+def arithmeticResult(token: Tuple[Lexer.Instruction, dict], state: dict) -> object:
+    """
+    Works out what an arithmetic instruction leaves in its target, see Compiler.compileArithmetic.
+    :param token: the instruction with its parameters
+    :param state: what is known about the variables before the instruction
+    :return: the value of the target after the instruction as far as it is known
+    """
+    instruction, parameters = token
+    target = state.get(parameters["target"], Compiler.UNSET)
+    if target is Compiler.UNSET:
+        return target
+    left = operandState(parameters.get("left", parameters["target"]), state)
+    right = operandState(parameters["right"], state)
+    if left is VARYING or right is VARYING or target is VARYING:
+        return VARYING
+    if not isNumber(left) or not isNumber(right) or (instruction in DIVISIONS and right == 0):
+        # The instruction reports an error or does nothing.
+        return target
+    return ARITHMETIC[instruction](left, right)
+
+
+# jumpOutcome :: Tuple[Instruction, dict] -> dict -> Either bool None
+def jumpOutcome(token: Tuple[Lexer.Instruction, dict], state: dict) -> Union[bool, None]:
+    """
+    Works out whether a jump is taken, see Compiler.compileJump.
+    :param token: the jump with its parameters
+    :param state: what is known about the variables before the jump
+    :return: whether the jump is taken, or None if that is not known
+    """
+    instruction, parameters = token
+    if instruction == Lexer.Goto:
+        return True
+    if type(parameters["target"]) != int:
+        return False
+    # The simple variant compares the right operand with 0.
+    left = operandState(parameters.get("left", 0), state)
+    right = operandState(parameters["right"], state)
+    if any(map(lambda value: value is Compiler.UNSET or value is None, (left, right))):
+        return False
+    if left is VARYING or right is VARYING:
+        return None
+    return Compiler.COMPARISONS[Lexer.instructionKeywords(instruction)[0]](left, right)
+
+
+# transfer :: Tuple[Instruction, dict] -> dict -> dict
+def transfer(token: Tuple[Lexer.Instruction, dict], state: dict) -> dict:
+    """
+    Works out what is known about the variables after an instruction.
+    :param token: the instruction with its parameters
+    :param state: what is known about the variables before the instruction
+    :return: what is known about the variables after the instruction
+    """
+    instruction, parameters = token
+    if instruction in (Lexer.Set, Lexer.SetSimple):
+        value = operandState(parameters.get("right", 0), state)
+        return dict(state, **{parameters["target"]: None if value is Compiler.UNSET else value})
+    if instruction in (Lexer.Increment, Lexer.Decrement):
+        value = state.get(parameters["target"], Compiler.UNSET)
+        if value is Compiler.UNSET or value is None:
+            # Stepping a variable that is not SET or has no value leaves it as it is.
+            return state
+        step = 1 if instruction == Lexer.Increment else -1
+        return dict(state, **{parameters["target"]: value + step if isNumber(value) else VARYING})
+    if instruction in ARITHMETIC.keys() and parameters["target"] in state.keys():
+        # An arithmetic instruction does not SET its target when it is not SET yet.
+        return dict(state, **{parameters["target"]: arithmeticResult(token, state)})
+    return state
+
+
+# successors :: Tuple[Instruction, dict] -> int -> int -> dict -> [int]
+def successors(token: Tuple[Lexer.Instruction, dict], position: int, last: int, state: dict) -> List[int]:
+    """
+    Finds the instructions that can be executed after an instruction. The program stops when the program counter is
+    on the last instruction after executing an instruction.
+    :param token: the instruction with its parameters
+    :param position: position of the instruction
+    :param last: position of the last instruction of the program
+    :param state: what is known about the variables before the instruction
+    :return: positions of the instructions that can follow
+    """
+    if not issubclass(token[0], Lexer.Jump):
+        return [] if position == last else [position + 1]
+    taken = jumpOutcome(token, state)
+    counters = ([position] if taken is not True else []) + ([token[1]["target"]] if taken is not False else [])
+    return list(map(lambda counter: counter + 1, filter(lambda counter: counter != last, counters)))
+
+
+# analyzeDataflow :: [Tuple[Instruction, dict]] -> [Either dict None]
+def analyzeDataflow(tokens: List[Tuple[Lexer.Instruction, dict]]) -> List[Union[dict, None]]:
+    """
+    Works out what is known about the variables before every instruction, on every path through the program. An
+    instruction that can not be reached has no state.
+    :param tokens: the instructions of the program, with the jumps resolved to positions
+    :return: the state before every instruction, see joinStates
+    """
+    states = [None] * len(tokens)
+    pending = [0] if len(tokens) > 0 else []
+    if len(tokens) > 0:
+        states[0] = {}
+    while len(pending) > 0:
+        position = pending.pop()
+        after = transfer(tokens[position], states[position])
+        for following in successors(tokens[position], position, len(tokens) - 1, states[position]):
+            joined = after if states[following] is None else joinStates(states[following], after)
+            if states[following] is None or joined != states[following] or \
+                    not all(map(lambda name: sameValue(joined[name], states[following][name]), joined.keys())):
+                states[following] = joined
+                pending.append(following)
+    return states
+
+
+# constantOperands :: Tuple[Instruction, dict] -> dict -> Tuple[Instruction, dict]
+def constantOperands(token: Tuple[Lexer.Instruction, dict], state: dict) -> Tuple[Lexer.Instruction, dict]:
+    """
+    Replaces the operands of an instruction that are variables with a known number by that number.
+    :param token: the instruction with its parameters
+    :param state: what is known about the variables before the instruction
+    :return: the instruction with the known operands replaced
+    """
+    instruction, parameters = token
+    return instruction, dict(map(
+        lambda item: (item[0], state[item[1]])
+        if item[0] in ("left", "right") and Compiler.isVariable(item[1]) and isNumber(state.get(item[1])) else item,
+        parameters.items()
+    ))
+
+
+# foldable :: Tuple[Instruction, dict] -> dict -> bool
+def foldable(token: Tuple[Lexer.Instruction, dict], state: dict) -> bool:
+    """
+    Finds out whether an INC, DEC or arithmetic instruction always computes the same number without reporting an error.
+    :param token: the instruction with its parameters
+    :param state: what is known about the variables before the instruction
+    :return: whether the instruction can be replaced by a SET of its result
+    """
+    instruction, parameters = token
+    if not isNumber(state.get(parameters["target"])):
+        return False
+    if instruction in (Lexer.Increment, Lexer.Decrement):
+        return True
+    left = operandState(parameters.get("left", parameters["target"]), state)
+    right = operandState(parameters["right"], state)
+    return isNumber(left) and isNumber(right) and not (instruction in DIVISIONS and right == 0)
+
+
+# foldInstruction :: Tuple[Instruction, dict] -> dict -> Tuple[Instruction, dict]
+def foldInstruction(token: Tuple[Lexer.Instruction, dict], state: dict) -> Tuple[Lexer.Instruction, dict]:
+    """
+    Rewrites an instruction using what is known about the variables: an INC, DEC or arithmetic instruction whose
+    result is known becomes a SET of the result, a jump whose outcome is known becomes a GOTO or a NOP and every other
+    known operand is replaced by its value. Instructions that report an error are kept as they are.
+    :param token: the instruction with its parameters
+    :param state: what is known about the variables before the instruction
+    :return: the rewritten instruction
+    """
+    instruction, parameters = token
+    if (instruction in (Lexer.Increment, Lexer.Decrement) or instruction in ARITHMETIC.keys()) and \
+            foldable(token, state):
+        return Lexer.Set, {"target": parameters["target"], "right": transfer(token, state)[parameters["target"]]}
+    if issubclass(instruction, Lexer.Jump) and type(parameters["target"]) == int:
+        taken = jumpOutcome(token, state)
+        if taken is True:
+            return Lexer.Goto, {"target": parameters["target"]}
+        # A jump that is not taken still reports the operands that are not SET.
+        if taken is False and not any(map(lambda value: operandState(value, state) in (Compiler.UNSET, VARYING),
+                                          (parameters.get("left", 0), parameters["right"]))):
+            return Lexer.Nop, {}
+    return constantOperands(token, state)
+
+
+# propagateConstants :: [Tuple[Instruction, dict]] -> [Tuple[Instruction, dict]]
+def propagateConstants(tokens: List[Tuple[Lexer.Instruction, dict]]) -> List[Tuple[Lexer.Instruction, dict]]:
+    """
+    Folds every instruction whose operands are known on every path to it, see analyzeDataflow and foldInstruction.
+    Instructions that can not be reached become NOPs.
+    :param tokens: the instructions of the program, with the jumps resolved to positions
+    :return: the folded instructions
+    """
+    states = analyzeDataflow(tokens)
+    return list(map(
+        lambda pair: (Lexer.Nop, {}) if pair[1] is None else foldInstruction(pair[0], pair[1]),
+        zip(tokens, states)
+    ))
+
+
+# compact :: [Tuple[Instruction, dict]] -> [int] -> [bool] -> Tuple[[Tuple[Instruction, dict]], [int], [bool]]
+def compact(tokens: List[Tuple[Lexer.Instruction, dict]], lines: List[int], verified: List[bool]) -> Tuple[
+        List[Tuple[Lexer.Instruction, dict]], List[int], List[bool]]:
+    """
+    Removes the NOPs and labels from a program. A jump to a removed instruction leads to the instruction before it
+    instead, so the program continues at the same instruction. The last instruction is kept, as the program stops
+    after executing it.
+    :param tokens: the instructions of the program, with the jumps resolved to positions
+    :param lines: the line in the source of every instruction
+    :param verified: whether every instruction was proven safe, see Verifier.verifyProgram
+    :return: the remaining instructions, their lines in the source and whether they were proven safe
+    """
+    kept = list(filter(
+        lambda position: tokens[position][0] not in (Lexer.Nop, Lexer.Declare) or position == len(tokens) - 1,
+        range(len(tokens))
+    ))
+    renumbered = list(map(
+        lambda token: (token[0], dict(token[1], target=bisect_right(kept, token[1]["target"]) - 1))
+        if issubclass(token[0], Lexer.Jump) and type(token[1]["target"]) == int else token,
+        map(lambda position: tokens[position], kept)
+    ))
+    return renumbered, list(map(lambda position: lines[position], kept)), \
+        list(map(lambda position: verified[position], kept))
+
+
+# optimize :: Parser.ProgramState -> Parser.ProgramState
+def optimize(ps: Parser.ProgramState) -> Parser.ProgramState:
+    """
+    Optimizes a loaded program for the compiled engine: constants are propagated (see propagateConstants), the NOPs
+    and labels are removed (see compact) and the superinstructions are formed (see peephole). The program is verified
+    before it is optimized, as only the instructions of the lexer can be verified. The optimized program contains
+    superinstructions, which the reference interpreter can not run.
+    :param ps: program state with the instructions and labels of the program
+    :return: program state with the optimized instructions, the line in the source of every instruction and whether
+    every instruction was proven safe
+    """
+    lines = ps.lines if ps.lines is not None else list(range(len(ps.instructions)))
+    verified = ps.verified if ps.verified is not None else Verifier.verifyProgram(ps.instructions).safe
+    instructions, lines, verified = compact(propagateConstants(ps.instructions), lines, verified)
+    optimized = Parser.ProgramState()
+    optimized.instructions = peephole(instructions, lines, verified)
+    optimized.lines = lines
+    optimized.verified = verified
+    # The labels keep leading to the lines in the source, they are only shown by DUMP and the profiler.
+    optimized.labels = ps.labels
+    optimized.output = ps.output
+    return optimized
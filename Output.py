@@ -0,0 +1,157 @@
+import sys
+from abc import ABC, abstractmethod
+from typing import List, TextIO, Union
+
+
+class OutputSink(ABC):
+    """
+    Destination of the output of PRINT and DUMP. Output is collected in a buffer and written in batches of flush_size
+    writes, a flush_size of 1 writes everything immediately.
+    A sink is a shared resource rather than part of the program state, so copying a program state (see
+    ATPTools.copyParameters) keeps the same sink.
+    """
+
+    def __init__(self, flush_size: int = 1):
+        self.flush_size = max(1, flush_size)
+        self.buffer = []
+        self.written = 0
+
+    def write(self, text: str) -> None:
+        """
+        Writes text to the sink, the text is not followed by a newline automatically.
+        :param text: the text to write
+        :return: None
+        """
+        self.buffer.append(text)
+        self.written += 1
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes everything that is buffered to the destination of the sink.
+        :return: None
+        """
+        if len(self.buffer) > 0:
+            self.emit("".join(self.buffer))
+            self.buffer = []
+
+    @abstractmethod
+    def emit(self, text: str) -> None:
+        """
+        Writes a batch of buffered text to the destination of the sink, implemented by every kind of sink.
+        :param text: the batch of text
+        :return: None
+        """
+
+    def close(self) -> None:
+        """
+        Flushes the sink and releases its destination.
+        :return: None
+        """
+        self.flush()
+
+    def position(self) -> Union[int, None]:
+        """
+        :return: the position in the destination the next output is written to, None if the destination has none
+        """
+        return None
+
+    def __deepcopy__(self, memo: dict) -> "OutputSink":
+        return self
+
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, *exception) -> None:
+        self.close()
+
+
+class ConsoleSink(OutputSink):
+    """
+    Writes to whatever sys.stdout is at the moment the output is flushed.
+    """
+
+    def emit(self, text: str) -> None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+class StreamSink(OutputSink):
+    """
+    Writes to an open text stream, the stream is not closed by the sink.
+    """
+
+    def __init__(self, stream: TextIO, flush_size: int = 1):
+        super().__init__(flush_size)
+        self.stream = stream
+
+    def emit(self, text: str) -> None:
+        self.stream.write(text)
+        self.stream.flush()
+
+    def position(self) -> Union[int, None]:
+        if not self.stream.seekable():
+            return None
+        self.flush()
+        return self.stream.tell()
+
+
+class FileSink(StreamSink):
+    """
+    Writes to a file, which is created (or truncated) when the sink is made and closed together with the sink.
+    """
+
+    def __init__(self, path: str, flush_size: int = 1, mode: str = "w"):
+        super().__init__(open(path, mode), flush_size)
+
+    def close(self) -> None:
+        super().close()
+        self.stream.close()
+
+    def truncate(self, position: int) -> None:
+        """
+        Removes everything after a position from the file, the output that follows is written from there.
+        :param position: the position to keep the output up to, see position
+        :return: None
+        """
+        self.flush()
+        self.stream.seek(position)
+        self.stream.truncate()
+
+
+class CollectorSink(OutputSink):
+    """
+    Keeps all output in memory, the complete output can be retrieved with getvalue or line by line with lines.
+    """
+
+    def __init__(self, flush_size: int = 1):
+        super().__init__(flush_size)
+        self.chunks = []
+
+    def emit(self, text: str) -> None:
+        self.chunks.append(text)
+
+    def getvalue(self) -> str:
+        """
+        :return: everything written to the sink
+        """
+        self.flush()
+        return "".join(self.chunks)
+
+    def lines(self) -> List[str]:
+        """
+        :return: everything written to the sink split into lines, without the line endings
+        """
+        return self.getvalue().splitlines()
+
+
+# defaultFlushSize :: TextIO -> int
+def defaultFlushSize(stream: TextIO) -> int:
+    """
+    Picks how many writes to buffer for a stream: none for an interactive terminal so output shows up while the
+    program runs, a large batch otherwise.
+    :param stream: the stream that is written to
+    :return: the flush size
+    """
+    return 1 if stream.isatty() else 4096
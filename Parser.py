@@ -1,7 +1,9 @@
 from typing import List, Union, Tuple
 
 import ATPTools
+import Errors
 import Lexer
+import Output
 
 
 class ProgramState:
@@ -17,6 +19,11 @@ class ProgramState:
         self.errors = []
         self.instructions = []
         self.labels = {}
+        self.output = Output.ConsoleSink()
+        # Line in the source of every instruction, None when every line of the source is an instruction.
+        self.lines = None
+        # Whether every instruction was proven safe by Verifier.verifyProgram, None when it was not verified yet.
+        self.verified = None
 
     def __str__(self) -> str:
         return "ProgramState: [\n\tcurrent line: {line}\n\tvariables: {vars}\n\tlabels: {labels}\n\twarnings: {warn}\n\terrors: {err}\n]\n".format(
@@ -77,10 +84,10 @@ def checkPrintParameters(ps: ProgramState, parameters: dict) -> Tuple[ProgramSta
     :return: ProgramState with an int, float or str
     """
     if parameters["right"] not in ps.variables.keys():
-        if parameters["right"][0] == '"' and parameters["right"][-1] == '"':
+        if type(parameters["right"]) == str and parameters["right"][0] == '"' and parameters["right"][-1] == '"':
             right = parameters["right"]
         else:
-            right = checkVariable(ps, "right", parameters)
+            ps, right = checkVariable(ps, "right", parameters)
     else:
         right = ps.variables[parameters["right"]]
     return ps, right
@@ -102,7 +109,6 @@ def checkFuncArguments(ps: ProgramState, parameters: dict, instruction: str) ->
         ps.errors.append("{1} expects a name on line {0}".format(ps.current_pos, instruction))
         return ps, None, None
     if parameters["target"] not in ps.variables.keys():
-        print("parameters")
         ps.errors.append(
             "Unknown variable {0} on line {1} for instruction {2}".format(parameters["target"], ps.current_pos,
                                                                           instruction))
@@ -135,8 +141,9 @@ def checkJumpArguments(ps: ProgramState, parameters, instruction: str) -> Tuple[
     if "target" not in parameters.keys() or parameters["target"] in ("", None):
         ps.errors.append("{1} expects a label on line {0}".format(ps.current_pos, instruction))
         return ps, None, None
-    if parameters["target"] not in ps.labels.keys():
-        ps.errors.append("Unknown label {0} on line {1}".format(parameters["target"], instruction))
+    if type(parameters["target"]) != int:
+        # Every known label is replaced by its position when the program is loaded, see resolveJumps
+        ps.errors.append("Unknown label {0} on line {1}".format(parameters["target"], ps.current_pos))
         return ps, None, None
     if len(parameters) >= 2:
         ps, right = checkVariable(ps, "right", parameters)
@@ -151,6 +158,32 @@ def checkJumpArguments(ps: ProgramState, parameters, instruction: str) -> Tuple[
     return ps, None, None
 
 
+# stepVariable :: ProgramState -> dict -> int -> str -> ProgramState
+@ATPTools.copyParameters
+def stepVariable(ps: ProgramState, parameters: dict, step: int, instruction: str) -> ProgramState:
+    """
+    Adds a step to a variable, an unknown variable is reported like the arithmetic functions do (see
+    checkFuncArguments) and a variable without a value is left as it is
+    :param ps: current program state
+    :param parameters: parameters for the function
+    :param step: the amount that is added to the variable
+    :param instruction: which instruction is being executed for error messaging
+    :return: program state after the step
+    """
+    if "target" not in parameters.keys() or parameters["target"] in ("", None):
+        ps.errors.append("{1} expects a name on line {0}".format(ps.current_pos, instruction))
+        return ps
+    if parameters["target"] not in ps.variables.keys():
+        ps.errors.append(
+            "Unknown variable {0} on line {1} for instruction {2}".format(parameters["target"], ps.current_pos,
+                                                                          instruction))
+        return ps
+    if ps.variables[parameters["target"]] is None:
+        return ps
+    ps.variables[parameters["target"]] = ps.variables[parameters["target"]] + step
+    return ps
+
+
 # incrementVariable :: ProgramState -> dict -> ProgramState
 @ATPTools.copyParameters
 def incrementVariable(ps: ProgramState, parameters: dict) -> ProgramState:
@@ -160,10 +193,7 @@ def incrementVariable(ps: ProgramState, parameters: dict) -> ProgramState:
     :param parameters: parameters for the function
     :return: program state after incrementing
     """
-    if "target" not in parameters.keys():
-        ps.errors.append("target must be specified for increment on line {0}".format(ps.current_pos))
-    ps.variables[parameters["target"]] = ps.variables[parameters["target"]] + 1
-    return ps
+    return stepVariable(ps, parameters, 1, "INC")
 
 
 # decrementVariable :: ProgramState -> dict -> ProgramState
@@ -175,10 +205,7 @@ def decrementVariable(ps: ProgramState, parameters: dict) -> ProgramState:
     :param parameters: parameters for the function
     :return: program state after decrementing
     """
-    if "target" not in parameters.keys():
-        ps.errors.append("target must be specified for decrement on line {0}".format(ps.current_pos))
-    ps.variables[parameters["target"]] = ps.variables[parameters["target"]] - 1
-    return ps
+    return stepVariable(ps, parameters, -1, "DEC")
 
 
 # addToVariable :: ProgramState -> dict -> ProgramState
@@ -280,7 +307,7 @@ def jump_equal(ps: ProgramState, parameters: dict) -> ProgramState:
     if left is None or right is None:
         return ps
     if left == right:
-        ps.current_pos = ps.labels[parameters["target"]]
+        ps.current_pos = parameters["target"]
     return ps
 
 
@@ -297,7 +324,7 @@ def jump_not_equal(ps: ProgramState, parameters: dict) -> ProgramState:
     if left is None or right is None:
         return ps
     if left != right:
-        ps.current_pos = ps.labels[parameters["target"]]
+        ps.current_pos = parameters["target"]
     return ps
 
 
@@ -314,7 +341,7 @@ def jump_less_than(ps: ProgramState, parameters: dict) -> ProgramState:
     if left is None or right is None:
         return ps
     if left < right:
-        ps.current_pos = ps.labels[parameters["target"]]
+        ps.current_pos = parameters["target"]
     return ps
 
 
@@ -331,7 +358,7 @@ def jump_greater_than(ps: ProgramState, parameters: dict) -> ProgramState:
     if left is None or right is None:
         return ps
     if left > right:
-        ps.current_pos = ps.labels[parameters["target"]]
+        ps.current_pos = parameters["target"]
     return ps
 
 
@@ -348,7 +375,7 @@ def jump_less_or_equal(ps: ProgramState, parameters: dict) -> ProgramState:
     if left is None or right is None:
         return ps
     if left <= right:
-        ps.current_pos = ps.labels[parameters["target"]]
+        ps.current_pos = parameters["target"]
     return ps
 
 
@@ -365,7 +392,7 @@ def jump_greater_or_equal(ps: ProgramState, parameters: dict) -> ProgramState:
     if left is None or right is None:
         return ps
     if left >= right:
-        ps.current_pos = ps.labels[parameters["target"]]
+        ps.current_pos = parameters["target"]
     return ps
 
 
@@ -382,7 +409,7 @@ def ATPPrint(ps: ProgramState, parameters: dict) -> ProgramState:
     if right is None:
         ps.errors.append("Incorrect parameter for PRINT on line {0}".format(ps.current_pos))
         return ps
-    print("> {}".format(right))
+    ps.output.write("> {}\n".format(right))
     return ps
 
 
@@ -390,13 +417,13 @@ def ATPPrint(ps: ProgramState, parameters: dict) -> ProgramState:
 @ATPTools.copyParameters
 def ATPDump(ps: ProgramState) -> ProgramState:
     """
-    Dumps the program state to stdio
+    Dumps the program state to the output of the program
     :param ps: current program state
     :return: program state
     """
-    print("-------------DUMPING PROGRAM STATE-------------")
-    print(ps)
-    print("-----------END DUMPING PROGRAM STATE-----------")
+    ps.output.write(
+        "-------------DUMPING PROGRAM STATE-------------\n{0}\n-----------END DUMPING PROGRAM STATE-----------\n"
+        .format(ps))
     return ps
 
 
@@ -410,14 +437,35 @@ def parseLabels(tokens: List[Tuple[Lexer.Instruction, dict]], counter: int = 0)
     :param counter: current line number
     :return: dict of labels with their position
     """
-    if len(tokens) == 0:
-        return {}
-    if tokens[0][0] == Lexer.Declare:
-        # Je kunt dicts niet samenvoegen, dus we maken een nieuwe dict aan met de vorige dict en de return waarde van
-        # de recursieve function-call
-        return dict(**{tokens[0][1]["label"]: counter}, **parseLabels(tokens[1:], counter + 1))
-    else:
-        return parseLabels(tokens[1:], counter + 1)
+    return dict(map(lambda token: (token[1][1]["label"], token[0]),
+                    filter(lambda token: token[1][0] == Lexer.Declare, enumerate(tokens, counter))))
+
+
+# resolveJumps :: List[Tuple[Instruction, dict]] -> dict -> Tuple[List[Tuple[Instruction, dict]], List[str]]
+@ATPTools.copyParameters
+def resolveJumps(tokens: List[Tuple[Lexer.Instruction, dict]], labels: dict) -> Tuple[
+    List[Tuple[Lexer.Instruction, dict]], List[str]]:
+    """
+    Replaces the label that every jump leads to with the position of that label, so taking a jump while the program
+    runs is a single assignment to the program counter. Jumps to unknown labels are kept as they are and reported.
+    :param tokens: List of instructions
+    :param labels: dict of labels with their position, see parseLabels
+    :return: the instructions with resolved jumps and the errors for the unknown labels
+    """
+    # isJump :: Tuple[Instruction, dict] -> bool
+    def isJump(token: Tuple[Lexer.Instruction, dict]) -> bool:
+        return issubclass(token[0], Lexer.Jump) and token[1] is not None
+
+    # resolve :: Tuple[Instruction, dict] -> Tuple[Instruction, dict]
+    def resolve(token: Tuple[Lexer.Instruction, dict]) -> Tuple[Lexer.Instruction, dict]:
+        if not isJump(token) or token[1]["target"] not in labels.keys():
+            return token
+        return token[0], dict(token[1], target=labels[token[1]["target"]])
+
+    errors = list(map(lambda token: "Unknown label {0} on line {1}".format(token[1][1]["target"], token[0]),
+                      filter(lambda token: isJump(token[1]) and token[1][1]["target"] not in labels.keys(),
+                             enumerate(tokens))))
+    return list(map(resolve, tokens)), errors
 
 
 @ATPTools.copyParameters
@@ -462,7 +510,31 @@ def runProgram(ps: ProgramState) -> ProgramState:
     elif current_token == Lexer.Print:
         ps = ATPPrint(ps, current_parameters)
     elif current_token == Lexer.Dump:
-        ps = ATPDump(ps, current_parameters)
+        ps = ATPDump(ps)
     if len(ps.errors) > 0:
         return ps
     return ps
+
+
+# executeProgram :: ProgramState -> ProgramState
+@ATPTools.copyParameters
+def executeProgram(ps: ProgramState) -> ProgramState:
+    """
+    Runs the program from the current program state until the program counter reaches the last instruction.
+    Every step is delegated to runProgram, but the steps are driven by a flat loop instead of recursion so the stack
+    depth stays constant and only the current program state is kept alive, no matter how many instructions execute.
+    When the errors are a strict Errors.ErrorLog the run halts on the first error, with the program counter on the
+    instruction that reported it and the variables as they were before that instruction.
+    :param ps: current program state
+    :return: program state after executing the program to completion, or up to its first error in a strict run
+    """
+    position = ps.current_pos
+    try:
+        while ps.current_pos != len(ps.instructions) - 1:
+            position = ps.current_pos + 1
+            ps = runProgram(ps)
+    except Errors.ProgramHalted as halt:
+        # Without the in-place mode the step that halted worked on a copy, so its error is only in the halt.
+        ps.current_pos = position
+        ps.errors = halt.errors
+    return ps
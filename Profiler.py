@@ -0,0 +1,203 @@
+import marshal
+from bisect import bisect_right
+from time import perf_counter
+from typing import List, TextIO, Tuple
+
+import Compiler
+import Lexer
+
+
+class Profile:
+    """
+    Execution counts and times of a profiled run. Every list is indexed by the position of an instruction, edges holds
+    how often each jump was taken with the position of the jump and the position it lead to as key.
+    """
+
+    def __init__(self, program: Compiler.CompiledProgram):
+        self.program = program
+        self.counts = [0] * len(program.code)
+        self.times = [0.0] * len(program.code)
+        self.edges = {}
+        self.total_time = 0.0
+
+
+# describeToken :: Tuple[Instruction, dict] -> dict -> str
+def describeToken(token: Tuple[Lexer.Instruction, dict], labels: dict) -> str:
+    """
+    Writes an instruction back in the form it has in the source, without comments.
+    :param token: the instruction with its parameters
+    :param labels: the labels of the program, used to show the label of resolved jumps
+    :return: the instruction as text
+    """
+    instruction, parameters = token
+    names = dict(map(lambda label: (label[1], label[0]), labels.items()))
+    values = map(lambda key: names.get(parameters[key], parameters[key])
+                 if key == "jump" or (key == "target" and issubclass(instruction, Lexer.Jump)) else parameters[key],
+                 filter(lambda key: key in parameters.keys(), instruction().parameters))
+    return " ".join([Lexer.instructionKeywords(instruction)[0]] + list(map(str, values)))
+
+
+# programLabels :: CompiledProgram -> dict
+def programLabels(program: Compiler.CompiledProgram) -> dict:
+    """
+    Finds the position every label leads to in the compiled program, which is the line of the label when the optimizer
+    did not remove any instructions.
+    :param program: the compiled program
+    :return: dict with the names of the labels as keys and their positions as values
+    """
+    return dict(map(lambda label: (label[0], bisect_right(program.lines, label[1]) - 1), program.labels.items()))
+
+
+# sourceLine :: CompiledProgram -> int -> int
+def sourceLine(program: Compiler.CompiledProgram, position: int) -> int:
+    """
+    :param program: the compiled program
+    :param position: position of an instruction in the compiled program
+    :return: the number of the line of the instruction in the source, counting from 1
+    """
+    return program.lines[position] + 1 if 0 <= position < len(program.lines) else position + 1
+
+
+# blockLabels :: CompiledProgram -> [str]
+def blockLabels(program: Compiler.CompiledProgram) -> List[str]:
+    """
+    Finds the label-delimited block of every instruction, that is the last label declared before it.
+    Instructions before the first label belong to the block "<start>".
+    :param program: the compiled program
+    :return: the label of the block of every instruction
+    """
+    ordered = sorted(program.labels.items(), key=lambda label: label[1])
+    declared = list(map(lambda label: label[1], ordered))
+    return list(map(
+        lambda line: ordered[bisect_right(declared, line) - 1][0] if bisect_right(declared, line) > 0 else "<start>",
+        program.lines
+    ))
+
+
+# executeProfiled :: CompiledProgram -> MachineState -> Tuple[MachineState, Profile]
+def executeProfiled(program: Compiler.CompiledProgram, state: Compiler.MachineState) -> Tuple[
+        Compiler.MachineState, Profile]:
+    """
+    Runs a compiled program like Compiler.executeCompiled does, while counting and timing every executed instruction
+    and every taken jump. This is a separate loop so running without the profiler does not pay for any of this.
+    :param program: the compiled program
+    :param state: machine state to start from
+    :return: the machine state after executing the program to completion and the profile of the run
+    """
+    profile = Profile(program)
+    code = program.code
+    counts = profile.counts
+    times = profile.times
+    edges = profile.edges
+    last = len(code) - 1
+    started = perf_counter()
+    while state.current_pos != last:
+        position = state.current_pos + 1
+        state.current_pos = position
+        start = perf_counter()
+        code[position](state)
+        times[position] += perf_counter() - start
+        counts[position] += 1
+        if state.current_pos != position:
+            edge = (position, state.current_pos)
+            edges[edge] = edges.get(edge, 0) + 1
+    profile.total_time = perf_counter() - started
+    return state, profile
+
+
+# writeReport :: Profile -> TextIO -> int -> None
+def writeReport(profile: Profile, stream: TextIO, top: int = 10) -> None:
+    """
+    Writes a report of the hottest lines, blocks, jumps and loops of a profiled run.
+    Lines are numbered from 1, loops are jumps that lead back to an earlier position in the program.
+    :param profile: the profile of the run
+    :param stream: where to write the report to
+    :param top: how many entries of each table to show
+    :return: None
+    """
+    program = profile.program
+    labels = programLabels(program)
+    names = dict(map(lambda label: (label[1], label[0]), labels.items()))
+    describe = list(map(lambda token: describeToken(token, labels), program.instructions))
+    executed = sum(profile.counts)
+    stream.write("Profile: {0} instructions executed in {1:.6f} s\n".format(executed, profile.total_time))
+
+    stream.write("\nHottest lines:\n{0:>8} {1:>12} {2:>12} {3:>10}  {4}\n".format(
+        "line", "count", "total ms", "avg us", "instruction"))
+    lines = sorted(filter(lambda position: profile.counts[position] > 0, range(len(program.code))),
+                   key=lambda position: (-profile.times[position], position))
+    for position in lines[:top]:
+        stream.write("{0:>8} {1:>12} {2:>12.3f} {3:>10.3f}  {4}\n".format(
+            sourceLine(program, position), profile.counts[position], profile.times[position] * 1e3,
+            profile.times[position] * 1e6 / profile.counts[position], describe[position]))
+
+    stream.write("\nHottest blocks:\n{0:>20} {1:>12} {2:>12}\n".format("block", "count", "total ms"))
+    blocks = {}
+    for block, count, time in zip(blockLabels(program), profile.counts, profile.times):
+        blocks[block] = (blocks.get(block, (0, 0.0))[0] + count, blocks.get(block, (0, 0.0))[1] + time)
+    for block, (count, time) in sorted(filter(lambda item: item[1][0] > 0, blocks.items()),
+                                       key=lambda item: -item[1][1])[:top]:
+        stream.write("{0:>20} {1:>12} {2:>12.3f}\n".format(block, count, time * 1e3))
+
+    stream.write("\nHottest jumps:\n{0:>8} {1:>12} {2:>12}  {3}\n".format("line", "taken", "executed", "instruction"))
+    for (source, destination), taken in sorted(profile.edges.items(), key=lambda item: -item[1])[:top]:
+        stream.write("{0:>8} {1:>12} {2:>12}  {3}\n".format(
+            sourceLine(program, source), taken, profile.counts[source], describe[source]))
+
+    stream.write("\nLoops:\n{0:>20} {1:>12}  {2}\n".format("loop", "iterations", "back-edges from lines"))
+    loops = {}
+    for (source, destination), taken in filter(lambda edge: edge[0][1] < edge[0][0], profile.edges.items()):
+        iterations, sources = loops.get(destination, (0, []))
+        loops[destination] = (iterations + taken, sources + [sourceLine(program, source)])
+    for destination, (iterations, sources) in sorted(loops.items(), key=lambda item: -item[1][0])[:top]:
+        stream.write("{0:>20} {1:>12}  {2}\n".format(
+            names.get(destination, sourceLine(program, destination)), iterations, ", ".join(map(str, sorted(sources)))))
+
+
+# writePstats :: Profile -> str -> str -> None
+def writePstats(profile: Profile, path: str, filename: str) -> None:
+    """
+    Writes the profile in the format of the standard library profilers, so it can be read with pstats.Stats and the
+    tools built on it. Every executed line is a function that is called by the block it belongs to.
+    :param profile: the profile of the run
+    :param path: the file to write to
+    :param filename: name of the profiled program
+    :return: None
+    """
+    program = profile.program
+    blocks = blockLabels(program)
+    labels = programLabels(program)
+    block_lines = dict(map(lambda label: (label[0], label[1] + 1), program.labels.items()))
+    stats = {}
+    for position, (count, time) in enumerate(zip(profile.counts, profile.times)):
+        if count == 0:
+            continue
+        block = (filename, block_lines.get(blocks[position], 0), blocks[position])
+        key = (filename, sourceLine(program, position), describeToken(program.instructions[position], labels))
+        stats[key] = (count, count, time, time, {block: (count, count, time, time)})
+        block_count, _, _, block_time, _ = stats.get(block, (0, 0, 0.0, 0.0, {}))
+        stats[block] = (block_count + count, block_count + count, 0.0, block_time + time, {})
+    with open(path, "wb") as file:
+        marshal.dump(stats, file)
+
+
+# writeCollapsed :: Profile -> str -> str -> None
+def writeCollapsed(profile: Profile, path: str, filename: str) -> None:
+    """
+    Writes the profile as collapsed stacks (program;block;line weight), the input format of flamegraph tools.
+    The weight of every line is the time spent on it in microseconds.
+    :param profile: the profile of the run
+    :param path: the file to write to
+    :param filename: name of the profiled program
+    :return: None
+    """
+    program = profile.program
+    blocks = blockLabels(program)
+    labels = programLabels(program)
+    with open(path, "w") as file:
+        for position, (count, time) in enumerate(zip(profile.counts, profile.times)):
+            if count > 0:
+                file.write("{0};{1};{2} {3} {4}\n".format(
+                    filename, blocks[position], sourceLine(program, position),
+                    describeToken(program.instructions[position], labels).replace(";", ","),
+                    max(1, round(time * 1e6))))
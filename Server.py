@@ -0,0 +1,395 @@
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from time import perf_counter
+from typing import Awaitable, Callable, Tuple, Union
+
+import Checkpoint
+import Compiler
+import Errors
+import Limits
+import Optimizer
+import Output
+import Parser
+from Loader import haltReport, readLines
+
+# Number of instructions a request runs on the event loop before the rest of the run is handed to the worker pool,
+# most small programs finish within it without ever leaving the server process.
+INLINE_INSTRUCTIONS = 10000
+
+# Number of instructions in every slice of a run on the worker pool, the output of a slice is streamed back before the
+# next slice starts.
+SLICE_INSTRUCTIONS = 200000
+
+# Longest request line the server accepts, a request holds the whole source of its program.
+REQUEST_LIMIT = 64 * 1024 * 1024
+
+# A program in the cache: as it was parsed, as it is run (optimized or not) and compiled.
+CachedProgram = Tuple[Union[Parser.ProgramState, None], Parser.ProgramState, Compiler.CompiledProgram]
+
+
+class ProgramCache:
+    """
+    Keeps the most recently used programs in memory, the least recently used program is dropped when the cache is
+    full. The server process and every worker process have their own cache, see PROGRAMS. Every program is kept as it
+    was parsed (only in the server process, None in the workers), as it is run and compiled. The server process loads
+    programs on the threads of its executor, so the cache is locked while it is used.
+    """
+
+    def __init__(self, size: int = 128):
+        self.size = max(1, size)
+        self.programs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Union[CachedProgram, None]:
+        """
+        :param key: the key of the program, see programKey
+        :return: the parsed, loaded and compiled program, None if the program is not in the cache
+        """
+        with self.lock:
+            program = self.programs.get(key)
+            if program is not None:
+                self.programs.move_to_end(key)
+            return program
+
+    def put(self, key: str, program: CachedProgram) -> None:
+        """
+        :param key: the key of the program, see programKey
+        :param program: the parsed, loaded and compiled program
+        :return: None
+        """
+        with self.lock:
+            self.programs[key] = program
+            self.programs.move_to_end(key)
+            while len(self.programs) > self.size:
+                self.programs.popitem(last=False)
+
+
+# The compiled programs of this process.
+PROGRAMS = ProgramCache()
+
+
+class RequestError(Exception):
+    """
+    Raised when a request can not be run, because it is not valid or its program can not be read or parsed.
+    """
+
+    def __init__(self, status: str, errors: list):
+        super().__init__("\n".join(errors))
+        self.status = status
+        self.errors = errors
+
+
+class ProgramMissing(Exception):
+    """
+    Raised by a worker that is sent the key of a program without its source, when the program is not in its cache.
+    """
+
+
+# programKey :: str -> bool -> str
+def programKey(source: str, optimize: bool) -> str:
+    """
+    :param source: the source of a program
+    :param optimize: whether the program is optimized
+    :return: the key of the compiled program in the cache
+    """
+    digest = hashlib.sha256(source.encode())
+    digest.update(b"optimized" if optimize else b"")
+    return digest.hexdigest()
+
+
+# compiledProgram :: str -> Either str None -> bool -> Compiler.CompiledProgram
+def compiledProgram(key: str, source: Union[str, None], optimize: bool) -> Compiler.CompiledProgram:
+    """
+    Takes a compiled program from the cache of the process, or parses, optimizes and compiles it when it was not
+    compiled before.
+    :param key: the key of the program, see programKey
+    :param source: the source of the program, None when the program has to be in the cache
+    :param optimize: whether the program is optimized, see Optimizer.optimize
+    :return: the compiled program
+    """
+    cached = PROGRAMS.get(key)
+    if cached is not None:
+        return cached[2]
+    if source is None:
+        raise ProgramMissing(key)
+    parsed, errors = readLines(io.StringIO(source))
+    if len(errors) > 0:
+        raise RequestError("parse_error", errors)
+    ps = Optimizer.optimize(parsed) if optimize else parsed
+    program = Compiler.compileProgram(ps)
+    PROGRAMS.put(key, (None, ps, program))
+    return program
+
+
+# loadSource :: str -> str -> bool -> CachedProgram
+def loadSource(key: str, source: str, optimize: bool) -> CachedProgram:
+    """
+    Parses, optimizes and compiles the source of a program, unless it is in the cache of the server.
+    :param key: the key of the program, see programKey
+    :param source: the source of the program
+    :param optimize: whether to optimize the program, see Optimizer.optimize
+    :return: the program as it was parsed, as it is run and compiled
+    """
+    cached = PROGRAMS.get(key)
+    if cached is not None and cached[0] is not None:
+        return cached
+    parsed, errors = readLines(io.StringIO(source))
+    if len(errors) > 0:
+        raise RequestError("parse_error", errors)
+    ps = Optimizer.optimize(parsed) if optimize else parsed
+    PROGRAMS.put(key, (parsed, ps, Compiler.compileProgram(ps)))
+    return PROGRAMS.get(key)
+
+
+# runSlice :: str -> Either str None -> bool -> Either dict None -> int -> bool -> Either int None
+#             -> Tuple[dict, str, int, bool]
+def runSlice(key: str, source: Union[str, None], optimize: bool, snapshot: Union[dict, None], budget: int,
+             strict: bool = False, max_errors: int = None) -> Tuple[dict, str, int, bool]:
+    """
+    Runs at most budget instructions of a program, in the server process or in a worker. The state of the run is
+    passed in and out as a checkpoint, see Checkpoint.snapshotState, so every slice of a run can go to another worker.
+    The program itself is not passed, a worker compiles it once and keeps it in its own cache.
+    :param key: the key of the program, see programKey
+    :param source: the source of the program, None when the program has to be in the cache (see ProgramMissing)
+    :param optimize: whether the program is optimized, see Optimizer.optimize
+    :param snapshot: the state the previous slice ended with, None to start the program
+    :param budget: the number of instructions to run
+    :param strict: whether to halt the program on its first error, see Errors.ErrorLog
+    :param max_errors: the number of errors to keep, every error is kept if None
+    :return: the state after the slice, the output of the slice, the number of executed instructions and whether the
+    program halted on an error
+    """
+    program = compiledProgram(key, source, optimize)
+    output = Output.CollectorSink(4096)
+    if snapshot is None:
+        state = Compiler.MachineState(program, output)
+    else:
+        state = Checkpoint.restoreState(program, snapshot, output)
+    state.errors = Errors.ErrorLog(strict, max_errors, state.errors)
+    code = program.code
+    last = len(code) - 1
+    steps = 0
+    try:
+        while steps < budget and state.current_pos != last:
+            steps += 1
+            state.current_pos += 1
+            code[state.current_pos](state)
+    except Errors.ProgramHalted:
+        pass
+    return Checkpoint.snapshotState(program, key, state, steps), output.getvalue(), steps, \
+        Errors.isHalted(state.errors)
+
+
+# requestLimits :: dict -> Limits.Limits
+def requestLimits(request: dict) -> Limits.Limits:
+    """
+    :param request: the request
+    :return: the limits of the run of the request, checked between two slices
+    """
+    return Limits.Limits(request.get("max_instructions"), request.get("time_limit"), request.get("max_variables"),
+                         request.get("max_state_bytes"), SLICE_INSTRUCTIONS)
+
+
+# readSource :: dict -> str
+def readSource(request: dict) -> str:
+    """
+    :param request: the request, with either the source of the program or the path to it
+    :return: the source of the program
+    """
+    if isinstance(request.get("source"), str):
+        return request["source"]
+    if not isinstance(request.get("path"), str):
+        raise RequestError("error", ["A request needs the source of a program or the path to it"])
+    try:
+        with open(request["path"], "r") as file:
+            return file.read()
+    except OSError as error:
+        raise RequestError("parse_error", [str(error)])
+
+
+# runWorkerSlice :: Executor -> str -> str -> bool -> dict -> int -> bool -> Either int None
+#                   -> Tuple[dict, str, int, bool]
+async def runWorkerSlice(pool: Executor, key: str, source: str, optimize: bool, snapshot: dict, budget: int,
+                         strict: bool, max_errors: Union[int, None]) -> Tuple[dict, str, int, bool]:
+    """
+    Runs a slice of a program on the worker pool, see runSlice. The source of the program is only sent again when the
+    worker the slice went to does not have the program in its cache.
+    :return: see runSlice
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, runSlice, key, None, optimize, snapshot, budget, strict, max_errors)
+    except ProgramMissing:
+        return await loop.run_in_executor(pool, runSlice, key, source, optimize, snapshot, budget, strict, max_errors)
+
+
+# handleRequest :: dict -> (dict -> Awaitable[None]) -> Executor -> None
+async def handleRequest(request: dict, send: Callable[[dict], Awaitable[None]], pool: Executor) -> None:
+    """
+    Runs the program of a request and streams the output of the program back while it runs, followed by the result.
+    The first INLINE_INSTRUCTIONS instructions run on the event loop, the rest of the run goes to the worker pool in
+    slices. The limits of the request are checked between two slices.
+    :param request: the request
+    :param send: sends a message to the client
+    :param pool: the worker pool
+    :return: None
+    """
+    identifier = request.get("id")
+    result = {"id": identifier, "status": "ok", "variables": {}, "warnings": [], "errors": [], "line": None,
+              "executed": 0, "cached": False, "execute_s": 0.0}
+    try:
+        loop = asyncio.get_running_loop()
+        source = await loop.run_in_executor(None, readSource, request)
+        optimize = bool(request.get("optimize", False))
+        key = programKey(source, optimize)
+        result["cached"] = PROGRAMS.get(key) is not None
+        # Reading and compiling a large program takes a while, the other requests are served in the meantime.
+        parsed, _, program = await loop.run_in_executor(None, loadSource, key, source, optimize)
+        strict, max_errors = bool(request.get("strict", False)), request.get("max_errors")
+        meter = Limits.Meter(requestLimits(request))
+        last = len(program.code) - 1
+        values = lambda: list(map(lambda variable: variable[1], snapshot["variables"]))
+        start = perf_counter()
+        snapshot, text, steps, halted = runSlice(key, source, optimize, None,
+                                                 min(INLINE_INSTRUCTIONS, Limits.nextChunk(meter)), strict, max_errors)
+        reason = None
+        while True:
+            meter.executed += steps
+            if text != "":
+                await send({"id": identifier, "output": text})
+            if snapshot["position"] == last or halted:
+                break
+            reason = Limits.exceededLimit(meter, values, snapshot["errors"], snapshot["warnings"],
+                                          program.lines[snapshot["position"]] if snapshot["position"] >= 0 else -1)
+            if reason is not None:
+                break
+            snapshot, text, steps, halted = await runWorkerSlice(pool, key, source, optimize, snapshot,
+                                                                 Limits.nextChunk(meter), strict, max_errors)
+        final = Checkpoint.restoreState(program, snapshot, Output.CollectorSink()).toProgramState()
+        if reason is not None:
+            final.errors.append(reason)
+            result["status"] = "stopped"
+        elif halted:
+            final.errors.append(haltReport(final, parsed))
+            result["status"] = "halted"
+        result.update(variables=final.variables, warnings=final.warnings, errors=final.errors,
+                      line=final.current_pos, executed=meter.executed, execute_s=perf_counter() - start)
+    except RequestError as error:
+        result.update(status=error.status, errors=error.errors)
+    except ConnectionError:
+        # The client is gone, there is nobody left to report to.
+        raise
+    except Exception as error:
+        result.update(status="crash", errors=["The interpreter failed: {0!r}".format(error)])
+    await send(result)
+
+
+# serveClient :: Executor -> asyncio.StreamReader -> asyncio.StreamWriter -> None
+async def serveClient(pool: Executor, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """
+    Serves one connection. Every line the client sends is a request in JSON, the requests of a connection run
+    concurrently and every message sent back is one line of JSON with the id of its request.
+    :param pool: the worker pool
+    :param reader: the stream from the client
+    :param writer: the stream to the client
+    :return: None
+    """
+    lock = asyncio.Lock()
+
+    # send :: dict -> None
+    async def send(message: dict) -> None:
+        async with lock:
+            writer.write((json.dumps(message) + "\n").encode())
+            await writer.drain()
+
+    requests = set()
+    try:
+        while True:
+            line = await reader.readline()
+            if line == b"":
+                break
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError()
+            except ValueError:
+                await send({"id": None, "status": "error", "errors": ["A request is one line of JSON with an object"]})
+                continue
+            task = asyncio.create_task(handleRequest(request, send, pool))
+            requests.add(task)
+            task.add_done_callback(requests.discard)
+        await asyncio.gather(*requests)
+    except ConnectionError:
+        list(map(lambda task: task.cancel(), requests))
+    finally:
+        writer.close()
+
+
+# initWorker :: int -> None
+def initWorker(cache_size: int) -> None:
+    """
+    Prepares a worker process of the pool, which keeps its own cache of compiled programs.
+    :param cache_size: the number of programs to keep in the cache
+    :return: None
+    """
+    PROGRAMS.size = max(1, cache_size)
+    # Interrupting the server is handled by the server process, which shuts the pool down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+# serve :: Either str None -> Either int None -> int -> int -> None
+async def serve(socket_path: Union[str, None], port: Union[int, None], jobs: int, cache_size: int) -> None:
+    """
+    Runs the server until it is interrupted or terminated.
+    :param socket_path: the path of the Unix socket to listen on, None to listen on a TCP port
+    :param port: the TCP port on localhost to listen on
+    :param jobs: the number of worker processes
+    :param cache_size: the number of compiled programs every process keeps in its cache
+    :return: None
+    """
+    PROGRAMS.size = max(1, cache_size)
+    # Forked workers would inherit the connections that are open when they start, and keep them open after the server
+    # closed them, so the workers are started from a clean process.
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+    with ProcessPoolExecutor(jobs, context, initWorker, (cache_size,)) as pool:
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(partial(serveClient, pool), socket_path, limit=REQUEST_LIMIT)
+        else:
+            server = await asyncio.start_server(partial(serveClient, pool), "127.0.0.1", port, limit=REQUEST_LIMIT)
+        sys.stderr.write("Listening on {0}\n".format(socket_path if socket_path is not None else
+                                                     "127.0.0.1:{0}".format(port)))
+        stopped = asyncio.Event()
+        list(map(lambda signal_number: asyncio.get_running_loop().add_signal_handler(signal_number, stopped.set),
+                 (signal.SIGINT, signal.SIGTERM)))
+        async with server:
+            await stopped.wait()
+
+
+if __name__ == '__main__':
+    argParser = argparse.ArgumentParser(description="Serves runs of ATP++ programs on a local socket")
+    argParser.add_argument('--socket', type=str, help="Path of the Unix socket to listen on")
+    argParser.add_argument('--port', type=int, help="TCP port on 127.0.0.1 to listen on")
+    argParser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                           help="Number of worker processes for long runs (default: number of CPU cores)")
+    argParser.add_argument('--cache-size', type=int, default=128,
+                           help="Number of compiled programs to keep in memory (default: 128)")
+    arguments = argParser.parse_args()
+    if (arguments.socket is None) == (arguments.port is None):
+        argParser.error("give either --socket or --port")
+    try:
+        asyncio.run(serve(arguments.socket, arguments.port, max(1, arguments.jobs), arguments.cache_size))
+    finally:
+        if arguments.socket is not None and os.path.exists(arguments.socket):
+            os.remove(arguments.socket)
@@ -0,0 +1,129 @@
+from array import array
+from typing import Iterator, List, Tuple
+
+import Lexer
+
+# The kinds of operands an instruction table can hold. A name is any string, like a variable, a label or a comparison,
+# its value is its index in the strings of the table. A number is a float and an integer an int, both held as they
+# are. Anything else (like the parts of a SEQUENCE or an integer that does not fit a float) is an object, its value is
+# its index in the objects of the table.
+NAME_OPERAND = 0
+NUMBER_OPERAND = 1
+INTEGER_OPERAND = 2
+OBJECT_OPERAND = 3
+
+# Kind of the single operand of an instruction whose parameters are None, a line the lexer did not know.
+MISSING_OPERAND = 4
+
+# Largest integer an integer operand can hold, larger integers would not come back exactly from a float.
+EXACT_INTEGERS = 2 ** 53
+
+
+class InstructionTable:
+    """
+    The instructions of a program in parallel columns rather than as a list of (instruction, parameters) tuples.
+    - opcodes: the index of the instruction class of every instruction in classes
+    - starts: where the operands of every instruction start in the operand columns, with one more entry for the end
+    - keys, kinds and values: the parameter name (an index in keys), the kind (see NAME_OPERAND and the others) and
+      the value of every operand, in the order of the parameters of its instruction
+    Every string is kept once in strings, so every variable of the program has one index that all of its operands
+    share, and every parameter name is kept once in keys.
+    The columns are never changed once the table is made, so a copy of a table is the table itself. This makes deep
+    copies of a program state (see ATPTools.copyParameters) no longer copy its instructions.
+    Indexing and iterating a table gives the instructions in their tuple form, see toTokens.
+    """
+
+    __slots__ = ("classes", "keys", "strings", "objects", "opcodes", "starts", "parameters", "kinds", "values")
+
+    def __init__(self, tokens: List[Tuple[Lexer.Instruction, dict]]):
+        """
+        :param tokens: the instructions of the program, see Lexer.lexInput and Parser.resolveJumps
+        """
+        self.objects = []
+        self.opcodes = array("H")
+        self.starts = array("L", [0])
+        self.parameters = array("B")
+        self.kinds = array("B")
+        self.values = array("d")
+        class_indices = {}
+        key_indices = {}
+        string_indices = {}
+        for instruction, parameters in tokens:
+            self.opcodes.append(class_indices.setdefault(instruction, len(class_indices)))
+            if parameters is None:
+                self.addOperand(0, MISSING_OPERAND, 0.0)
+            else:
+                for key, value in parameters.items():
+                    key_index = key_indices.setdefault(key, len(key_indices))
+                    if type(value) == str:
+                        self.addOperand(key_index, NAME_OPERAND, string_indices.setdefault(value, len(string_indices)))
+                    elif type(value) == float:
+                        self.addOperand(key_index, NUMBER_OPERAND, value)
+                    elif type(value) == int and abs(value) < EXACT_INTEGERS:
+                        self.addOperand(key_index, INTEGER_OPERAND, value)
+                    else:
+                        self.addOperand(key_index, OBJECT_OPERAND, len(self.objects))
+                        self.objects.append(value)
+            self.starts.append(len(self.kinds))
+        self.classes = list(class_indices.keys())
+        self.keys = list(key_indices.keys())
+        self.strings = list(string_indices.keys())
+
+    def addOperand(self, key: int, kind: int, value: float) -> None:
+        """
+        :param key: index of the parameter name in keys
+        :param kind: the kind of the operand, see NAME_OPERAND and the others
+        :param value: the value of the operand
+        :return: None
+        """
+        self.parameters.append(key)
+        self.kinds.append(kind)
+        self.values.append(value)
+
+    def operand(self, index: int) -> object:
+        """
+        :param index: index of the operand in the operand columns
+        :return: the value of the operand as it was in the parameters of its instruction
+        """
+        kind = self.kinds[index]
+        if kind == NAME_OPERAND:
+            return self.strings[int(self.values[index])]
+        if kind == NUMBER_OPERAND:
+            return self.values[index]
+        if kind == INTEGER_OPERAND:
+            return int(self.values[index])
+        return self.objects[int(self.values[index])]
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    def __getitem__(self, position: int) -> Tuple[Lexer.Instruction, dict]:
+        """
+        :param position: position of the instruction in the program, negative positions count from the end
+        :return: the instruction with its parameters, like in the list the table was made from
+        """
+        if position < 0:
+            position += len(self.opcodes)
+        if not 0 <= position < len(self.opcodes):
+            raise IndexError("instruction table index out of range")
+        start = self.starts[position]
+        end = self.starts[position + 1]
+        if end - start == 1 and self.kinds[start] == MISSING_OPERAND:
+            return self.classes[self.opcodes[position]], None
+        return self.classes[self.opcodes[position]], dict(map(
+            lambda index: (self.keys[self.parameters[index]], self.operand(index)), range(start, end)))
+
+    def __iter__(self) -> Iterator[Tuple[Lexer.Instruction, dict]]:
+        return map(self.__getitem__, range(len(self.opcodes)))
+
+    def __deepcopy__(self, memo: dict) -> "InstructionTable":
+        # The columns are never changed, so there is nothing to copy. The objects are the parts of superinstructions,
+        # which are never changed either.
+        return self
+
+    def toTokens(self) -> List[Tuple[Lexer.Instruction, dict]]:
+        """
+        :return: the instructions in the tuple form the table was made from, for the parts of the interpreter that
+        expect a list
+        """
+        return list(self)
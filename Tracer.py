@@ -0,0 +1,292 @@
+import math
+from typing import List, Tuple, Union
+
+import Compiler
+import Errors
+import Lexer
+import Profiler
+
+# Number of times a jump has to lead back to the same position before the loop starting there is traced.
+HOT_LOOP = 50
+
+# Largest number of instructions a trace may hold, a loop that takes longer to come back to its start is not traced.
+MAX_TRACE_LENGTH = 1000
+
+# What the recording of a trace holds for every executed instruction: its position and the program counter it left
+# behind, its own position for an instruction that did not jump.
+TraceStep = Tuple[int, int]
+
+# The Python operator of every arithmetic instruction, with whether it fails when the right operand is zero.
+ARITHMETIC = {
+    Lexer.AddSimple: ("+", False),
+    Lexer.Add: ("+", False),
+    Lexer.SubtractSimple: ("-", False),
+    Lexer.Subtract: ("-", False),
+    Lexer.MultiplySimple: ("*", False),
+    Lexer.Multiply: ("*", False),
+    Lexer.DivideSimple: ("/", True),
+    Lexer.Divide: ("/", True),
+    Lexer.ModuloSimple: ("%", True),
+    Lexer.Modulo: ("%", True),
+}
+
+# The Python operator of every comparison of the BRANCH and STEPBRANCH superinstructions, see Compiler.COMPARISONS.
+COMPARISONS = {
+    "JE": "==",
+    "JNE": "!=",
+    "JL": "<",
+    "JG": ">",
+    "JLE": "<=",
+    "JGE": ">=",
+}
+
+# The Python operator of every jump instruction, see Compiler.COMPARISONS.
+JUMPS = {
+    Lexer.JumpEqualSimple: "==",
+    Lexer.JumpEqual: "==",
+    Lexer.JumpNotEqualSimple: "!=",
+    Lexer.JumpNotEqual: "!=",
+    Lexer.JumpLessThanSimple: "<",
+    Lexer.JumpLessThan: "<",
+    Lexer.JumpGreaterThanSimple: ">",
+    Lexer.JumpGreaterThan: ">",
+    Lexer.JumpLessOrEqualSimple: "<=",
+    Lexer.JumpLessOrEqual: "<=",
+    Lexer.JumpGreaterOrEqualSimple: ">=",
+    Lexer.JumpGreaterOrEqual: ">=",
+}
+
+
+# operandSource :: Operand -> Either str None
+def operandSource(operand: Compiler.Operand) -> Union[str, None]:
+    """
+    :param operand: the operand, see Compiler.resolveOperands
+    :return: Python expression of the operand in a trace, the local variable of a variable or the literal of an
+    immediate number, None for anything else (like a string)
+    """
+    is_variable, value = operand
+    if is_variable:
+        return "v{0}".format(value)
+    if type(value) not in (int, float):
+        return None
+    return repr(value) if math.isfinite(value) else "float('{0}')".format(value)
+
+
+# exitSource :: int -> [str]
+def exitSource(position: int) -> List[str]:
+    """
+    :param position: the program counter the interpreter continues from
+    :return: the lines of a trace that leave it
+    """
+    return ["    exit_position = {0}".format(position), "    break"]
+
+
+# branchSource :: str -> bool -> int -> int -> [str]
+def branchSource(condition: str, taken: bool, stay: int, destination: int) -> List[str]:
+    """
+    :param condition: Python expression of the condition of the branch
+    :param taken: whether the branch was taken when the trace was recorded
+    :param stay: the program counter the branch leaves when it is not taken
+    :param destination: the program counter the branch leaves when it is taken
+    :return: the lines of a trace that leave it when the branch goes the other way
+    """
+    if taken:
+        return ["if not ({0}):".format(condition)] + exitSource(stay)
+    return ["if {0}:".format(condition)] + exitSource(destination)
+
+
+# expandStep :: CompiledProgram -> TraceStep -> [Tuple[Tuple[Instruction, dict], int, int]]
+def expandStep(program: Compiler.CompiledProgram,
+               step: TraceStep) -> List[Tuple[Tuple[Lexer.Instruction, dict], int, int]]:
+    """
+    Splits a SEQUENCE into its parts, which are at the positions after it and only the last of which can jump.
+    :param program: the compiled program
+    :param step: the position of an executed instruction and the program counter it left
+    :return: the instructions to trace for the step, with their positions and the program counters they left
+    """
+    position, landed = step
+    token = program.instructions[position]
+    if token[0] != Lexer.Sequence:
+        return [(token, position, landed)]
+    parts = token[1]["parts"]
+    return list(map(lambda index: (parts[index], position + index, position + index), range(len(parts) - 1))) + \
+        [(parts[-1], token[1]["end"], landed)]
+
+
+# traceInstruction :: Tuple[Instruction, dict] -> int -> int -> dict -> Either [str] None
+def traceInstruction(token: Tuple[Lexer.Instruction, dict], position: int, landed: int,
+                     labels: dict) -> Union[List[str], None]:
+    """
+    Writes the Python code for one instruction of a trace, with a guard that leaves the trace when the instruction
+    would do anything else than it did while the trace was recorded: take the other way at a jump or divide by zero.
+    The code does exactly what the handler of the instruction (see Compiler.COMPILERS) does on numbers, errors are
+    left to the handler by leaving the trace right before the instruction.
+    The parts of a SEQUENCE are traced one by one (see expandStep), a LOOP can not be traced.
+    :param token: the instruction with its resolved operands
+    :param position: position of the instruction in the compiled program
+    :param landed: the program counter the instruction left when the trace was recorded
+    :param labels: the labels of the program
+    :return: the lines of the trace, None when the instruction can not be traced
+    """
+    instruction, operands = token
+    taken = landed != position
+    if instruction in (Lexer.Declare, Lexer.Nop, Lexer.Goto):
+        # A GOTO always jumps, the trace simply continues where it leads.
+        return []
+    if instruction in (Lexer.SetSimple, Lexer.Set):
+        right = operandSource(operands["right"] if "right" in operands.keys() else (False, 0))
+        return None if right is None else ["v{0} = {1}".format(operands["target"][1], right)]
+    if instruction in (Lexer.Increment, Lexer.Decrement):
+        return ["v{0} = v{0} {1} 1".format(operands["target"][1], "+" if instruction == Lexer.Increment else "-")]
+    if instruction in ARITHMETIC.keys():
+        operator, divides = ARITHMETIC[instruction]
+        right = operandSource(operands["right"])
+        # The simple variant uses the target as the left operand.
+        left = operandSource(operands["left"] if "left" in operands.keys() else operands["target"])
+        if right is None or left is None:
+            return None
+        guard = ["if {0} == 0:".format(right)] + exitSource(position - 1) if divides else []
+        return guard + ["v{0} = {1} {2} {3}".format(operands["target"][1], left, operator, right)]
+    if instruction in JUMPS.keys():
+        target = operands["target"]
+        destination = target if type(target) == int else labels.get(target)
+        right = operandSource(operands["right"])
+        # The simple variant compares the right operand with 0.
+        left = operandSource(operands["left"] if "left" in operands.keys() else (False, 0))
+        if destination is None or right is None or left is None:
+            return None
+        return branchSource("{0} {1} {2}".format(left, JUMPS[instruction], right), taken, position, destination)
+    if instruction == Lexer.CompareBranch:
+        left = operandSource(operands["left"])
+        right = operandSource(operands["right"])
+        if right is None or left is None:
+            return None
+        condition = "{0} {1} {2}".format(left, COMPARISONS[operands["comparison"]], right)
+        return branchSource(condition, taken, position, operands["target"])
+    if instruction == Lexer.StepBranch:
+        target = operandSource(operands["target"])
+        right = operandSource(operands["right"])
+        if right is None:
+            return None
+        condition = "{0} {1} {2}".format(target, COMPARISONS[operands["comparison"]], right)
+        return ["{0} = {0} + {1}".format(target, operands["step"])] + \
+            branchSource(condition, landed != operands["following"], operands["following"], operands["jump"])
+    if instruction == Lexer.Print:
+        is_variable, right = operands["right"]
+        if not is_variable:
+            return ["write({0})".format(repr("> {}\n".format(right)))]
+        return ["write({0}.format(v{1}))".format(repr("> {}\n"), right)]
+    return None
+
+
+# compileTrace :: CompiledProgram -> int -> [TraceStep] -> Either Handler None
+def compileTrace(program: Compiler.CompiledProgram, head: int, steps: List[TraceStep]) -> \
+        Union[Compiler.Handler, None]:
+    """
+    Generates a Python function for a recorded trace of a loop. The function keeps the variables of the loop in local
+    variables and runs the loop over and over, until a guard fails (see traceInstruction). It then writes the
+    variables back and leaves the program counter where the interpreter has to continue.
+    The function only runs when every variable of the trace holds a number, otherwise it returns right away and
+    leaves the loop to the interpreter. Numbers stay numbers in a trace, so the guards of the jumps and divisions are
+    all it has to check once it runs.
+    :param program: the compiled program
+    :param head: the program counter at the start of the loop, the position a jump leads back to
+    :param steps: the recording of one run through the loop, see recordTrace
+    :return: the handler that runs the loop, it expects the program counter at head; None when an instruction of the
+    loop can not be traced
+    """
+    slots = dict(map(lambda pair: (pair[1], pair[0]), enumerate(program.names)))
+    body = []
+    variables = set()
+    for token, position, landed in sum(map(lambda step: expandStep(program, step), steps), []):
+        operands = Compiler.resolveOperands(token[0], token[1], slots)
+        lines = traceInstruction((token[0], operands), position, landed, program.labels)
+        if lines is None:
+            return None
+        variables.update(map(lambda operand: operand[1], filter(
+            lambda operand: type(operand) == tuple and operand[0] is True, operands.values())))
+        body += ["# line {0}: {1}".format(program.lines[position], Profiler.describeToken(token, program.labels))]
+        body += lines
+    names = list(map(lambda slot: "v{0}".format(slot), sorted(variables)))
+    guard = ["    if not ({0}):".format(" and ".join(map(lambda name: "type({0}) in NUMBERS".format(name), names))),
+             "        return"] if len(names) > 0 else []
+    source = "\n".join(
+        ["def trace(state):", "    slots = state.slots", "    write = state.output.write"] +
+        list(map(lambda slot: "    v{0} = slots[{0}]".format(slot), sorted(variables))) + guard +
+        ["    while True:"] + list(map(lambda line: "        " + line, body)) + ["        pass"] +
+        list(map(lambda slot: "    slots[{0}] = v{0}".format(slot), sorted(variables))) +
+        ["    state.current_pos = exit_position"]
+    )
+    namespace = {"NUMBERS": (int, float)}
+    exec(compile(source, "<trace of line {0}>".format(program.lines[head] if head >= 0 else head), "exec"), namespace)
+    return namespace["trace"]
+
+
+# recordTrace :: CompiledProgram -> MachineState -> int -> Either [TraceStep] None
+def recordTrace(program: Compiler.CompiledProgram, state: Compiler.MachineState,
+                head: int) -> Union[List[TraceStep], None]:
+    """
+    Runs the loop starting at the program counter once with the handlers of the compiled program, recording the way
+    it takes. The program simply continues where the recording stopped.
+    :param program: the compiled program
+    :param state: machine state of the program, with the program counter at head
+    :param head: the program counter at the start of the loop
+    :return: the way the loop took, None when it did not get back to head without reporting an error, jumping back
+    to another loop or taking more than MAX_TRACE_LENGTH instructions
+    """
+    code = program.code
+    last = len(code) - 1
+    steps = []
+    while len(steps) < MAX_TRACE_LENGTH and state.current_pos != last:
+        position = state.current_pos + 1
+        errors = len(state.errors)
+        state.current_pos = position
+        code[position](state)
+        steps.append((position, state.current_pos))
+        if len(state.errors) != errors or (state.current_pos < position and state.current_pos != head):
+            return None
+        if state.current_pos == head:
+            return steps
+    return None
+
+
+# executeTraced :: CompiledProgram -> MachineState -> MachineState
+def executeTraced(program: Compiler.CompiledProgram, state: Compiler.MachineState) -> Compiler.MachineState:
+    """
+    Runs a compiled program like Compiler.executeCompiled does, but turns its hot loops into Python functions. Every
+    jump back to an earlier position is counted, and once HOT_LOOP jumps led back to the same position the loop
+    starting there is recorded (see recordTrace) and compiled (see compileTrace). From then on the loop runs in its
+    trace whenever a jump leads back to it, until a guard of the trace fails and the handlers take over again.
+    A loop that could not be recorded is tried again after another HOT_LOOP jumps, a loop with an instruction that can
+    not be traced is left to the handlers.
+    The results are the same as those of Compiler.executeCompiled.
+    :param program: the compiled program
+    :param state: machine state to start from
+    :return: the machine state after executing the program to completion, or up to its first error in a strict run
+    """
+    code = program.code
+    last = len(code) - 1
+    jumps = {}
+    traces = {}
+    try:
+        while state.current_pos != last:
+            position = state.current_pos + 1
+            state.current_pos = position
+            code[position](state)
+            if state.current_pos >= position:
+                continue
+            head = state.current_pos
+            trace = traces.get(head)
+            if trace is not None:
+                trace(state)
+                continue
+            jumps[head] = jumps.get(head, 0) + 1
+            if jumps[head] < HOT_LOOP:
+                continue
+            jumps[head] = 0
+            steps = recordTrace(program, state, head)
+            if steps is not None:
+                traces[head] = compileTrace(program, head, steps) or (lambda state: None)
+    except Errors.ProgramHalted:
+        pass
+    return state
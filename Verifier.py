@@ -0,0 +1,141 @@
+from itertools import chain
+from typing import FrozenSet, List, Tuple, Union
+
+import Compiler
+import Lexer
+
+# The instructions that read their target as well as writing it.
+READS_TARGET = (
+    Lexer.Increment, Lexer.Decrement,
+    Lexer.AddSimple, Lexer.Add,
+    Lexer.SubtractSimple, Lexer.Subtract,
+    Lexer.MultiplySimple, Lexer.Multiply,
+    Lexer.DivideSimple, Lexer.Divide,
+    Lexer.ModuloSimple, Lexer.Modulo,
+)
+
+
+class Verification:
+    """
+    Result of verifying a program, see verifyProgram. safe holds for every instruction whether it is proven to run
+    without any of the checks of the interpreter: every variable it reads holds a number on every path to it, the
+    label it jumps to exists and it has the parameters of its instruction. problems describes every instruction that
+    can be executed but could not be proven safe.
+    """
+
+    def __init__(self, safe: List[bool], problems: List[str]):
+        self.safe = safe
+        self.problems = problems
+
+
+# readVariables :: Tuple[Instruction, dict] -> [str]
+def readVariables(token: Tuple[Lexer.Instruction, dict]) -> List[str]:
+    """
+    Finds the variables an instruction reads when it is executed.
+    :param token: the instruction with its parameters
+    :return: the names of the variables
+    """
+    instruction, parameters = token
+    keys = ["left", "right"] + (["target"] if instruction in READS_TARGET else [])
+    return list(filter(Compiler.isVariable, map(lambda key: parameters[key], filter(
+        lambda key: key in parameters.keys(), keys))))
+
+
+# assignedAfter :: Tuple[Instruction, dict] -> FrozenSet[str] -> FrozenSet[str]
+def assignedAfter(token: Tuple[Lexer.Instruction, dict], assigned: FrozenSet[str]) -> FrozenSet[str]:
+    """
+    Works out which variables certainly hold a number after an instruction. Only a SET changes this, every other
+    instruction either changes a number into a number or leaves its target as it is.
+    :param token: the instruction with its parameters
+    :param assigned: the variables that certainly hold a number before the instruction
+    :return: the variables that certainly hold a number after the instruction
+    """
+    instruction, parameters = token
+    if instruction not in (Lexer.Set, Lexer.SetSimple):
+        return assigned
+    right = parameters.get("right", 0)
+    if not Compiler.isVariable(right) or right in assigned:
+        return assigned | {parameters["target"]}
+    # A SET of a variable without a value leaves the target without a value as well.
+    return assigned - {parameters["target"]}
+
+
+# followers :: Tuple[Instruction, dict] -> int -> int -> [int]
+def followers(token: Tuple[Lexer.Instruction, dict], position: int, last: int) -> List[int]:
+    """
+    Finds every instruction that can be executed after an instruction, whatever the values of the variables are.
+    :param token: the instruction with its parameters
+    :param position: position of the instruction
+    :param last: position of the last instruction of the program
+    :return: positions of the instructions that can follow
+    """
+    counters = [position]
+    if issubclass(token[0], Lexer.Jump) and type(token[1]["target"]) == int:
+        counters.append(token[1]["target"])
+    # The program stops when the program counter is on the last instruction after executing an instruction.
+    return list(map(lambda counter: counter + 1, filter(lambda counter: counter != last, counters)))
+
+
+# definiteAssignments :: [Tuple[Instruction, dict]] -> [Either FrozenSet[str] None]
+def definiteAssignments(tokens: List[Tuple[Lexer.Instruction, dict]]) -> List[Union[FrozenSet[str], None]]:
+    """
+    Works out which variables certainly hold a number before every instruction, on every path through the program.
+    :param tokens: the instructions of the program, with the jumps resolved to positions
+    :return: the variables for every instruction, None for an instruction that can not be reached
+    """
+    assignments = [None] * len(tokens)
+    pending = [0] if len(tokens) > 0 else []
+    if len(tokens) > 0:
+        assignments[0] = frozenset()
+    while len(pending) > 0:
+        position = pending.pop()
+        after = assignedAfter(tokens[position], assignments[position])
+        for following in followers(tokens[position], position, len(tokens) - 1):
+            joined = after if assignments[following] is None else assignments[following] & after
+            if joined != assignments[following]:
+                assignments[following] = joined
+                pending.append(following)
+    return assignments
+
+
+# instructionProblems :: Tuple[Instruction, dict] -> int -> FrozenSet[str] -> [str]
+def instructionProblems(token: Tuple[Lexer.Instruction, dict], position: int, assigned: FrozenSet[str]) -> List[str]:
+    """
+    Finds everything that keeps an instruction from being proven safe.
+    :param token: the instruction with its parameters
+    :param position: position of the instruction
+    :param assigned: the variables that certainly hold a number before the instruction
+    :return: a description of every problem, empty when the instruction is safe
+    """
+    instruction, parameters = token
+    keyword = Lexer.instructionKeywords(instruction)[0]
+    if sorted(parameters.keys()) != sorted(instruction().parameters):
+        return ["Invalid parameter count for {0} on line {1}".format(keyword, position)]
+    problems = list(map(
+        lambda name: "Variable {0} may have no value on line {1} for instruction {2}".format(name, position, keyword),
+        filter(lambda name: name not in assigned, dict.fromkeys(readVariables(token)))
+    ))
+    if issubclass(instruction, Lexer.Jump) and type(parameters["target"]) != int:
+        problems.append("Unknown label {0} on line {1}".format(parameters["target"], position))
+    return problems
+
+
+# verifyProgram :: [Tuple[Instruction, dict]] -> Verification
+def verifyProgram(tokens: List[Tuple[Lexer.Instruction, dict]]) -> Verification:
+    """
+    Verifies a loaded program before it runs, so the compiled engine can run the safe instructions without checking
+    their variables, labels and parameters (see Compiler.compileProgram). Instructions that can not be reached are
+    not safe, but are no problem either. Only programs made of the instructions of the lexer are verified, a program
+    with superinstructions has no safe instructions.
+    :param tokens: the instructions of the program, with the jumps resolved to positions
+    :return: the verification of the program
+    """
+    if not all(map(lambda token: token[0] in Lexer.INSTRUCTION_MAP, tokens)):
+        return Verification([False] * len(tokens), ["Only programs without superinstructions can be verified"])
+    assignments = definiteAssignments(tokens)
+    problems = list(map(
+        lambda pair: [] if pair[1] is None else instructionProblems(pair[0][1], pair[0][0], pair[1]),
+        zip(enumerate(tokens), assignments)
+    ))
+    safe = list(map(lambda pair: pair[0] is not None and len(pair[1]) == 0, zip(assignments, problems)))
+    return Verification(safe, list(chain.from_iterable(problems)))
@@ -0,0 +1,111 @@
+import os
+from time import sleep
+from typing import Callable, List, Tuple
+
+import Lexer
+import Parser
+
+
+class IncrementalLexer:
+    """
+    Keeps the lines and tokens of the last version of a program, so a new version only has to lex the lines that
+    changed. Editing a program changes one stretch of lines, the lines before and after it are the same as before and
+    keep their tokens.
+    declarations holds the position and name of every DECL, in order, so the labels can be patched rather than
+    found again by going over every token.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.tokens = []
+        self.declarations = []
+
+    def update(self, lines: List[str]) -> int:
+        """
+        Lexes a new version of the program.
+        :param lines: the lines of the new version, see Lexer.streamLines
+        :return: the number of lines that were lexed
+        """
+        size = min(len(self.lines), len(lines))
+        prefix = next(filter(lambda position: self.lines[position] != lines[position], range(size)), size)
+        suffix = next(filter(lambda offset: self.lines[-offset] != lines[-offset], range(1, size - prefix + 1)),
+                      size - prefix + 1) - 1
+        old_end = len(self.lines) - suffix
+        new_end = len(lines) - suffix
+        tokens = list(Lexer.lexStream(lines[prefix:new_end]))
+        shift = new_end - old_end
+        self.declarations = list(filter(lambda declaration: declaration[0] < prefix, self.declarations)) + \
+            list(map(lambda token: (token[0], token[1][1]["label"]),
+                     filter(lambda token: token[1][0] == Lexer.Declare, enumerate(tokens, prefix)))) + \
+            list(map(lambda declaration: (declaration[0] + shift, declaration[1]),
+                     filter(lambda declaration: declaration[0] >= old_end, self.declarations)))
+        self.tokens[prefix:old_end] = tokens
+        self.lines = lines
+        return len(tokens)
+
+    def programState(self) -> Tuple[Parser.ProgramState, List[str]]:
+        """
+        Makes a program state of the last version of the program, like Loader.readLines does.
+        :return: ProgramState and the list of errors, the program can only be run when there are no errors
+        """
+        unknown_tokens = list(filter(lambda position: self.tokens[position][1] is None, range(len(self.tokens))))
+        if len(unknown_tokens) > 0:
+            return Parser.ProgramState(), list(map(
+                lambda position: "Unknown token `{0}` on line {1}".format(self.lines[position], position),
+                unknown_tokens))
+        ps = Parser.ProgramState()
+        # A label that is declared twice leads to its last DECL, like Parser.parseLabels.
+        ps.labels = dict(map(lambda declaration: (declaration[1], declaration[0]), self.declarations))
+        ps.instructions, label_errors = Parser.resolveJumps(self.tokens, ps.labels)
+        return ps, label_errors
+
+
+# fileVersion :: str -> Tuple[int, int]
+def fileVersion(path: str) -> Tuple[int, int]:
+    """
+    :param path: path to a file
+    :return: the time the file was last changed and its size, which change whenever the file is saved
+    """
+    status = os.stat(path)
+    return status.st_mtime_ns, status.st_size
+
+
+# watchFile :: str -> (ProgramState -> Any) -> float -> None
+def watchFile(path: str, run: Callable[[Parser.ProgramState], object], interval: float = 0.5) -> None:
+    """
+    Runs a program and runs it again every time its file changes, until the process is interrupted. The file is
+    checked every interval seconds, only the lines that changed are lexed again (see IncrementalLexer). A version of
+    the program that can not be parsed is reported instead of run.
+    :param path: path to the ATP++ file
+    :param run: runs a version of the program
+    :param interval: the number of seconds between two checks of the file
+    :return: None
+    """
+    lexer = IncrementalLexer()
+    version = None
+    while True:
+        try:
+            current_version = fileVersion(path)
+        except OSError:
+            # Editors that save to a new file and rename it leave the file missing for a moment.
+            current_version = version
+        lines = None
+        if current_version != version:
+            try:
+                with open(path, "r") as file:
+                    lines = list(Lexer.streamLines(file))
+            except OSError:
+                # The file can also go missing between checking its version and opening it, it is read on the next
+                # check instead.
+                pass
+        if lines is not None:
+            version = current_version
+            lexed = lexer.update(lines)
+            print("Running {0}, lexed {1} of {2} lines".format(path, lexed, len(lexer.lines)))
+            ps, errors = lexer.programState()
+            if len(errors) > 0:
+                list(map(print, errors))
+            else:
+                run(ps)
+            print("Watching {0} for changes".format(path))
+        sleep(interval)
@@ -0,0 +1,328 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tracemalloc
+from statistics import median
+from time import perf_counter, strftime
+from typing import Callable, Dict, List, Tuple
+
+import ATPTools
+import Compiler
+import Lexer
+import Optimizer
+import Output
+import Parser
+import Tracer
+
+# The example programs that are part of every benchmark run.
+EXAMPLE_PROGRAMS = ["loop", "fizzbuzz", "addition", "counter_machine"]
+
+
+# straightLine :: int -> [str]
+def straightLine(size: int) -> List[str]:
+    """
+    Generates a program of size additions without any jumps.
+    :param size: number of additions
+    :return: the program as a list of lines
+    """
+    return ["SET x 0"] + ["ADD x 1"] * size + ["PRINT x"]
+
+
+# nestedLoops :: int -> [str]
+def nestedLoops(size: int) -> List[str]:
+    """
+    Generates a program with two nested counted loops of size iterations each.
+    :param size: number of iterations of each loop
+    :return: the program as a list of lines
+    """
+    return [
+        "SET i 0",
+        "SET total 0",
+        "DECL .outer",
+        "SET j 0",
+        "DECL .inner",
+        "INC total",
+        "INC j",
+        "JL .inner j {0}".format(size),
+        "INC i",
+        "JL .outer i {0}".format(size),
+        "PRINT total",
+    ]
+
+
+# registerTransfer :: int -> [str]
+def registerTransfer(size: int) -> List[str]:
+    """
+    Generates a counter machine program that moves a register holding size to two other registers and back again.
+    :param size: the value of the register that is moved
+    :return: the program as a list of lines
+    """
+    return [
+        "SET reg0 0",
+        "SET reg1 0",
+        "SET reg2 0",
+        "SET reg3 0",
+        "ADD reg2 {0}".format(size),
+        "DECL .l1",
+        "JE .l6 reg2 0",
+        "DEC reg2",
+        "INC reg3",
+        "INC reg1",
+        "JE .l1 reg0 0",
+        "DECL .l6",
+        "JE .halt reg1 0",
+        "DEC reg1",
+        "INC reg2",
+        "JE .l6 reg0 0",
+        "DECL .halt",
+        "PRINT reg2",
+        "PRINT reg3",
+    ]
+
+
+# The generated workloads with the default size of each of them.
+GENERATED_PROGRAMS = {
+    "straight_line": (straightLine, 20000),
+    "nested_loops": (nestedLoops, 150),
+    "register_transfer": (registerTransfer, 20000),
+}
+
+
+# exampleProgram :: str -> [str]
+def exampleProgram(name: str) -> List[str]:
+    """
+    Reads one of the example programs.
+    :param name: name of the example program without extension
+    :return: the program as a list of lines
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "example_programs", name + ".atp++")
+    with open(path, "r") as file:
+        return list(Lexer.streamLines(file))
+
+
+# timed :: Callable -> Tuple[Any, float]
+def timed(function: Callable, *args) -> Tuple[object, float]:
+    """
+    Calls a function and measures how long it took.
+    :param function: the function to call
+    :param args: the arguments of the function
+    :return: the result of the function and the time it took in seconds
+    """
+    start = perf_counter()
+    result = function(*args)
+    return result, perf_counter() - start
+
+
+# countInstructions :: CompiledProgram -> int
+def countInstructions(program: Compiler.CompiledProgram) -> int:
+    """
+    Runs a compiled program and counts the executed instructions. This is a separate run so that counting does not
+    influence the timed runs.
+    :param program: the compiled program
+    :return: the number of executed instructions
+    """
+    with open(os.devnull, "w") as devnull:
+        state = Compiler.MachineState(program, Output.StreamSink(devnull, 4096))
+        code = program.code
+        last = len(code) - 1
+        count = 0
+        while state.current_pos != last:
+            state.current_pos += 1
+            code[state.current_pos](state)
+            count += 1
+        state.output.flush()
+    return count
+
+
+# prepareProgram :: Parser.ProgramState -> bool -> Compiler.CompiledProgram
+def prepareProgram(ps: Parser.ProgramState, optimize: bool) -> Compiler.CompiledProgram:
+    """
+    Compiles a program for the compiled engine, optimizing it first if asked to.
+    :param ps: program state with the instructions and labels of the program
+    :param optimize: whether to optimize the program, see Optimizer.optimize
+    :return: the compiled program
+    """
+    return Compiler.compileProgram(Optimizer.optimize(ps) if optimize else ps)
+
+
+# executeOnce :: [Tuple[Instruction, dict]] -> dict -> str -> bool -> float
+def executeOnce(tokens: List[Tuple[Lexer.Instruction, dict]], labels: dict, engine: str,
+                optimize: bool = False) -> float:
+    """
+    Compiles (for the compiled engine) and executes a program once, the output is written to the null device with a
+    buffered output sink.
+    :param tokens: the resolved instructions of the program
+    :param labels: the labels of the program
+    :param engine: either "compiled", "jit" (the compiled engine with Tracer.executeTraced) or "reference"
+    :param optimize: whether to optimize the program for the compiled engine
+    :return: the time it took to execute the program, without compiling it
+    """
+    with open(os.devnull, "w") as devnull:
+        output = Output.StreamSink(devnull, 4096)
+        ps = Parser.ProgramState()
+        ps.instructions = tokens
+        ps.labels = labels
+        ps.output = output
+        if engine == "reference":
+            return timed(lambda: (Parser.executeProgram(ps), output.flush()))[1]
+        program = prepareProgram(ps, optimize)
+        execute = Tracer.executeTraced if engine == "jit" else Compiler.executeCompiled
+        return timed(lambda: (execute(program, Compiler.MachineState(program, output)), output.flush()))[1]
+
+
+# benchmarkProgram :: [str] -> str -> int -> bool -> dict
+def benchmarkProgram(lines: List[str], engine: str, repeat: int, optimize: bool = False) -> dict:
+    """
+    Benchmarks the stages of running a program separately: lexing, parsing the labels, compiling and executing.
+    Every stage is timed repeat times and the median is reported, the peak memory of a complete run is measured in a
+    separate run as tracing the memory slows the program down.
+    :param lines: the program as a list of lines
+    :param engine: either "compiled", "jit" or "reference"
+    :param repeat: how often every stage is timed
+    :param optimize: whether to optimize the programs for the compiled engine, the optimizing is part of the compile
+    stage. The executed instructions are those of the program before it was optimized.
+    :return: dict with the results
+    """
+    tokens = Lexer.lexInput(lines)
+    labels = Parser.parseLabels(tokens)
+    resolved, errors = Parser.resolveJumps(tokens, labels)
+    if len(errors) > 0 or any(map(lambda token: token[1] is None, tokens)):
+        raise ValueError("The benchmarked program does not parse: {0}".format(errors))
+    ps = Parser.ProgramState()
+    ps.instructions = resolved
+    ps.labels = labels
+    program = Compiler.compileProgram(ps)
+    instructions = countInstructions(program)
+
+    lex_time = median(map(lambda _: timed(Lexer.lexInput, lines)[1], range(repeat)))
+    label_time = median(map(lambda _: timed(lambda: Parser.resolveJumps(tokens, Parser.parseLabels(tokens)))[1],
+                            range(repeat)))
+    compile_time = median(map(lambda _: timed(prepareProgram, ps, optimize)[1], range(repeat)))
+    execute_time = median(map(lambda _: executeOnce(resolved, labels, engine, optimize), range(repeat)))
+
+    tracemalloc.start()
+    executeOnce(Parser.resolveJumps(Lexer.lexInput(lines), labels)[0], labels, engine, optimize)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "lines": len(lines),
+        "instructions": instructions,
+        "lex_s": lex_time,
+        "labels_s": label_time,
+        "compile_s": compile_time if engine != "reference" else 0.0,
+        "execute_s": execute_time,
+        "instructions_per_s": instructions / execute_time if execute_time > 0 else 0.0,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+# runBenchmarks :: str -> int -> float -> bool -> Dict[str, dict]
+def runBenchmarks(engine: str, repeat: int, scale: float, optimize: bool = False) -> Dict[str, dict]:
+    """
+    Benchmarks the example programs and the generated programs.
+    :param engine: either "compiled", "jit" or "reference"
+    :param repeat: how often every stage is timed
+    :param scale: factor for the default size of the generated programs
+    :param optimize: whether to optimize the programs for the compiled engine
+    :return: dict with the name of every program as key and its results as value
+    """
+    programs = list(map(lambda name: (name, exampleProgram(name)), EXAMPLE_PROGRAMS)) + list(map(
+        lambda item: ("{0}[{1}]".format(item[0], max(1, int(item[1][1] * scale))),
+                      item[1][0](max(1, int(item[1][1] * scale)))),
+        GENERATED_PROGRAMS.items()))
+    results = {}
+    for name, lines in programs:
+        results[name] = benchmarkProgram(lines, engine, repeat, optimize)
+        sys.stderr.write(".")
+        sys.stderr.flush()
+    sys.stderr.write("\n")
+    return results
+
+
+# printResults :: Dict[str, dict] -> None
+def printResults(results: Dict[str, dict]) -> None:
+    """
+    Prints a table of benchmark results.
+    :param results: the results of runBenchmarks
+    :return: None
+    """
+    print("{0:<28} {1:>10} {2:>10} {3:>10} {4:>10} {5:>11} {6:>13} {7:>12}".format(
+        "program", "lex ms", "labels ms", "compile ms", "exec ms", "executed", "instr/s", "peak KiB"))
+    for name, result in results.items():
+        print("{0:<28} {1:>10.3f} {2:>10.3f} {3:>10.3f} {4:>10.3f} {5:>11} {6:>13.0f} {7:>12.1f}".format(
+            name, result["lex_s"] * 1e3, result["labels_s"] * 1e3, result["compile_s"] * 1e3,
+            result["execute_s"] * 1e3, result["instructions"], result["instructions_per_s"],
+            result["peak_memory_bytes"] / 1024))
+
+
+# compareResults :: Dict[str, dict] -> Dict[str, dict] -> float -> [str]
+def compareResults(baseline: Dict[str, dict], results: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Compares benchmark results to a baseline and prints the relative change of every timing. A timing that is 0 in
+    either run, like the compile time of the reference engine, can not be compared and is shown as n/a.
+    :param baseline: the results of an earlier run
+    :param results: the results of this run
+    :param tolerance: relative slowdown that is still accepted, 0.1 accepts anything up to 10% slower
+    :return: a description of every regression
+    """
+    regressions = []
+    keys = ["lex_s", "labels_s", "compile_s", "execute_s", "peak_memory_bytes"]
+    print("\n{0:<28} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}".format(
+        "change vs baseline", "lex", "labels", "compile", "exec", "memory"))
+    for name in filter(lambda name: name in baseline.keys(), results.keys()):
+        changes = list(map(lambda key: results[name][key] / baseline[name][key] - 1
+                           if baseline[name][key] > 0 and results[name][key] > 0 else None, keys))
+        print("{0:<28} ".format(name) + " ".join(map(
+            lambda change: "{0:>+9.1f}%".format(change * 100) if change is not None else "{0:>10}".format("n/a"),
+            changes)))
+        regressions += list(map(lambda pair: "{0} {1} {2:+.1f}%".format(name, pair[0], pair[1] * 100),
+                                filter(lambda pair: pair[1] is not None and pair[1] > tolerance, zip(keys, changes))))
+    return regressions
+
+
+if __name__ == '__main__':
+    argParser = argparse.ArgumentParser(description="Benchmarks the ATP++ interpreter")
+    argParser.add_argument('--engine', choices=["compiled", "jit", "reference"], default="compiled",
+                           help="Engine to benchmark, jit is the compiled engine with its hot loops compiled to "
+                                "Python functions, the reference interpreter runs in place")
+    argParser.add_argument('-O', '--optimize', action='store_true',
+                           help="Optimize the programs before running them (compiled and jit engines only)")
+    argParser.add_argument('--repeat', type=int, default=5, help="How often every stage is timed (default: 5)")
+    argParser.add_argument('--scale', type=float, default=1.0,
+                           help="Factor for the size of the generated programs (default: 1.0)")
+    argParser.add_argument('--save', type=str, help="Store the results as a JSON baseline in this file")
+    argParser.add_argument('--compare', type=str, help="Compare the results with the JSON baseline in this file")
+    argParser.add_argument('--tolerance', type=float, default=0.1,
+                           help="Relative slowdown that does not count as a regression (default: 0.1)")
+    arguments = argParser.parse_args()
+    if arguments.optimize and arguments.engine == "reference":
+        argParser.error("--optimize can not be used with the reference engine")
+    baseline_run = None
+    if arguments.compare is not None:
+        with open(arguments.compare, "r") as baseline_file:
+            baseline_run = json.load(baseline_file)
+        # Timings of another engine or of (un)optimized programs differ by design, they are not regressions.
+        if (baseline_run.get("engine"), baseline_run.get("optimize")) != (arguments.engine, arguments.optimize):
+            argParser.error("the baseline in {0} was run with --engine {1}{2}, run this comparison the same way".format(
+                arguments.compare, baseline_run.get("engine"), " -O" if baseline_run.get("optimize") else ""))
+    ATPTools.setPassByValue(False)
+    benchmark_results = runBenchmarks(arguments.engine, arguments.repeat, arguments.scale, arguments.optimize)
+    printResults(benchmark_results)
+    if arguments.save is not None:
+        with open(arguments.save, "w") as baseline_file:
+            json.dump({
+                "created": strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "engine": arguments.engine,
+                "optimize": arguments.optimize,
+                "results": benchmark_results
+            }, baseline_file, indent=2)
+    if baseline_run is not None:
+        found_regressions = compareResults(baseline_run["results"], benchmark_results, arguments.tolerance)
+        if len(found_regressions) > 0:
+            print("\nRegressions:")
+            list(map(print, found_regressions))
+            exit(1)
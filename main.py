@@ -1,69 +1,348 @@
 import argparse
 import os
 import sys
-import threading
-from functools import reduce
 from time import time
+from typing import List
 
 import ATPTools
-import Lexer
+import Checkpoint
+import Compiler
+import Errors
+import Lanes
+import Limits
+import Loader
+import Optimizer
+import Output
 import Parser
+import Profiler
+import Table
+import Tracer
+import Verifier
+import Watch
 
 
-# parseProgram :: str -> Parser.ProgramState
-@ATPTools.copyParameters
-def parseProgram(infile: str = "example_programs/loop.atp++") -> Parser.ProgramState:
+# reportVerification :: Parser.ProgramState -> int
+def reportVerification(ps: Parser.ProgramState) -> int:
     """
-    Parses a program from a given input file.
-    :param infile: str the path to a ATP++ file
-    :return: ProgramState
+    Verifies a program without running it and prints every instruction that could not be proven safe, see
+    Verifier.verifyProgram.
+    :param ps: ProgramState of the loaded program
+    :return: the exit code, 0 when every instruction that can be executed was proven safe
     """
-    with open(infile, "r") as file:
-        program_text = list(Lexer.strToLines(file.read()))
-        tokens = Lexer.lexInput(program_text)
-        unknown_tokens = list(zip(map(lambda x: x[1] is None, tokens), program_text))
-        unknown_count = reduce(lambda x, y: x + y, map(lambda x: int(x[0]), unknown_tokens))
-        if unknown_count > 0:
-            list(map(lambda x: print("Unknown token `{0}` on line {1}".format(x[1][1], x[0])) if x[1][0] else None,
-                     enumerate(unknown_tokens)))
-            exit(-1)
-        ps = Parser.ProgramState()
-        ps.instructions = tokens
-        ps.labels = Parser.parseLabels(ps.instructions)
-        return ps
+    verification = Verifier.verifyProgram(ps.instructions)
+    list(map(print, verification.problems))
+    print("{0} of {1} instructions proven safe".format(sum(verification.safe), len(verification.safe)))
+    return 1 if len(verification.problems) > 0 else 0
 
 
 class run:
     """
-    Class for running our parser in a different thread to circumvent the stack limit on the python interpreter.
+    Class for running our parser on a program file.
     """
 
+    def __init__(self, engine: str = "compiled", use_cache: bool = True, cache_directory: str = None,
+                 profile: bool = False, profile_output: str = None, profile_format: str = "pstats",
+                 output: Output.OutputSink = None, optimize: bool = False, limits: Limits.Limits = None,
+                 checkpoint: str = None, checkpoint_every: int = None, checkpoint_seconds: float = None,
+                 resume: bool = False, strict: bool = False, max_errors: int = None, lanes: List[dict] = None,
+                 jit: bool = False):
+        """
+        :param engine: str either "compiled" to run the program as a compiled program or "reference" to step through it
+        with Parser.runProgram
+        :param use_cache: bool whether to cache the parsed program, see Loader.loadProgram
+        :param cache_directory: str directory to store the cache in, next to the program if None
+        :param profile: bool whether to profile the run and report the hottest lines, blocks, jumps and loops to stderr
+        :param profile_output: str file to write the profile to
+        :param profile_format: str format of the profile file, either "pstats" or "collapsed"
+        :param output: OutputSink where the output of PRINT and DUMP goes, the console if None
+        :param optimize: bool whether to optimize the program before compiling it, see Optimizer.optimize
+        :param limits: Limits on the run of the program, the run is not limited if None (not used when profiling)
+        :param checkpoint: str file to write checkpoints of the run to (compiled engine only), see Checkpoint.py
+        :param checkpoint_every: int number of instructions between two checkpoints
+        :param checkpoint_seconds: float number of seconds between two checkpoints
+        :param resume: bool whether to continue from the checkpoint file when it exists
+        :param strict: bool whether to halt the program on its first error, see Errors.ErrorLog (not used when
+        profiling)
+        :param max_errors: int number of errors to keep, every error is kept if None
+        :param lanes: the initial state of every lane to run the program in at once (compiled engine only), see
+        Lanes.runLanes, the program runs once if None
+        :param jit: bool whether to compile the hot loops of the program to Python functions, see Tracer.executeTraced
+        (compiled engine only, not used with limits or checkpoints)
+        """
+        self.engine = engine
+        self.use_cache = use_cache
+        self.cache_directory = cache_directory
+        self.profile = profile
+        self.profile_output = profile_output
+        self.profile_format = profile_format
+        self.output = output if output is not None else Output.ConsoleSink()
+        self.optimize = optimize
+        self.limits = limits
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+        self.resume = resume
+        self.strict = strict
+        self.max_errors = max_errors
+        self.lanes = lanes
+        self.jit = jit
+        self.infile = None
+
     def __call__(self, infile: str = "example_programs/counter_machine.atp++"):
         """
         Runs the parser
         :param infile: str the path to a ATP++ file
         :return: None
         """
-        self.run_program(parseProgram(infile))
+        self.infile = infile
+        self.run_loaded(Loader.loadProgram(infile, self.use_cache, self.cache_directory))
+
+    def run_loaded(self, program_state: Parser.ProgramState) -> None:
+        """
+        Runs a loaded program, in every lane when there are lanes.
+        :param program_state: The program state of the loaded program
+        :return: None
+        """
+        if self.lanes is not None:
+            self.run_lanes(program_state)
+        else:
+            self.run_program(program_state)
+
+    def watch(self, infile: str, interval: float = 0.5) -> None:
+        """
+        Runs the program every time its file changes, see Watch.watchFile. The parsed program is not cached, and an
+        output file only holds the output of the last run.
+        :param infile: str the path to a ATP++ file
+        :param interval: float the number of seconds between two checks of the file
+        :return: None
+        """
+        self.infile = infile
+
+        # rerun :: Parser.ProgramState -> None
+        def rerun(program_state: Parser.ProgramState) -> None:
+            if isinstance(self.output, Output.FileSink):
+                self.output.truncate(0)
+            self.run_loaded(program_state)
+
+        Watch.watchFile(infile, rerun, interval)
 
-    @ATPTools.copyParameters
     def run_program(self, program_state: Parser.ProgramState) -> Parser.ProgramState:
         """
         Runs the program based on the current program state that is provided.
         :param program_state: The current program state
-        :return: the program state after executing the current line
+        :return: the program state after executing the last line
+        """
+        source = program_state
+        if self.engine == "compiled" and self.optimize:
+            program_state = Optimizer.optimize(program_state)
+        try:
+            if self.engine == "compiled" and self.profile:
+                program = Compiler.compileProgram(program_state)
+                state, profile = Profiler.executeProfiled(program, self.machine_state(program))
+                program_state = state.toProgramState()
+                self.report_profile(profile)
+            elif self.engine == "compiled" and (self.limits is not None or self.checkpoint is not None):
+                program_state = self.run_limited(Compiler.compileProgram(program_state)).toProgramState()
+            elif self.engine == "compiled":
+                program = Compiler.compileProgram(program_state)
+                execute = Tracer.executeTraced if self.jit else Compiler.executeCompiled
+                program_state = execute(program, self.machine_state(program)).toProgramState()
+            else:
+                if ATPTools.pass_by_value:
+                    # Every step deep copies the program state, a table of instructions is shared by the copies.
+                    program_state.instructions = Table.InstructionTable(program_state.instructions)
+                program_state.output = self.output
+                program_state.errors = self.error_log(program_state.errors)
+                if self.limits is not None:
+                    program_state = Limits.executeProgramLimited(program_state, self.limits)
+                else:
+                    program_state = Parser.executeProgram(program_state)
+        finally:
+            # Buffered output is written even when the interpreter fails halfway through the program
+            self.output.flush()
+        print(Loader.haltReport(program_state, source) if Errors.isHalted(program_state.errors) else "finished")
+        print(program_state)
+        return program_state
+
+    def run_lanes(self, program_state: Parser.ProgramState) -> List[Parser.ProgramState]:
         """
-        if program_state.current_pos == len(program_state.instructions) - 1:
-            print("finished")
-            print(program_state)
-            return program_state
-        return self.run_program(Parser.runProgram(program_state))
+        Runs the program once for every initial state in lanes, all at once, and reports every lane like run_program.
+        Only the instruction limit of the limits is used.
+        :param program_state: The program state of the loaded program
+        :return: the program state of every lane after executing the last line
+        """
+        max_instructions = self.limits.max_instructions if self.limits is not None else None
+        lane_states = Lanes.runLanes(program_state, self.lanes, max_instructions, self.strict, self.max_errors)
+        for lane, lane_state in enumerate(lane_states):
+            print("lane {0}".format(lane))
+            self.output.write(lane_state.output.getvalue())
+            self.output.flush()
+            print(Loader.haltReport(lane_state, program_state) if Errors.isHalted(lane_state.errors) else "finished")
+            print(lane_state)
+        return lane_states
+
+    def error_log(self, errors: List[str]) -> List[str]:
+        """
+        :param errors: the errors the program has so far
+        :return: the errors as an Errors.ErrorLog when the run is strict or keeps a limited number of errors
+        """
+        if not self.strict and self.max_errors is None:
+            return errors
+        return Errors.ErrorLog(self.strict, self.max_errors, errors)
+
+    def machine_state(self, program: Compiler.CompiledProgram) -> Compiler.MachineState:
+        """
+        :param program: the compiled program
+        :return: the machine state to start the program from
+        """
+        state = Compiler.MachineState(program, self.output)
+        state.errors = self.error_log(state.errors)
+        return state
+
+    def run_limited(self, program: Compiler.CompiledProgram) -> Compiler.MachineState:
+        """
+        Runs a compiled program with limits, taking checkpoints of it when there is a checkpoint file. The run
+        continues from the checkpoint when it is resumed, the output file is then cut back to where the checkpoint was
+        taken so no output is written twice.
+        :param program: the compiled program
+        :return: the machine state after the run
+        """
+        state = self.machine_state(program)
+        checkpointer = None
+        if self.checkpoint is not None:
+            checkpoint = None
+            if self.resume and os.path.exists(self.checkpoint):
+                checkpoint = Checkpoint.readCheckpoint(self.checkpoint, program)
+                state = Checkpoint.restoreState(program, checkpoint, self.output)
+                state.errors = self.error_log(state.errors)
+            if self.resume and isinstance(self.output, Output.FileSink):
+                self.output.truncate((checkpoint or {}).get("output_position") or 0)
+            checkpointer = Checkpoint.Checkpointer(self.checkpoint, program, self.checkpoint_every,
+                                                   self.checkpoint_seconds,
+                                                   checkpoint["executed"] if checkpoint is not None else 0)
+        limits = self.limits if self.limits is not None else Limits.Limits()
+        if checkpointer is not None and self.checkpoint_every is not None:
+            # The checkpointer is only asked for a checkpoint between two checks of the limits.
+            limits = Limits.Limits(limits.max_instructions, limits.timeout, limits.max_variables,
+                                   limits.max_state_bytes, min(limits.check_interval, self.checkpoint_every))
+        finished = False
+        try:
+            state = Limits.executeCompiledLimited(program, state, limits, checkpointer)
+            finished = state.current_pos == len(program.code) - 1
+        finally:
+            if checkpointer is not None:
+                checkpointer.close(finished)
+        return state
+
+    def report_profile(self, profile: Profiler.Profile) -> None:
+        """
+        Reports the profile of a run to stderr and writes it to the profile output file if there is one.
+        :param profile: the profile of the run
+        :return: None
+        """
+        Profiler.writeReport(profile, sys.stderr)
+        if self.profile_output is None:
+            return
+        if self.profile_format == "collapsed":
+            Profiler.writeCollapsed(profile, self.profile_output, self.infile)
+        else:
+            Profiler.writePstats(profile, self.profile_output, self.infile)
 
 
 if __name__ == '__main__':
     argParser = argparse.ArgumentParser(description="Interpreter for ATP++ programs")
     argParser.add_argument('-i', '--input', type=str, nargs='?', help="Full path to the input program")
+    argParser.add_argument('--engine', choices=["compiled", "reference"], default="compiled",
+                           help="Run the program compiled to handlers (default) or step through it with the reference "
+                                "interpreter")
+    argParser.add_argument('--no-cache', action='store_true',
+                           help="Always parse the program instead of using or storing the parsed program in the cache")
+    argParser.add_argument('--cache-dir', type=str,
+                           help="Directory to store parsed programs in (default: __atpcache__ next to the program)")
+    argParser.add_argument('--in-place', action='store_true',
+                           help="Change the program state in place instead of copying it on every function call "
+                                "(reference interpreter only)")
+    argParser.add_argument('--profile', action='store_true',
+                           help="Count and time every executed instruction and report the hottest lines, blocks, jumps "
+                                "and loops to stderr (compiled engine only)")
+    argParser.add_argument('--profile-output', type=str, help="File to write the profile to")
+    argParser.add_argument('--profile-format', choices=["pstats", "collapsed"], default="pstats",
+                           help="Format of the profile file: pstats (readable with the pstats module) or collapsed "
+                                "stacks (for flamegraph tools)")
+    argParser.add_argument('-O', '--optimize', action='store_true',
+                           help="Optimize the program before running it (compiled engine only)")
+    argParser.add_argument('-o', '--output', type=str, help="Write the output of the program to this file")
+    argParser.add_argument('--flush-size', type=int,
+                           help="Number of PRINT and DUMP writes to buffer before writing them out (default: 1 on a "
+                                "terminal, 4096 otherwise)")
+    argParser.add_argument('--max-instructions', type=int,
+                           help="Stop the program after executing this many instructions")
+    argParser.add_argument('--time-limit', type=float, help="Stop the program after running for this many seconds")
+    argParser.add_argument('--max-variables', type=int, help="Stop the program when it SETs more variables than this")
+    argParser.add_argument('--max-state-bytes', type=int,
+                           help="Stop the program when its variables, errors and warnings take more bytes than this")
+    argParser.add_argument('--checkpoint', type=str,
+                           help="Write checkpoints of the run to this file so it can be resumed (compiled engine "
+                                "only)")
+    argParser.add_argument('--checkpoint-every', type=int, help="Number of instructions between two checkpoints")
+    argParser.add_argument('--checkpoint-seconds', type=float,
+                           help="Number of seconds between two checkpoints (default: 10 unless --checkpoint-every "
+                                "is given)")
+    argParser.add_argument('--resume', action='store_true',
+                           help="Continue the run from the checkpoint file when it exists")
+    argParser.add_argument('--strict', action='store_true',
+                           help="Halt the program on its first error and report the line, the instruction and the "
+                                "variables")
+    argParser.add_argument('--max-errors', type=int,
+                           help="Keep only this many errors of the program and leave the rest out")
+    argParser.add_argument('--jit', action='store_true',
+                           help="Compile the hot loops of the program to Python functions while it runs (compiled "
+                                "engine only)")
+    argParser.add_argument('--lanes', type=str,
+                           help="Run the program at once for every initial state in this JSON file, a list of "
+                                "objects that give variables a number or one such object per line (needs NumPy)")
+    argParser.add_argument('--watch', action='store_true',
+                           help="Run the program again every time its file changes, only the changed lines are lexed "
+                                "again")
+    argParser.add_argument('--watch-interval', type=float, default=0.5,
+                           help="Number of seconds between two checks of the file in --watch mode (default: 0.5)")
+    argParser.add_argument('--verify', action='store_true',
+                           help="Verify the program without running it and report every instruction that could not "
+                                "be proven safe")
     arguments = argParser.parse_args()
+    if arguments.profile and arguments.engine != "compiled":
+        argParser.error("--profile requires the compiled engine")
+    if arguments.optimize and arguments.engine != "compiled":
+        argParser.error("--optimize requires the compiled engine")
+    limit_values = (arguments.max_instructions, arguments.time_limit, arguments.max_variables,
+                    arguments.max_state_bytes)
+    run_limits = Limits.Limits(*limit_values) if any(map(lambda limit: limit is not None, limit_values)) else None
+    if run_limits is not None and (arguments.profile or arguments.profile_output is not None):
+        argParser.error("--profile can not be combined with execution limits")
+    if arguments.strict and (arguments.profile or arguments.profile_output is not None):
+        argParser.error("--profile can not be combined with --strict")
+    if arguments.checkpoint is not None and (arguments.engine != "compiled" or arguments.profile or
+                                             arguments.profile_output is not None):
+        argParser.error("--checkpoint requires the compiled engine and can not be combined with --profile")
+    if arguments.lanes is not None and Lanes.numpy is None:
+        argParser.error("--lanes requires NumPy")
+    if arguments.lanes is not None and (arguments.engine != "compiled" or arguments.optimize or arguments.profile or
+                                        arguments.profile_output is not None or arguments.checkpoint is not None):
+        argParser.error("--lanes requires the compiled engine and can not be combined with --optimize, --profile or "
+                        "--checkpoint")
+    if arguments.lanes is not None and any(map(lambda limit: limit is not None, limit_values[1:])):
+        argParser.error("--lanes only supports the --max-instructions limit")
+    if arguments.jit and (arguments.engine != "compiled" or run_limits is not None or arguments.checkpoint is not None
+                          or arguments.profile or arguments.profile_output is not None or arguments.lanes is not None):
+        argParser.error("--jit requires the compiled engine and can not be combined with limits, --checkpoint, "
+                        "--profile or --lanes")
+    if arguments.watch and (arguments.checkpoint is not None or arguments.verify):
+        argParser.error("--watch can not be combined with --checkpoint or --verify")
+    if arguments.resume and arguments.checkpoint is None:
+        argParser.error("--resume requires --checkpoint")
+    if arguments.checkpoint is not None and arguments.checkpoint_every is None and \
+            arguments.checkpoint_seconds is None:
+        arguments.checkpoint_seconds = 10.0
     if arguments.input is None:
         input_file = input("Please enter a path to the input program:")
     else:
@@ -76,9 +355,48 @@ if __name__ == '__main__':
         else:
             print("The file at {0} does not exist".format(input_file))
         input_file = input("Please enter a path to the input program:")
+    if arguments.verify:
+        exit(reportVerification(Loader.loadProgram(input_file, not arguments.no_cache, arguments.cache_dir)))
+    ATPTools.setPassByValue(not arguments.in_place)
+    try:
+        initial_states = Lanes.readLanes(arguments.lanes) if arguments.lanes is not None else None
+    except Lanes.LaneError as error:
+        print(error)
+        exit(-1)
     start_time = time()
-    sys.setrecursionlimit(0x1000000)
-    threading.stack_size(256000000)  # set stack to 256mb
-    t = threading.Thread(target=run(), kwargs={"infile": input_file})
-    t.start()
-    t.join()
+    if arguments.output is not None:
+        # A resumed run keeps the output written before its checkpoint.
+        output_sink = Output.FileSink(arguments.output, arguments.flush_size or 4096, "a" if arguments.resume else "w")
+    else:
+        output_sink = Output.StreamSink(sys.stdout, arguments.flush_size or Output.defaultFlushSize(sys.stdout))
+    try:
+        interpreter = run(engine=arguments.engine,
+                          use_cache=not arguments.no_cache,
+                          cache_directory=arguments.cache_dir,
+                          profile=arguments.profile or arguments.profile_output is not None,
+                          profile_output=arguments.profile_output,
+                          profile_format=arguments.profile_format,
+                          output=output_sink,
+                          optimize=arguments.optimize,
+                          limits=run_limits,
+                          checkpoint=arguments.checkpoint,
+                          checkpoint_every=arguments.checkpoint_every,
+                          checkpoint_seconds=arguments.checkpoint_seconds,
+                          resume=arguments.resume,
+                          strict=arguments.strict,
+                          max_errors=arguments.max_errors,
+                          lanes=initial_states,
+                          jit=arguments.jit)
+        if arguments.watch:
+            interpreter.watch(input_file, arguments.watch_interval)
+        else:
+            interpreter(infile=input_file)
+    except KeyboardInterrupt:
+        # The only way to leave --watch mode.
+        if not arguments.watch:
+            raise
+    except (Checkpoint.CheckpointError, Lanes.LaneError) as error:
+        print(error)
+        exit(-1)
+    finally:
+        output_sink.close()
@@ -0,0 +1,215 @@
+import io
+import os
+import random
+from typing import List, Tuple
+
+import Compiler
+import Errors
+import Output
+import Parser
+from Loader import readLines
+
+# The directory with the example programs.
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_programs")
+
+# The variables and labels of the generated programs.
+VARIABLES = ["a", "b", "c", "z", "q"]
+LABELS = [".L0", ".L1", ".L2", ".L3"]
+
+# What a run of a program ends with: the output, the variables with their types, the errors, the line the program
+# counter ended on and whether the run halted on its first error.
+Outcome = Tuple[str, List[Tuple[str, str, str]], List[str], int, bool]
+
+
+# generateProgram :: Random -> [str]
+def generateProgram(rng: random.Random) -> List[str]:
+    """
+    Generates a random program of every instruction of the lexer, with jumps back and forth between a few labels. The
+    program may read variables before they are SET and divide by zero, so it reports errors, and it may never end.
+    :param rng: the random number generator
+    :return: the lines of the program
+    """
+    # value :: None -> str
+    def value() -> str:
+        return rng.choice(VARIABLES + [str(rng.randint(-3, 6)), "0"])
+
+    lines = ["SET z 0", "SET a {0}".format(rng.randint(0, 5))]
+    for _ in range(rng.randint(3, 25)):
+        kind = rng.random()
+        variable = rng.choice(VARIABLES)
+        if kind < 0.1:
+            lines.append("DECL " + rng.choice(LABELS))
+        elif kind < 0.15:
+            lines.append(rng.choice(["", "# comment", "NOP"]))
+        elif kind < 0.25:
+            lines.append(rng.choice(["INC ", "DEC "]) + variable)
+        elif kind < 0.33:
+            lines.append("SET {0} {1}".format(variable, value()) if rng.random() < 0.8 else "SET " + variable)
+        elif kind < 0.45:
+            operator = rng.choice(["ADD", "SUB", "MUL", "DIV", "MOD"])
+            lines.append("{0} {1} {2}".format(operator, variable, value()) if rng.random() < 0.5 else
+                         "{0} {1} {2} {3}".format(operator, variable, value(), value()))
+        elif kind < 0.75:
+            operator = rng.choice(["JE", "JNE", "JL", "JG", "JLE", "JGE"])
+            label = rng.choice(LABELS)
+            lines.append("{0} {1} {2}".format(operator, label, value()) if rng.random() < 0.4 else
+                         "{0} {1} {2} {3}".format(operator, label, value(), value()))
+        elif kind < 0.95:
+            lines.append("PRINT " + rng.choice(VARIABLES + ['"hi"', "3"]))
+        else:
+            lines.append("DUMP")
+    lines += list(map(lambda label: "DECL " + label, LABELS))
+    lines.append(rng.choice(["PRINT a", "DECL .end", "NOP"]))
+    return lines
+
+
+# generateLoop :: Random -> [str]
+def generateLoop(rng: random.Random) -> List[str]:
+    """
+    Generates a random program with a loop that runs up to 40 times, with branches, divisions and output in its body.
+    The loop always ends, its counter i is only changed by the INC at its end.
+    :param rng: the random number generator
+    :return: the lines of the program
+    """
+    # value :: None -> str
+    def value() -> str:
+        return rng.choice(["a", "b", "c", "i", str(rng.randint(-3, 6))])
+
+    lines = ["SET i 0", "SET n {0}".format(rng.randint(0, 40))]
+    lines += list(map(lambda variable: "SET {0} {1}".format(variable, rng.choice(["0", "1", "2.5", "-3"])),
+                      filter(lambda variable: rng.random() < 0.8, ["a", "b", "c"])))
+    lines.append("DECL .top")
+    for _ in range(rng.randint(1, 10)):
+        kind = rng.random()
+        variable = rng.choice(["a", "b", "c"])
+        if kind < 0.2:
+            lines.append(rng.choice(["INC ", "DEC "]) + variable)
+        elif kind < 0.4:
+            operator = rng.choice(["ADD", "SUB", "MUL", "DIV", "MOD"])
+            lines.append("{0} {1} {2}".format(operator, variable, value()) if rng.random() < 0.5 else
+                         "{0} {1} {2} {3}".format(operator, variable, value(), value()))
+        elif kind < 0.55:
+            lines.append("SET {0} {1}".format(variable, value()))
+        elif kind < 0.7:
+            label = ".skip{0}".format(len(lines))
+            lines += ["{0} {1} {2} {3}".format(rng.choice(["JE", "JNE", "JL", "JG"]), label, value(), value()),
+                      "PRINT " + rng.choice(["a", "b", "c", '"x"']), "DECL " + label]
+        elif kind < 0.8:
+            lines.append("PRINT " + rng.choice(["a", "b", "c", "i"]))
+        elif kind < 0.85:
+            lines.append("DUMP" if rng.random() < 0.3 else "SET q 1")
+        else:
+            lines.append("MUL a 1.5" if rng.random() < 0.5 else "JE .out b 7")
+    return lines + ["INC i", "JL .top i n", "DECL .out", "PRINT i"]
+
+
+# loadProgram :: [str] -> Parser.ProgramState
+def loadProgram(lines: List[str]) -> Parser.ProgramState:
+    """
+    :param lines: the lines of a program
+    :return: the loaded program
+    """
+    ps, errors = readLines(io.StringIO("".join(map(lambda line: line + "\n", lines))))
+    if len(errors) > 0:
+        raise ValueError("\n".join(errors))
+    return ps
+
+
+# outcome :: Parser.ProgramState -> str -> Outcome
+def outcome(ps: Parser.ProgramState, output: str) -> Outcome:
+    """
+    :param ps: the program state after a run
+    :param output: the output of the run
+    :return: the outcome of the run
+    """
+    variables = list(map(lambda variable: (variable[0], type(variable[1]).__name__, repr(variable[1])),
+                         ps.variables.items()))
+    return output, variables, list(ps.errors), ps.current_pos, Errors.isHalted(ps.errors)
+
+
+# runReference :: Parser.ProgramState -> bool -> Outcome
+def runReference(program: Parser.ProgramState, strict: bool = False) -> Outcome:
+    """
+    Runs a program with Parser.executeProgram.
+    :param program: the loaded program, it is not changed
+    :param strict: whether to halt the program on its first error
+    :return: the outcome of the run
+    """
+    ps = Parser.ProgramState()
+    ps.instructions = program.instructions
+    ps.labels = program.labels
+    ps.output = Output.CollectorSink()
+    ps.errors = Errors.ErrorLog(strict)
+    ps = Parser.executeProgram(ps)
+    return outcome(ps, ps.output.getvalue())
+
+
+# runCompiled :: Parser.ProgramState -> bool -> Outcome
+def runCompiled(program: Parser.ProgramState, strict: bool = False) -> Outcome:
+    """
+    Runs a program with Compiler.executeCompiled.
+    :param program: the loaded (and optimized) program
+    :param strict: whether to halt the program on its first error
+    :return: the outcome of the run
+    """
+    compiled = Compiler.compileProgram(program)
+    output = Output.CollectorSink()
+    state = Compiler.MachineState(compiled, output)
+    state.errors = Errors.ErrorLog(strict)
+    state = Compiler.executeCompiled(compiled, state)
+    return outcome(state.toProgramState(), output.getvalue())
+
+
+# finishes :: Parser.ProgramState -> int -> bool
+def finishes(program: Parser.ProgramState, budget: int) -> bool:
+    """
+    :param program: the loaded program
+    :param budget: the number of instructions the program may execute
+    :return: whether the program ends within budget instructions
+    """
+    compiled = Compiler.compileProgram(program)
+    state = Compiler.MachineState(compiled, Output.CollectorSink())
+    code = compiled.code
+    last = len(code) - 1
+    for _ in range(budget):
+        if state.current_pos == last:
+            return True
+        state.current_pos += 1
+        code[state.current_pos](state)
+    return state.current_pos == last
+
+
+# generatePrograms :: int -> int -> int -> [Tuple[[str], Parser.ProgramState]]
+def generatePrograms(seed: int, count: int, budget: int = 2000) -> List[Tuple[List[str], Parser.ProgramState]]:
+    """
+    :param seed: the seed of the random number generator
+    :param count: the number of programs to generate
+    :param budget: the number of instructions a program may execute
+    :return: the generated programs that can be loaded and end within budget instructions, with their lines
+    """
+    programs = []
+    rng = random.Random(seed)
+    for _ in range(count):
+        lines = generateProgram(rng)
+        program = loadProgram(lines)
+        if finishes(program, budget):
+            programs.append((lines, program))
+    return programs
+
+
+# superinstructions :: [Tuple[Instruction, dict]] -> [Instruction]
+def superinstructions(tokens: list) -> list:
+    """
+    :param tokens: the instructions of an optimized program
+    :return: the classes of the instructions, with those of the parts of every SEQUENCE
+    """
+    return sum(map(lambda token: [token[0]] + superinstructions(token[1].get("parts", [])), tokens), [])
+
+
+# describe :: [str] -> str
+def describe(lines: List[str]) -> str:
+    """
+    :param lines: the lines of a program
+    :return: the program with line numbers, for the message of a failed test
+    """
+    return "\n".join(map(lambda line: "{0:>3} {1}".format(*line), enumerate(lines)))
@@ -0,0 +1,66 @@
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import Errors
+
+# The directory of the interpreter, where Batch.py is.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A program that never ends and never reports an error.
+ENDLESS_PROGRAM = "SET x 0\nDECL .a\nINC x\nJNE .a x -1\n"
+
+# A program that overflows a float to infinity and makes not a number from it.
+OVERFLOW_PROGRAM = "SET x 1000000000\n" + "MUL x x\n" * 6 + "SET y x\nMUL y -1\nSET z x\nSUB z x\nSET i 10\n"
+
+
+class TestBatch(unittest.TestCase):
+
+    def runBatch(self, *arguments: str, source: str = ENDLESS_PROGRAM) -> list:
+        """
+        Runs Batch.py on a program (the endless program by default) and fizzbuzz, failing the test rather than waiting
+        forever.
+        :param arguments: the options of the batch
+        :param source: the source of the first program
+        :return: the results of the programs, a result that is not strict JSON fails the test
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            endless = os.path.join(directory, "endless.atp++")
+            with open(endless, "w") as file:
+                file.write(source)
+            completed = subprocess.run(
+                [sys.executable, os.path.join(ROOT, "Batch.py"), "--no-cache", "--timeout", "1", "-j", "2"] +
+                list(arguments) + [endless, os.path.join(ROOT, "example_programs", "fizzbuzz.atp++")],
+                capture_output=True, text=True, timeout=60, cwd=ROOT)
+        return list(map(lambda line: json.loads(line, parse_constant=self.fail), completed.stdout.splitlines()))
+
+    def testStrictTimeout(self):
+        results = self.runBatch("--strict")
+        self.assertEqual(["timeout", "ok"], list(map(lambda result: result["status"], results)))
+        self.assertEqual(["Program stopped after the timeout of 1.0 s"], results[0]["errors"])
+
+    def testTimeoutWithFullErrorLog(self):
+        results = self.runBatch("--max-errors", "0")
+        self.assertEqual("timeout", results[0]["status"])
+        self.assertIn("Program stopped after the timeout of 1.0 s", results[0]["errors"])
+
+    def testNonFiniteVariables(self):
+        results = self.runBatch(source=OVERFLOW_PROGRAM)
+        self.assertEqual({"x": "inf", "y": "-inf", "z": "nan", "i": 10.0}, results[0]["variables"])
+
+    def testProgramHaltedPickles(self):
+        errors = Errors.ErrorLog(strict=True)
+        with self.assertRaises(Errors.ProgramHalted) as raised:
+            errors.append("an error")
+        halt = pickle.loads(pickle.dumps(raised.exception))
+        self.assertEqual("an error", halt.error)
+        self.assertEqual(["an error"], list(halt.errors))
+        self.assertTrue(halt.errors.halted)
+
+
+if __name__ == '__main__':
+    unittest.main()
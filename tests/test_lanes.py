@@ -0,0 +1,74 @@
+import random
+import unittest
+from typing import List
+
+import ATP
+import Errors
+import Lanes
+import Limits
+from tests.programs import describe, generateProgram, loadProgram
+
+# A loop that runs n times, so every lane jumps its own way.
+COUNTDOWN = ["SET total 0", "DECL .top", "JLE .end n 0", "ADD total n", "DEC n", "JE .top total total", "DECL .end",
+             "PRINT total", "PRINT n", "DUMP"]
+
+# Arithmetic on integers that do not fit a float, which the lanes keep boxed.
+BIG_NUMBERS = ["MUL big n n", "ADD big big 1", "SUB small big n", "MOD rest big 7", "PRINT big", "PRINT small",
+               "PRINT rest", "DUMP"]
+
+# Errors that only happen in some lanes: a division by zero and a variable that is only SET when n is positive.
+ERRORS = ["JLE .skip n 0", "SET seen 1", "DECL .skip", "DIV share 10 n", "PRINT share", "ADD seen 1", "PRINT seen",
+          "MOD m n 0", "DUMP"]
+
+
+@unittest.skipIf(Lanes.numpy is None, "Running lanes requires NumPy")
+class TestLanes(unittest.TestCase):
+    """
+    Runs a program in lanes with Lanes.runLanes and checks that every lane ends like a run of the program with
+    ATP.Program.run with the initial variables of the lane.
+    """
+
+    def assertSameAsRuns(self, lines: List[str], states: List[dict], max_instructions: int = 5000,
+                         strict: bool = False, max_errors: int = None) -> None:
+        program = ATP.compile("".join(map(lambda line: line + "\n", lines)))
+        lanes = Lanes.runLanes(loadProgram(lines), states, max_instructions, strict, max_errors)
+        for initial_vars, lane in zip(states, lanes):
+            result = program.run(initial_vars, Limits.Limits(max_instructions, check_interval=1), None, strict,
+                                 max_errors)
+            with self.subTest(program=describe(lines), initial_vars=initial_vars, strict=strict):
+                self.assertEqual(
+                    (result.output, repr(result.variables), result.errors, result.warnings, result.line,
+                     result.halted),
+                    (lane.output.getvalue(), repr(lane.variables), list(lane.errors), lane.warnings, lane.current_pos,
+                     Errors.isHalted(lane.errors)))
+
+    def testDivergingJumps(self):
+        self.assertSameAsRuns(COUNTDOWN, [{"n": 0}, {"n": 1}, {"n": 5}, {"n": -3}, {"n": 2.5}, {"n": 40}, {}])
+
+    def testInstructionLimit(self):
+        self.assertSameAsRuns(COUNTDOWN, [{"n": 3}, {"n": 400}, {"n": 1e9}], max_instructions=200)
+
+    def testBoxedIntegers(self):
+        self.assertSameAsRuns(BIG_NUMBERS, [{"n": 2 ** 40}, {"n": 3}, {"n": 2 ** 53 + 1}, {"n": -(2 ** 70)},
+                                            {"n": 0.5}, {"n": float("inf")}])
+
+    def testErrors(self):
+        states = [{"n": 0}, {"n": 2}, {"n": -4}, {"n": 0.0}, {}]
+        self.assertSameAsRuns(ERRORS, states)
+        self.assertSameAsRuns(ERRORS, states, strict=True)
+        self.assertSameAsRuns(ERRORS, states, max_errors=1)
+
+    def testGeneratedPrograms(self):
+        rng = random.Random(21)
+        values = [0, 1, -4, 6, 2.5, -0.5, 2 ** 53 - 1, 2 ** 53 + 1, 10 ** 20, float("inf")]
+        for _ in range(150):
+            lines = generateProgram(rng)
+            names = list(ATP.compile("".join(map(lambda line: line + "\n", lines))).names)
+            states = list(map(lambda lane: dict(map(lambda name: (name, rng.choice(values)),
+                                                    rng.sample(names, rng.randint(0, len(names))))), range(6)))
+            mode = rng.choice([(False, None), (True, None), (False, 2)])
+            self.assertSameAsRuns(lines, states, rng.choice([50, 3000]), *mode)
+
+
+if __name__ == '__main__':
+    unittest.main()
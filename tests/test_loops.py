@@ -0,0 +1,154 @@
+import itertools
+import unittest
+from typing import List, Union
+
+import Compiler
+import Lexer
+import Optimizer
+import Output
+import Parser
+from tests.programs import Outcome, describe, loadProgram, outcome, superinstructions
+
+# Number of instructions a loop may take step by step, more than any loop of the tests that ends.
+BUDGET = 100000
+
+
+# bottomLoop :: str -> str -> str -> [str]
+def bottomLoop(comparison: str, step: str, bound: str) -> List[str]:
+    """
+    :return: a loop that adds step to a and jumps back while the comparison of a with bound holds, counting its
+    iterations in b
+    """
+    return ["SET a 0", "SET b 0", "DECL .top", "ADD a {0}".format(step), "INC b",
+            "{0} .top a {1}".format(comparison, bound), "PRINT a", "PRINT b"]
+
+
+# topLoop :: str -> str -> str -> [str]
+def topLoop(comparison: str, step: str, bound: str) -> List[str]:
+    """
+    :return: a loop that leaves as soon as the comparison of a with bound holds and otherwise adds step to a, counting
+    its iterations in b
+    """
+    return ["SET z 0", "SET a 0", "SET b 0", "DECL .top", "{0} .out a {1}".format(comparison, bound),
+            "ADD a {0}".format(step), "INC b", "JE .top z 0", "DECL .out", "PRINT a", "PRINT b"]
+
+
+# runFrom :: Parser.ProgramState -> int -> dict -> Either int None -> Either Outcome None
+def runFrom(program: Parser.ProgramState, line: int, values: dict, budget: int = None) -> Union[Outcome, None]:
+    """
+    Runs a program from a line of its source with the given variables, so the LOOP of an optimized program can be
+    started with values the optimizer could not know.
+    :param program: the loaded (and optimized) program
+    :param line: the line of the source to start at
+    :param values: the variables and their values, those the program does not have are left out
+    :param budget: the number of instructions the program may execute, None for no limit
+    :return: the outcome of the run, None when the program did not end within budget instructions
+    """
+    compiled = Compiler.compileProgram(program)
+    output = Output.CollectorSink()
+    state = Compiler.MachineState(compiled, output)
+    for name, value in filter(lambda variable: variable[0] in compiled.names, values.items()):
+        state.slots[compiled.names.index(name)] = value
+        state.order.append(compiled.names.index(name))
+    state.current_pos = compiled.lines.index(line) - 1
+    if budget is None:
+        state = Compiler.executeCompiled(compiled, state)
+    else:
+        last = len(compiled.code) - 1
+        for _ in range(budget):
+            if state.current_pos == last:
+                break
+            state.current_pos += 1
+            compiled.code[state.current_pos](state)
+        if state.current_pos != last:
+            return None
+    return outcome(state.toProgramState(), output.getvalue())
+
+
+class TestLoops(unittest.TestCase):
+
+    def assertClosedForm(self, lines: List[str], starts: list) -> None:
+        """
+        Checks that the loop of a program becomes a LOOP and that it ends like the loop run step by step, when it is
+        started with every value in starts. A loop that does not end within BUDGET instructions step by step may not
+        end with the LOOP either.
+        """
+        program = loadProgram(lines)
+        optimized = Optimizer.optimize(program)
+        positions = list(filter(lambda position: optimized.instructions[position][0] == Lexer.Loop,
+                                range(len(optimized.instructions))))
+        self.assertEqual(1, len(positions), describe(lines))
+        head = optimized.lines[positions[0]]
+        for start in starts:
+            values = {"z": 0, "a": start, "b": 0}
+            with self.subTest(program=describe(lines), start=start):
+                self.assertEqual(runFrom(program, head, values, BUDGET), runFrom(optimized, head, values, BUDGET))
+
+    def testLoopIterations(self):
+        for comparison, value, step, bound, first in itertools.product(
+                Compiler.COMPARISONS.keys(), range(-6, 7), range(-3, 4), range(-6, 7), (0, 1, 2)):
+            holds = list(filter(lambda steps: Compiler.COMPARISONS[comparison](value + steps * step, bound),
+                                range(first, first + 20)))
+            with self.subTest(comparison=comparison, value=value, step=step, bound=bound, first=first):
+                self.assertEqual(holds[0] if len(holds) > 0 else None,
+                                 Compiler.loopIterations(comparison, value, step, bound, first))
+
+    def testLoopIterationsNearExactIntegers(self):
+        value = Compiler.EXACT_INTEGERS - 10
+        self.assertEqual(10, Compiler.loopIterations("JGE", value, 1, Compiler.EXACT_INTEGERS, 0))
+        self.assertEqual(6, Compiler.loopIterations("JE", value, 2, Compiler.EXACT_INTEGERS + 2, 0))
+        self.assertEqual(None, Compiler.loopIterations("JE", value, 3, Compiler.EXACT_INTEGERS, 0))
+
+    def testEveryComparison(self):
+        starts = [-40, -7, 0, 3, 40, 41, 1000]
+        self.assertClosedForm(bottomLoop("JL", "1", "40"), starts)
+        self.assertClosedForm(bottomLoop("JLE", "3", "40"), starts)
+        self.assertClosedForm(bottomLoop("JNE", "2", "40"), [-40, 0, 38])
+        self.assertClosedForm(topLoop("JE", "3", "42"), [-42, -3, 0, 3, 42])
+        self.assertClosedForm(topLoop("JGE", "1", "40"), starts)
+        self.assertClosedForm(topLoop("JG", "2", "40"), starts)
+
+    def testNegativeSteps(self):
+        starts = [-1000, -41, -40, 0, 7, 300]
+        self.assertClosedForm(bottomLoop("JG", "-1", "-40"), starts)
+        self.assertClosedForm(bottomLoop("JGE", "-3", "-40"), starts)
+        self.assertClosedForm(topLoop("JLE", "-2", "-40"), starts)
+        self.assertClosedForm(topLoop("JL", "-1", "-40"), starts)
+
+    def testLoopSkipsIterations(self):
+        lines = bottomLoop("JL", "1", "100000")
+        program = loadProgram(lines)
+        optimized = Optimizer.optimize(program)
+        self.assertEqual(runFrom(program, 0, {}), runFrom(optimized, 0, {}, 20))
+
+    def testLoopThatNeverRuns(self):
+        # The top loop leaves right away, the bottom loop runs its body once.
+        self.assertClosedForm(topLoop("JGE", "1", "40"), [40, 100])
+        self.assertClosedForm(topLoop("JLE", "-1", "-40"), [-40, -100])
+        self.assertClosedForm(bottomLoop("JL", "1", "40"), [40, 100])
+
+    def testFloatValues(self):
+        # A variable that does not hold an integer leaves the loop to the handlers of its instructions.
+        self.assertClosedForm(bottomLoop("JL", "1", "40"), [0.5, -2.5, 1e300, float("nan"), float("-inf")])
+        self.assertClosedForm(topLoop("JGE", "2", "40"), [0.5, 39.5, float("inf")])
+
+    def testFloatSteps(self):
+        for lines in (bottomLoop("JL", "1.5", "40"), topLoop("JGE", "0.5", "40")):
+            program = loadProgram(lines)
+            optimized = Optimizer.optimize(program)
+            self.assertNotIn(Lexer.Loop, superinstructions(optimized.instructions), describe(lines))
+            self.assertEqual(runFrom(program, 0, {}), runFrom(optimized, 0, {}), describe(lines))
+
+    def testValuesNearExactIntegers(self):
+        edge = Compiler.EXACT_INTEGERS
+        self.assertClosedForm(bottomLoop("JL", "1", str(edge - 2)), [edge - 20, edge - 2, edge, float(edge + 2)])
+        self.assertClosedForm(bottomLoop("JL", "2", str(edge + 3)), [edge - 10, edge - 9.0, edge])
+        self.assertClosedForm(topLoop("JGE", "1", str(edge)), [edge - 15, float(edge - 1), edge])
+        self.assertClosedForm(bottomLoop("JG", "-1", str(2 - edge)), [20 - edge, 2 - edge, -edge])
+        # Past EXACT_INTEGERS the floats of the loop are rounded at every step, adding 1 to 2 ** 53 leaves it as it is.
+        self.assertClosedForm(bottomLoop("JL", "1", str(edge + 2)), [float(edge - 4), float(edge - 40), edge - 4])
+        self.assertClosedForm(topLoop("JGE", "1", str(edge + 2)), [float(edge - 4), float(edge - 40), edge - 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import glob
+import os
+import unittest
+
+import Lexer
+import Optimizer
+import Parser
+from tests.programs import EXAMPLES, describe, generatePrograms, loadProgram, runCompiled, runReference, \
+    superinstructions
+
+
+# peepholeOnly :: Parser.ProgramState -> Parser.ProgramState
+def peepholeOnly(ps: Parser.ProgramState) -> Parser.ProgramState:
+    """
+    :param ps: the loaded program
+    :return: the program with its superinstructions formed, but without propagating constants or removing anything
+    """
+    fused = Parser.ProgramState()
+    fused.instructions = Optimizer.peephole(ps.instructions)
+    fused.labels = ps.labels
+    return fused
+
+
+class TestOptimizer(unittest.TestCase):
+    """
+    Runs programs with the reference interpreter and with the compiled engine, with and without Optimizer.optimize,
+    and checks that every run ends the same: the same output, variables of the same type, errors and final line.
+    """
+
+    def assertSameRuns(self, lines: list, program, strict: bool = False) -> None:
+        reference = runReference(program, strict)
+        self.assertEqual(reference, runCompiled(program, strict), describe(lines))
+        self.assertEqual(reference, runCompiled(Optimizer.optimize(program), strict), describe(lines))
+        self.assertEqual(reference, runCompiled(peepholeOnly(program), strict), describe(lines))
+
+    def testExamplePrograms(self):
+        for path in sorted(glob.glob(os.path.join(EXAMPLES, "*.atp++"))):
+            with open(path, "r") as file:
+                lines = file.read().splitlines()
+            with self.subTest(program=os.path.basename(path)):
+                self.assertSameRuns(lines, loadProgram(lines))
+
+    def testGeneratedPrograms(self):
+        programs = generatePrograms(15, 600)
+        self.assertGreater(len(programs), 300)
+        for lines, program in programs:
+            self.assertSameRuns(lines, program)
+
+    def testGeneratedStrictPrograms(self):
+        programs = generatePrograms(13, 600)
+        halted = 0
+        for lines, program in programs:
+            self.assertSameRuns(lines, program, strict=True)
+            halted += runReference(program, strict=True)[4]
+        self.assertGreater(halted, 100)
+
+    def testSuperinstructionsAreFormed(self):
+        formed = set()
+        for lines, program in generatePrograms(15, 600):
+            formed.update(superinstructions(Optimizer.optimize(program).instructions))
+            formed.update(superinstructions(peepholeOnly(program).instructions))
+        self.assertTrue({Lexer.Goto, Lexer.CompareBranch, Lexer.StepBranch, Lexer.Sequence}.issubset(formed))
+
+    def testHaltInsideSequence(self):
+        lines = ["SET a 1", "SET b 0", "PRINT a", "DIV a b", "PRINT a"]
+        program = loadProgram(lines)
+        optimized = Optimizer.optimize(program)
+        self.assertEqual(Lexer.Sequence, optimized.instructions[0][0])
+        self.assertSameRuns(lines, program, strict=True)
+        output, variables, errors, line, halted = runCompiled(optimized, strict=True)
+        self.assertEqual((["Division by zero on line 3"], 3, True), (errors, line, halted))
+
+    def testStepBranchLoop(self):
+        lines = ["SET i 0", "SET total 0", "DECL .top", "ADD total i", "INC i", "JL .top i 25", "PRINT total"]
+        program = loadProgram(lines)
+        self.assertIn(Lexer.StepBranch, superinstructions(peepholeOnly(program).instructions))
+        self.assertSameRuns(lines, program)
+
+    def testFoldedAndRemovedInstructions(self):
+        lines = ["SET a 4", "SET b a", "MUL c a b", "DECL .skip", "NOP", "JE .end c 16", "PRINT a", "DECL .end",
+                 "PRINT c"]
+        program = loadProgram(lines)
+        optimized = Optimizer.optimize(program)
+        self.assertLess(len(optimized.instructions), len(program.instructions))
+        self.assertSameRuns(lines, program)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import random
+import unittest
+from unittest import mock
+
+import Compiler
+import Errors
+import Optimizer
+import Output
+import Tracer
+from Loader import readProgram
+from tests.programs import EXAMPLES, describe, generateLoop, loadProgram, outcome
+
+
+class TestTracer(unittest.TestCase):
+    """
+    Runs programs with Tracer.executeTraced and checks that they end like they do with Compiler.executeCompiled, with
+    HOT_LOOP lowered so the short loops of the tests are traced.
+    """
+
+    def setUp(self):
+        self.traces = []
+        compile_trace = Tracer.compileTrace
+
+        # countTrace :: CompiledProgram -> int -> [TraceStep] -> Either Handler None
+        def countTrace(program, head, steps):
+            trace = compile_trace(program, head, steps)
+            self.traces.append(trace)
+            return trace
+
+        patches = [mock.patch.object(Tracer, "HOT_LOOP", 3), mock.patch.object(Tracer, "compileTrace", countTrace)]
+        list(map(lambda patch: patch.start(), patches))
+        list(map(lambda patch: self.addCleanup(patch.stop), patches))
+
+    def runProgram(self, ps, traced: bool, strict: bool = False):
+        program = Compiler.compileProgram(ps)
+        output = Output.CollectorSink()
+        state = Compiler.MachineState(program, output)
+        state.errors = Errors.ErrorLog(strict)
+        execute = Tracer.executeTraced if traced else Compiler.executeCompiled
+        return outcome(execute(program, state).toProgramState(), output.getvalue())
+
+    def compiledTraces(self) -> int:
+        return len(list(filter(lambda trace: trace is not None, self.traces)))
+
+    def testGeneratedLoops(self):
+        rng = random.Random(22)
+        for optimize in (False, True):
+            self.traces = []
+            for _ in range(300):
+                lines = generateLoop(rng)
+                program = loadProgram(lines)
+                program = Optimizer.optimize(program) if optimize else program
+                strict = rng.random() < 0.3
+                self.assertEqual(self.runProgram(program, False, strict), self.runProgram(program, True, strict), describe(lines))
+            self.assertGreater(self.compiledTraces(), 100)
+
+    def testOptimizedProgramIsTraced(self):
+        ps, errors = readProgram(os.path.join(EXAMPLES, "fizzbuzz.atp++"))
+        for program in (ps, Optimizer.optimize(ps)):
+            self.traces = []
+            self.assertEqual(self.runProgram(program, False), self.runProgram(program, True))
+            self.assertEqual(1, self.compiledTraces())
+
+
+if __name__ == '__main__':
+    unittest.main()